@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# ******************************************************************************
+# ZYNTHIAN PROJECT: Zynthian GUI
+#
+# Zynthian audio autoconnect benchmark
+#
+# ******************************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ******************************************************************************
+#
+# This measures audio_autoconnect time versus chain count.
+# Zynthian must be running (zynmixer & zynseq jack clients are required).
+# Each benchmark chain is a stereo synth routed to a stereo effect routed to a
+# stereo mixer input, all provided by a benchmark jack client, so that running
+# zynthian routes are not modified.
+# For each chain count it measures:
+#   full: port index & graph model rebuilt from jack server, like every pass before incremental autoconnect
+#   steady: no change
+#   change: one chain bypasses its effect (minimal diff applied)
+#
+# It also measures the periodic hardware MIDI port re-check (update_hw_midi_ports).
+#
+# Usage: benchmark_autoconnect.py [iterations] [max chains]
+#
+# ******************************************************************************
+
+import sys
+import jack
+from time import sleep, perf_counter
+from threading import Lock
+from types import SimpleNamespace
+
+import zynautoconnect
+from zynautoconnect import zynthian_autoconnect as autoconnect
+
+try:
+    iterations = int(sys.argv[1])
+except:
+    iterations = 10
+try:
+    max_chains = int(sys.argv[2])
+except:
+    max_chains = 16
+
+# Benchmark jack client providing chain ports
+bench_client = jack.Client("benchmark_autoconnect")
+for i in range(1, max_chains + 1):
+    for ch in ("l", "r"):
+        bench_client.outports.register(f"synth_{i:02d}_out_{ch}")
+        bench_client.inports.register(f"fx_{i:02d}_in_{ch}")
+        bench_client.outports.register(f"fx_{i:02d}_out_{ch}")
+        bench_client.inports.register(f"mix_{i:02d}_in_{ch}")
+bench_client.activate()
+
+
+def build_chain(i, bypass=False):
+    """Get benchmark chain with audio routes as built by zynthian_chain.rebuild_audio_graph"""
+
+    if bypass:
+        routes = {f"benchmark_autoconnect:mix_{i:02d}_in": [f"benchmark_autoconnect:synth_{i:02d}_out"]}
+    else:
+        routes = {
+            f"benchmark_autoconnect:fx_{i:02d}_in": [f"benchmark_autoconnect:synth_{i:02d}_out"],
+            f"benchmark_autoconnect:mix_{i:02d}_in": [f"benchmark_autoconnect:fx_{i:02d}_out"]
+        }
+    return SimpleNamespace(audio_out=[], fader_pos=0, audio_slots=[], mixer_chan=None, audio_routes=routes)
+
+
+chains = {}
+autoconnect.chain_manager = SimpleNamespace(
+    chains=chains,
+    get_chain_audio_routing=lambda chain_id: chains[chain_id].audio_routes,
+    get_chain=lambda chain_id: chains.get(chain_id))
+autoconnect.state_manager = SimpleNamespace(
+    zynmixer=SimpleNamespace(normalise=lambda chan, normalise: None),
+    audio_player=None,
+    aubio_in=[])
+autoconnect.jclient = jack.Client("benchmark_autoconnect_ctrl")
+autoconnect.jclient.set_port_registration_callback(autoconnect.cb_jack_port_registration, only_available=False)
+autoconnect.jclient.set_port_connect_callback(autoconnect.cb_jack_port_connect, only_available=False)
+autoconnect.jclient.activate()
+autoconnect.lock = Lock()
+autoconnect.hw_audio_dst_ports = autoconnect.get_hw_audio_dst_ports()
+
+
+def measure(prepare):
+    times = []
+    for i in range(iterations):
+        prepare(i)
+        sleep(0.05)  # Allow jack callbacks to be processed
+        zynautoconnect.audio_autoconnect()
+        times.append(1000 * autoconnect.audio_autoconnect_stats["time"])
+    times.sort()
+    return times[len(times) // 2]
+
+
+def prepare_full(i):
+    autoconnect.invalidate_port_index()
+    autoconnect.audio_connections_dirty = True
+
+
+def prepare_steady(i):
+    pass
+
+
+def prepare_change(i):
+    chains[1] = build_chain(1, i % 2 == 0)
+
+
+print(f"Audio autoconnect benchmark: median of {iterations} iterations")
+print("chains   full(ms)  steady(ms)  change(ms)")
+chain_count = 1
+while chain_count <= max_chains:
+    chains.clear()
+    for i in range(1, chain_count + 1):
+        chains[i] = build_chain(i)
+    zynautoconnect.audio_autoconnect()
+    full = measure(prepare_full)
+    steady = measure(prepare_steady)
+    change = measure(prepare_change)
+    print(f"{chain_count:6d} {full:10.2f} {steady:11.2f} {change:11.2f}")
+    chain_count *= 2
+
+times = []
+for i in range(iterations):
+    ts = perf_counter()
+    zynautoconnect.update_hw_midi_ports()
+    times.append(1000 * (perf_counter() - ts))
+times.sort()
+print(f"hardware MIDI re-check: {times[len(times) // 2]:.2f}ms")
+
+chains.clear()
+zynautoconnect.audio_autoconnect()
+autoconnect.jclient.deactivate()
+bench_client.deactivate()
@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# ******************************************************************************
+# ZYNTHIAN PROJECT: Zynthian GUI
+#
+# Zynthian MIDI CC dispatch benchmark
+#
+# ******************************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ******************************************************************************
+#
+# This measures CC messages per second dispatched by the chain manager over
+# synthetic chains, each with a processor on its own MIDI channel and learned
+# controllers. A random CC stream (learned & not learned CCs) is dispatched with:
+#   keyed: binding dictionaries looked up on each CC, like before dispatch tables
+#   table: compiled dispatch table (zynthian_chain_manager.midi_control_change)
+# and the same for getting the controllers bound to each CC (get_midi_cc_zctrls).
+# Both MULTI & ACTI device modes are measured. Zynthian doesn't need to be running.
+#
+# Usage: benchmark_cc_dispatch.py [chains] [controllers] [messages]
+#
+# ******************************************************************************
+
+import sys
+import random
+from time import perf_counter
+
+import zynautoconnect
+from zyngine.zynthian_chain_manager import zynthian_chain_manager
+
+try:
+    nchains = int(sys.argv[1])
+except:
+    nchains = 16
+try:
+    ncontrollers = int(sys.argv[2])
+except:
+    ncontrollers = 16
+try:
+    nmessages = int(sys.argv[3])
+except:
+    nmessages = 100000
+
+zmip = 0
+
+
+class benchmark_zctrl:
+
+    def __init__(self, processor, symbol):
+        self.processor = processor
+        self.symbol = symbol
+        self.value = 0
+
+    def midi_control_change(self, val, send=True):
+        self.value = val
+
+    def midi_cc_mode_set(self, mode):
+        pass
+
+
+class benchmark_processor:
+
+    def __init__(self, chain_id, midi_chan):
+        self.chain_id = chain_id
+        self.midi_chan = midi_chan
+        self.controllers_dict = {}
+
+
+def keyed_get_midi_cc_zctrls(zmip, midi_chan, cc_num):
+    cm = chain_manager
+    key = (zmip << 24) | (midi_chan << 16) | (cc_num << 8)
+    zctrls = list(cm.absolute_midi_cc_binding.get(key, []))
+    if zynautoconnect.get_midi_in_dev_mode(zmip):
+        if cm.active_chain_id is not None:
+            key = (cm.active_chain_id << 16) | (cc_num << 8)
+            zctrls += cm.chain_midi_cc_binding.get(key, [])
+    else:
+        key = (midi_chan << 16) | (cc_num << 8)
+        zctrls += cm.chan_midi_cc_binding.get(key, [])
+    return zctrls
+
+
+def keyed_midi_control_change(zmip, midi_chan, cc_num, cc_val):
+    cm = chain_manager
+    # Handle absolute CC binding
+    try:
+        key = (zmip << 24) | (midi_chan << 16) | (cc_num << 8)
+        zctrls = cm.absolute_midi_cc_binding[key]
+        for zctrl in zctrls:
+            zctrl.midi_control_change(cc_val)
+    except:
+        pass
+    # Handle active chain CC binding
+    if zynautoconnect.get_midi_in_dev_mode(zmip):
+        try:
+            key = (cm.active_chain_id << 16) | (cc_num << 8)
+            zctrls = cm.chain_midi_cc_binding[key]
+            for zctrl in zctrls:
+                zctrl.midi_control_change(cc_val)
+                cm.handle_pedals(cc_num, cc_val, zctrl)
+        except:
+            pass
+    # Handle channel CC binding
+    else:
+        try:
+            key = (midi_chan << 16) | (cc_num << 8)
+            zctrls = cm.chan_midi_cc_binding[key]
+            for zctrl in zctrls:
+                zctrl.midi_control_change(cc_val)
+                cm.handle_pedals(cc_num, cc_val, zctrl)
+        except:
+            pass
+
+
+# CC numbers, excluding bank select & pedals
+cc_nums = [cc for cc in range(1, 120) if cc not in (32, 64, 66, 67, 69)]
+
+# Synthetic chains with learned controllers
+chain_manager = zynthian_chain_manager(None)
+for chain_id in range(1, nchains + 1):
+    processor = benchmark_processor(chain_id, (chain_id - 1) % 16)
+    for i in range(ncontrollers):
+        zctrl = benchmark_zctrl(processor, f"ctrl_{i}")
+        processor.controllers_dict[zctrl.symbol] = zctrl
+        chain_manager.add_midi_learn(processor.midi_chan, cc_nums[i], zctrl)
+chain_manager.active_chain_id = 1
+
+# CC stream with learned (~50%) & not learned CCs
+random.seed(0)
+messages = [(random.randrange(16), random.choice(cc_nums[:2 * ncontrollers]), random.randrange(128)) for i in range(nmessages)]
+
+
+def measure_dispatch(dispatch):
+    ts = perf_counter()
+    for midi_chan, cc_num, cc_val in messages:
+        dispatch(zmip, midi_chan, cc_num, cc_val)
+    return nmessages / (perf_counter() - ts)
+
+
+def measure_lookup(lookup):
+    ts = perf_counter()
+    for midi_chan, cc_num, cc_val in messages:
+        lookup(zmip, midi_chan, cc_num)
+    return nmessages / (perf_counter() - ts)
+
+
+zynautoconnect.devices_in_mode[:] = [0]
+print(f"MIDI CC dispatch benchmark: {nchains} chains x {ncontrollers} learned controllers, {nmessages} messages")
+print(f"{'mode':6} {'query':10} {'keyed(CC/s)':>12} {'table(CC/s)':>12} {'speedup':>8}")
+for mode, name in (0, "MULTI"), (1, "ACTI"):
+    zynautoconnect.devices_in_mode[zmip] = mode
+    for query, measure, keyed, table in (
+            ("dispatch", measure_dispatch, keyed_midi_control_change, chain_manager.midi_control_change),
+            ("zctrls", measure_lookup, keyed_get_midi_cc_zctrls, chain_manager.get_midi_cc_zctrls)):
+        res_keyed = measure(keyed)
+        res_table = measure(table)
+        print(f"{name:6} {query:10} {res_keyed:12.0f} {res_table:12.0f} {res_table / res_keyed:7.2f}x")
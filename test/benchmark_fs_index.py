@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# ******************************************************************************
+# ZYNTHIAN PROJECT: Zynthian GUI
+#
+# Zynthian filesystem index benchmark
+#
+# ******************************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ******************************************************************************
+#
+# This measures bank & preset list queries over a synthetic SFZ library:
+#   banks x instruments directories, each with a SFZ file and samples.
+# For each query it measures:
+#   scan: directories scanned on each query, like before the filesystem index
+#   cold: first query, filling the index
+#   inotify: index validated by inotify events
+#   mtime: index validated by directory modification time
+#   change: a SFZ file is added before each query (inotify)
+# Zynthian doesn't need to be running.
+#
+# Usage: benchmark_fs_index.py [banks] [instruments] [samples] [iterations]
+#
+# ******************************************************************************
+
+import os
+import sys
+import shutil
+import tempfile
+from time import perf_counter
+
+from zyngine.zynthian_engine import zynthian_engine
+from zyngine.zynthian_fs_index import zynfsindex
+
+try:
+    nbanks = int(sys.argv[1])
+except:
+    nbanks = 40
+try:
+    ninstruments = int(sys.argv[2])
+except:
+    ninstruments = 25
+try:
+    nsamples = int(sys.argv[3])
+except:
+    nsamples = 40
+try:
+    iterations = int(sys.argv[4])
+except:
+    iterations = 10
+
+tree = tempfile.mkdtemp(prefix="benchmark_fs_index_")
+for b in range(nbanks):
+    for i in range(ninstruments):
+        dpath = f"{tree}/Bank_{b:03d}/Instrument_{i:03d}"
+        os.makedirs(dpath + "/samples")
+        open(f"{dpath}/Instrument_{i:03d}.sfz", "w").close()
+        for s in range(nsamples):
+            open(f"{dpath}/samples/sample_{s:03d}.wav", "w").close()
+
+
+class benchmark_engine(zynthian_engine):
+    preset_fexts = ["sfz"]
+    root_bank_dirs = [("Benchmark", tree)]
+
+
+queries = {
+    "bank list": lambda: benchmark_engine.get_bank_dirlist(recursion=2),
+    "preset files": lambda: benchmark_engine.find_all_preset_files(f"{tree}/Bank_000", recursion=2),
+    "dir list": lambda: benchmark_engine.get_dirlist(f"{tree}/Bank_000"),
+    "file list": lambda: benchmark_engine.get_filelist(f"{tree}/Bank_000/Instrument_000/samples", "wav")
+}
+
+
+def measure(query, prepare=None):
+    times = []
+    for i in range(iterations):
+        if prepare:
+            prepare(i)
+        ts = perf_counter()
+        query()
+        times.append(1000 * (perf_counter() - ts))
+    times.sort()
+    return times[len(times) // 2]
+
+
+added_files = 0
+
+
+def add_file(i):
+    global added_files
+    open(f"{tree}/Bank_000/Instrument_{i % ninstruments:03d}/new_{added_files}.sfz", "w").close()
+    added_files += 1
+
+
+print(f"Filesystem index benchmark: {nbanks * ninstruments * (nsamples + 1)} files, median of {iterations} iterations")
+print(f"{'query':14}  scan(ms)  cold(ms) inotify(ms) mtime(ms) change(ms)")
+for name, query in queries.items():
+    # Scan directories
+    roots = zynfsindex.roots
+    zynfsindex.roots = []
+    scan = measure(query)
+    zynfsindex.roots = roots + [tree]
+    # Index
+    zynfsindex.stop()
+    zynfsindex.init_inotify()
+    ts = perf_counter()
+    query()
+    cold = 1000 * (perf_counter() - ts)
+    if zynfsindex.inotify_fd >= 0:
+        inotify = f"{measure(query):11.2f}"
+        change = f"{measure(query, add_file):10.2f}"
+    else:
+        inotify = change = f"{'-':>10}"
+    zynfsindex.stop()
+    query()
+    mtime = measure(query)
+    print(f"{name:14} {scan:9.2f} {cold:9.2f} {inotify} {mtime:9.2f} {change}")
+    zynfsindex.roots = roots
+
+print(zynfsindex.get_stats())
+zynfsindex.stop()
+shutil.rmtree(tree)
@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# ******************************************************************************
+# ZYNTHIAN PROJECT: Zynthian GUI
+#
+# Zynthian soundfont preset list benchmark
+#
+# ******************************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ******************************************************************************
+#
+# This measures the time to get the preset list of every SF2/SF3 file in a folder:
+#   parse: preset headers parsed from file
+#   cached: preset headers from cache (after parse)
+#   fluidsynth: soundfont loaded in fluidsynth & "inst" command output (optional)
+# Zynthian doesn't need to be running. Stop it before using --fluidsynth to free audio device.
+#
+# Usage: benchmark_soundfont.py [--fluidsynth] [folder]
+#
+# ******************************************************************************
+
+import os
+import sys
+import pexpect
+from time import perf_counter
+
+from zyngine import zynthian_soundfont
+
+use_fluidsynth = "--fluidsynth" in sys.argv
+args = [arg for arg in sys.argv[1:] if arg != "--fluidsynth"]
+if args:
+    folder = args[0]
+else:
+    folder = os.environ.get('ZYNTHIAN_DATA_DIR', "/zynthian/zynthian-data") + "/soundfonts/sf2"
+
+# Use a temporary cache file
+zynthian_soundfont.PRESET_CACHE_FILE = "/tmp/benchmark_soundfont_presets.json"
+zynthian_soundfont.preset_cache = {}
+
+fluidsynth = None
+if use_fluidsynth:
+    fluidsynth = pexpect.spawn("fluidsynth -a null -m alsa_seq -n -i", encoding="utf-8", timeout=120)
+    fluidsynth.expect("\n> ")
+
+fpaths = []
+for root, dirs, files in os.walk(folder):
+    for fname in sorted(files):
+        if fname.lower().endswith((".sf2", ".sf3")):
+            fpaths.append(os.path.join(root, fname))
+
+print(f"Soundfont preset list benchmark: {len(fpaths)} files in {folder}")
+print("    size(MB) presets  parse(ms) cached(ms) fluidsynth(ms)  file")
+totals = [0, 0, 0]
+for fpath in fpaths:
+    size = os.path.getsize(fpath) / 1000000
+    ts = perf_counter()
+    presets = zynthian_soundfont.get_preset_headers(fpath)
+    t_parse = 1000 * (perf_counter() - ts)
+    ts = perf_counter()
+    zynthian_soundfont.get_preset_headers(fpath)
+    t_cached = 1000 * (perf_counter() - ts)
+    totals[0] += t_parse
+    totals[1] += t_cached
+    t_fluidsynth = ""
+    if fluidsynth:
+        ts = perf_counter()
+        fluidsynth.sendline(f"load \"{fpath}\"")
+        fluidsynth.expect(r"loaded SoundFont has ID (\d+)")
+        sfi = fluidsynth.match.group(1)
+        fluidsynth.expect("\n> ")
+        fluidsynth.sendline(f"inst {sfi}")
+        fluidsynth.expect("\n> ")
+        dt = 1000 * (perf_counter() - ts)
+        totals[2] += dt
+        t_fluidsynth = f"{dt:14.1f}"
+        fluidsynth.sendline(f"unload {sfi}")
+        fluidsynth.expect("\n> ")
+    npresets = len(presets) if presets is not None else -1
+    print(f"{size:12.1f} {npresets:7d} {t_parse:10.2f} {t_cached:10.3f} {t_fluidsynth:>14}  {os.path.basename(fpath)}")
+
+print(f"Total: parse {totals[0]:.1f}ms, cached {totals[1]:.2f}ms" + (f", fluidsynth {totals[2]:.1f}ms" if fluidsynth else ""))
+if fluidsynth:
+    fluidsynth.sendline("quit")
+os.remove(zynthian_soundfont.PRESET_CACHE_FILE)
@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# ******************************************************************************
+# ZYNTHIAN PROJECT: Zynthian GUI
+#
+# Zynthian ZS3 recall benchmark
+#
+# ******************************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ******************************************************************************
+#
+# This measures ZS3 recall time using OSC control, reading journal output.
+# Zynthian must be running as a service, with "ZS3 on program change" enabled
+# and a snapshot loaded (typically 8 chains) with ZS3s learned on the program
+# numbers passed as arguments (default: 0 and 1, any MIDI channel).
+#
+# Usage: benchmark_zs3.py [iterations] [program ...]
+#
+# ******************************************************************************
+
+import sys
+import liblo
+import pexpect
+import zynconf
+
+zynthian_addr = 'localhost'
+cuia_port = zynconf.ServerPort["cuia_osc"]
+recall_pattern = r"ZS3 '([^']*)' recalled in ([0-9.]+)ms => ([0-9]+) sends avoided\r\n"
+
+#   Send a CUIA command via OSC
+#   cmd: OSC path for CUIA command, e.g. /cuia/reboot
+#   params: Optional parameters to send via OSC
+
+
+def cuia(cmd, params=None):
+    if params is None:
+        liblo.send(f'osc.udp://{zynthian_addr}:{cuia_port}', cmd)
+    else:
+        liblo.send(f'osc.udp://{zynthian_addr}:{cuia_port}', cmd, *params)
+
+
+#   Flush journal buffer
+def flush():
+    try:
+        journal.timeout = 0.1
+        journal.readlines()
+    except:
+        pass
+
+
+try:
+    iterations = int(sys.argv[1])
+except:
+    iterations = 20
+programs = [int(pgm) for pgm in sys.argv[2:]]
+if not programs:
+    programs = [0, 1]
+
+journal = pexpect.spawn('/bin/journalctl -fu zynthian', encoding='UTF-8')
+flush()
+
+results = {}
+failed = 0
+for i in range(iterations):
+    for pgm in programs:
+        cuia('/cuia/program_change', [pgm, 0])
+        try:
+            journal.expect(recall_pattern, timeout=10)
+            zs3_id = journal.match.group(1)
+            if zs3_id not in results:
+                results[zs3_id] = []
+            results[zs3_id].append((float(journal.match.group(2)), int(journal.match.group(3))))
+        except pexpect.TIMEOUT:
+            failed += 1
+
+print(f"ZS3 recall benchmark: {iterations} iterations over programs {programs}")
+for zs3_id, res in results.items():
+    times = sorted(r[0] for r in res)
+    avoided = sum(r[1] for r in res) / len(res)
+    print(f"{zs3_id}: min {times[0]:.1f}ms, median {times[len(times) // 2]:.1f}ms, max {times[-1]:.1f}ms, {avoided:.0f} sends avoided")
+if failed:
+    print(f"FAILED: {failed} recalls not detected")
@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# ******************************************************************************
+# ZYNTHIAN PROJECT: Zynthian GUI
+#
+# Zynthian signal manager tests
+#
+# ******************************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ******************************************************************************
+#
+# Tests callback registry and queued dispatch. Zynthian doesn't need to be running.
+#
+# Usage: test_signal_manager.py
+#
+# ******************************************************************************
+
+import gc
+import unittest
+import weakref
+from time import sleep
+
+from zyngine.zynthian_signal_manager import zynthian_signal_manager
+
+
+class fake_screen:
+    """Registers callbacks like GUI screens do when shown"""
+
+    def __init__(self, sigman):
+        self.calls = 0
+        sigman.register(sigman.S_CHAIN_MAN, 1, self.cb_signal)
+        sigman.register_queued(sigman.S_MIDI, sigman.SS_MIDI_CC, self.cb_signal)
+
+    def cb_signal(self, **kwargs):
+        self.calls += 1
+
+
+class test_signal_manager(unittest.TestCase):
+
+    def setUp(self):
+        self.sigman = zynthian_signal_manager()
+
+    def tearDown(self):
+        self.sigman.stop()
+
+    def test_register_unregister(self):
+        screen = fake_screen(self.sigman)
+        # Registering the same bound method again replaces it
+        self.sigman.register(self.sigman.S_CHAIN_MAN, 1, screen.cb_signal)
+        self.assertEqual(self.sigman.get_num_callbacks(self.sigman.S_CHAIN_MAN, 1), 1)
+        self.sigman.send(self.sigman.S_CHAIN_MAN, 1)
+        self.assertEqual(screen.calls, 1)
+        self.sigman.unregister(self.sigman.S_CHAIN_MAN, 1, screen.cb_signal)
+        self.assertEqual(self.sigman.get_num_callbacks(self.sigman.S_CHAIN_MAN, 1), 0)
+        self.sigman.send(self.sigman.S_CHAIN_MAN, 1)
+        self.assertEqual(screen.calls, 1)
+
+    def test_function_callback(self):
+        calls = []
+
+        def cb_signal(**kwargs):
+            calls.append(kwargs)
+
+        self.sigman.register(self.sigman.S_GUI, 0, cb_signal)
+        self.sigman.send(self.sigman.S_GUI, 0, screen="main")
+        self.assertEqual(calls, [{"screen": "main"}])
+        self.sigman.unregister_all(cb_signal)
+        self.assertEqual(self.sigman.get_num_callbacks(self.sigman.S_GUI, 0), 0)
+
+    def test_screen_leak(self):
+        # Screens destroyed without unregistering must be collected and their callbacks pruned
+        refs = []
+        for i in range(100):
+            screen = fake_screen(self.sigman)
+            refs.append(weakref.ref(screen))
+            del screen
+        gc.collect()
+        self.assertEqual(sum(1 for ref in refs if ref() is not None), 0)
+        self.assertEqual(self.sigman.get_num_callbacks(self.sigman.S_CHAIN_MAN, 1), 0)
+        self.assertEqual(self.sigman.get_num_callbacks(self.sigman.S_MIDI, self.sigman.SS_MIDI_CC), 0)
+        self.sigman.send(self.sigman.S_CHAIN_MAN, 1)
+
+    def test_queued_coalesce(self):
+        screen = fake_screen(self.sigman)
+        with self.sigman.queue_cond:
+            # Hold dispatch thread while queueing
+            for val in range(100):
+                self.sigman.send_queued(self.sigman.S_MIDI, self.sigman.SS_MIDI_CC, izmip=0, chan=0, num=7, val=val)
+        sleep(0.1)
+        self.assertEqual(screen.calls, 1)
+        stats = self.sigman.get_queue_stats()[(self.sigman.S_MIDI, self.sigman.SS_MIDI_CC)]
+        self.assertEqual(stats["coalesced"], 99)
+        self.assertEqual(stats["dispatched"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -31,7 +31,8 @@ import psutil
 import pexpect
 import logging
 import alsaaudio
-from time import sleep
+from time import sleep, perf_counter
+from collections import deque
 from threading import Thread, Lock
 
 # Zynthian specific modules
@@ -110,6 +111,26 @@ zyn_routed_audio = {}
 # Map of lists of MIDI sources routed by zynautoconnect, indexed by destination
 zyn_routed_midi = {}
 
+# Index of jack ports, rebuilt after jack port registration callback
+port_index_dirty = True			# True to rebuild port index on next lookup
+port_index_version = 0			# Incremented each time the port index is rebuilt
+# Lists of jack ports in jack order, indexed by (is_input, is_midi, is_physical) or None for all ports
+port_index = {}
+# Map of jack ports indexed by port name and aliases
+port_index_names = {}
+# Map of lists of jack ports (or port names) matching a lookup, indexed by lookup parameters
+port_index_matches = {}
+
+# Model of jack audio graph, maintained from jack port registration & connection callbacks
+# Map of sets of source port names connected to each audio input port, indexed by destination port name
+audio_connections = {}
+# Queue of (source, destination, connect) events from jack callback, pending merge into audio_connections
+audio_connect_events = deque()
+audio_graph_version = -1		# Port index version used by audio_connections
+audio_connections_dirty = True	# True to resync audio_connections on next audio autoconnect
+# Stats of last audio autoconnect: {"time", "connects", "disconnects"}
+audio_autoconnect_stats = None
+
 # Processors sending control feedback (connected to zynmidirouter:ctrl_in)
 ctrl_fb_procs = []
 
@@ -170,12 +191,114 @@ def set_port_friendly_name(port, friendly_name=None):
         while len(port.aliases) > 1:
             port.unset_alias(port.aliases[1])
         port.set_alias(friendly_name)
+        invalidate_port_index()
     except:
         pass
 
 
+def update_port_index():
+    """Rebuild port index if jack ports have changed since last rebuild"""
+
+    global port_index_dirty, port_index_version, port_index, port_index_names, port_index_matches
+
+    if not port_index_dirty:
+        return
+    port_index_dirty = False
+    index = {None: jclient.get_ports()}
+    for is_input in (True, False):
+        for is_midi in (True, False):
+            for is_physical in (True, False):
+                index[(is_input, is_midi, is_physical)] = []
+    names = {}
+    for port in index[None]:
+        index[(port.is_input, port.is_midi, False)].append(port)
+        if port.is_physical:
+            index[(port.is_input, port.is_midi, True)].append(port)
+        for alias in port.aliases:
+            names[alias] = port
+        names[port.name] = port
+    # Replace (don't clear) lookup cache so that lookups running in other threads can't add stale results
+    port_index = index
+    port_index_names = names
+    port_index_matches = {}
+    port_index_version += 1
+
+
+def invalidate_port_index():
+    """Request port index rebuild, e.g. after port aliases have changed"""
+
+    global port_index_dirty
+    port_index_dirty = True
+
+
+def get_indexed_ports(name_pattern="", is_audio=False, is_midi=False, is_input=False, is_output=False, is_physical=False):
+    """Get jack ports from port index
+
+    Parameters and result are the same as jack.Client.get_ports.
+    Lookups are cached until jack ports change.
+    returns : List of jack ports
+    """
+
+    key = (name_pattern, is_audio, is_midi, is_input, is_output, is_physical)
+    update_port_index()
+    matches = port_index_matches
+    index = port_index
+    try:
+        return matches[key].copy()
+    except KeyError:
+        pass
+    if is_input != is_output and is_audio != is_midi:
+        ports = index[(is_input, is_midi, is_physical)]
+    else:
+        ports = [port for port in index[None] if (not is_input or port.is_input) and (not is_output or port.is_output)
+                 and (not is_audio or port.is_audio) and (not is_midi or port.is_midi) and (not is_physical or port.is_physical)]
+    if name_pattern:
+        try:
+            regex = re.compile(name_pattern)
+            result = [port for port in ports if regex.search(port.name)]
+        except re.error:
+            result = []
+    else:
+        result = list(ports)
+    matches[key] = result
+    return result.copy()
+
+
+def get_indexed_port_names(name_pattern, is_input, is_midi=False):
+    """Get names of jack ports from port index
+
+    name_pattern : Regular expression to search in port names (like jack_get_ports)
+    is_input : True for input (destination) ports, False for output (source) ports
+    is_midi : True for MIDI ports, False for audio ports
+    returns : List of port names in jack order (must not be modified)
+    """
+
+    key = ("names", name_pattern, is_input, is_midi)
+    update_port_index()
+    matches = port_index_matches
+    try:
+        return matches[key]
+    except KeyError:
+        pass
+    result = [port.name for port in get_indexed_ports(
+        name_pattern, is_audio=not is_midi, is_midi=is_midi, is_input=is_input, is_output=not is_input)]
+    matches[key] = result
+    return result
+
+
+def get_indexed_port(name):
+    """Get jack port from port index
+
+    name : Port name or alias
+    returns : Jack port or None if not found
+    """
+
+    update_port_index()
+    return port_index_names.get(name)
+
+
 def get_ports(name, is_input=None):
-    return jclient.get_ports(name, is_input=is_input)
+    return get_indexed_ports(name, is_input=is_input is True, is_output=is_input is False)
 
 
 def dev_in_2_dev_out(zmip):
@@ -229,10 +352,7 @@ def get_port_from_name(name):
     returns : JACK port or None if not found
     """
 
-    try:
-        return jclient.get_port_by_name(name)
-    except:
-        return None
+    return get_indexed_port(name)
 
 
 def get_midi_in_uid(idev):
@@ -349,6 +469,7 @@ def update_system_audio_aliases():
                 for a in port.aliases:
                     port.unset_alias(a)
                 port.set_alias(alias)
+    invalidate_port_index()
 
 
 def add_sidechain_ports(jackname):
@@ -426,6 +547,8 @@ def request_midi_connect(fast=False):
     # if paused_flag:
     # return
     if fast:
+        # Ports registered just before request may not be notified yet
+        invalidate_port_index()
         update_hw_midi_ports()
         midi_autoconnect()
     else:
@@ -517,23 +640,23 @@ def update_hw_midi_ports(force=False):
     hw_port_fingerprint = hw_midi_src_ports + hw_midi_dst_ports
 
     # List of physical MIDI source ports
-    hw_midi_src_ports = jclient.get_ports(
+    hw_midi_src_ports = get_indexed_ports(
         is_output=True, is_physical=True, is_midi=True)
 
     # List of physical MIDI destination ports
-    hw_midi_dst_ports = jclient.get_ports(
+    hw_midi_dst_ports = get_indexed_ports(
         is_input=True, is_physical=True, is_midi=True)
 
     # Treat some virtual MIDI ports as hardware
     for port_name in ("QmidiNet:in", "jackrtpmidid:rtpmidi_in", "jacknetumpd:netump_in", "RtMidiIn Client:TouchOSC Bridge", "ZynMaster:midi_in", "ZynMidiRouter:seq_in"):
         try:
-            ports = jclient.get_ports(port_name, is_midi=True, is_input=True)
+            ports = get_indexed_ports(port_name, is_midi=True, is_input=True)
             hw_midi_dst_ports += ports
         except:
             pass
     for port_name in ("QmidiNet:out", "jackrtpmidid:rtpmidi_out", "jacknetumpd:netump_out", "RtMidiOut Client:TouchOSC Bridge", "aubio"):
         try:
-            ports = jclient.get_ports(port_name, is_midi=True, is_output=True)
+            ports = get_indexed_ports(port_name, is_midi=True, is_output=True)
             hw_midi_src_ports += ports
         except:
             pass
@@ -572,9 +695,8 @@ def midi_autoconnect():
 
     # Create graph of required chain routes as sets of sources indexed by destination
     required_routes = {}
-    all_midi_dst = jclient.get_ports(is_input=True, is_midi=True)
-    for dst in all_midi_dst:
-        required_routes[dst.name] = set()
+    for dst in get_indexed_port_names("", True, True):
+        required_routes[dst] = set()
 
     # Connect MIDI Input Devices to ZynMidiRouter ports (zmips)
     busy_idevs = []
@@ -654,21 +776,17 @@ def midi_autoconnect():
                         routes[proc.engine.get_jackname()] = route
 
         for dst_name in routes:
-            dst_ports = jclient.get_ports(
-                re.escape(dst_name), is_input=True, is_midi=True)
+            dst_ports = get_indexed_port_names(re.escape(dst_name), True, True)
             if not dst_ports:
                 # Try to get destiny port by alias
-                try:
-                    dst_ports = [jclient.get_port_by_name(dst_name)]
-                except:
-                    pass
+                port = get_indexed_port(dst_name)
+                if port:
+                    dst_ports = [port.name]
             if dst_ports:
                 for src_name in routes[dst_name]:
-                    src_ports = jclient.get_ports(
-                        src_name, is_output=True, is_midi=True)
+                    src_ports = get_indexed_port_names(src_name, False, True)
                     if src_ports:
-                        required_routes[dst_ports[0].name].add(
-                            src_ports[0].name)
+                        required_routes[dst_ports[0]].add(src_ports[0])
 
         # Add chain MIDI outputs
         if chain.midi_slots and chain.midi_thru:
@@ -681,34 +799,29 @@ def midi_autoconnect():
                         chain_midi_first_procs = chain_manager.get_processors(
                             out, "Synth", 0)
                     for processor in chain_midi_first_procs:
-                        for dst in jclient.get_ports(processor.get_jackname(True), is_midi=True, is_input=True):
-                            dests.append(dst.name)
+                        dests += get_indexed_port_names(processor.get_jackname(True), True, True)
                 else:
                     pass
                     # dests.append(out)
             for processor in chain.midi_slots[-1]:
-                src_ports = jclient.get_ports(processor.get_jackname(True), is_midi=True, is_output=True)
+                src_ports = get_indexed_port_names(processor.get_jackname(True), False, True)
                 if src_ports:
                     for dst in dests:
-                        required_routes[dst].add(src_ports[0].name)
+                        required_routes[dst].add(src_ports[0])
 
         # Add MIDI router outputs
         if chain.is_midi():
-            src_ports = jclient.get_ports(
-                f"ZynMidiRouter:ch{chain.zmop_index}_out", is_midi=True, is_output=True)
+            src_ports = get_indexed_port_names(f"ZynMidiRouter:ch{chain.zmop_index}_out", False, True)
             if src_ports:
                 for dst_proc in chain.get_processors(slot=0):
-                    dst_ports = jclient.get_ports(
-                        dst_proc.get_jackname(True), is_midi=True, is_input=True)
+                    dst_ports = get_indexed_port_names(dst_proc.get_jackname(True), True, True)
                     if dst_ports:
-                        src = src_ports[0]
-                        dst = dst_ports[0]
-                        required_routes[dst.name].add(src.name)
+                        required_routes[dst_ports[0]].add(src_ports[0])
 
     # Add zynseq to MIDI input devices
     idev = state_manager.get_zmip_step_index()
     if devices_in[idev] is None:
-        src_ports = jclient.get_ports(
+        src_ports = get_indexed_ports(
             "zynseq:output", is_midi=True, is_output=True)
         if src_ports:
             devices_in[idev] = src_ports[0]
@@ -719,7 +832,7 @@ def midi_autoconnect():
     # Add SMF player to MIDI input devices
     idev = state_manager.get_zmip_seq_index()
     if devices_in[idev] is None:
-        src_ports = jclient.get_ports(
+        src_ports = get_indexed_ports(
             "zynsmf:midi_out", is_midi=True, is_output=True)
         if src_ports:
             devices_in[idev] = src_ports[0]
@@ -742,19 +855,17 @@ def midi_autoconnect():
     for proc in chain_manager.processors.values():
         if proc.engine.options["ctrl_fb"]:
             try:
-                ports = jclient.get_ports(proc.get_jackname(
-                    True), is_midi=True, is_output=True)
-                required_routes["ZynMidiRouter:ctrl_in"].add(ports[0].name)
-                ctrl_fb_procs.append(proc)
+                ports = get_indexed_port_names(proc.get_jackname(True), False, True)
+                required_routes["ZynMidiRouter:ctrl_in"].add(ports[0])
+                if proc not in ctrl_fb_procs:
+                    ctrl_fb_procs.append(proc)
                 # logging.debug(f"Routed controller feedback from {proc.get_jackname(True)}")
             except Exception as e:
                 # logging.error(f"Can't route controller feedback from {proc.get_name()} => {e}")
                 pass
 
     # Remove from control feedback list those processors removed from chains
-    for i, proc in enumerate(ctrl_fb_procs):
-        if proc.id not in chain_manager.processors:
-            del ctrl_fb_procs[i]
+    ctrl_fb_procs[:] = [proc for proc in ctrl_fb_procs if proc.id in chain_manager.processors]
 
     # Connect ZynMidiRouter:step_out to ZynthStep input
     required_routes["zynseq:input"].add("ZynMidiRouter:step_out")
@@ -770,14 +881,15 @@ def midi_autoconnect():
         if dst.startswith("effect_"):
             required_routes.pop(dst)
     # Workaround for mod-host auto routing
-    try:
-        port = jclient.get_port_by_name("mod-host:midi_in")
-        current_routes = jclient.get_all_connections(port)
-        for src in current_routes:
-            if not src.name.startswith("ZynMidiRouter"):
-                jclient.disconnect(src, port)
-    except:
-        pass
+    port = get_indexed_port("mod-host:midi_in")
+    if port:
+        try:
+            current_routes = jclient.get_all_connections(port)
+            for src in current_routes:
+                if not src.name.startswith("ZynMidiRouter"):
+                    jclient.disconnect(src, port)
+        except:
+            pass
 
     # Connect and disconnect routes
     for dst, sources in required_routes.items():
@@ -814,32 +926,79 @@ def midi_autoconnect():
     release_lock()
 
 
+def update_audio_graph():
+    """Update audio graph model with changes notified by jack callbacks
+
+    Must be called with mutex lock acquired.
+    """
+
+    global audio_graph_version, audio_connections_dirty
+
+    update_port_index()
+    if audio_graph_version != port_index_version:
+        audio_graph_version = port_index_version
+        # Remove unregistered ports
+        src_names = set(get_indexed_port_names("", False))
+        dst_names = set(get_indexed_port_names("", True))
+        for dst in list(audio_connections):
+            if dst in dst_names:
+                audio_connections[dst] &= src_names
+            else:
+                audio_connections.pop(dst)
+
+    if audio_connections_dirty:
+        audio_connections_dirty = False
+        audio_connect_events.clear()
+        audio_connections.clear()
+        for dst in get_indexed_port_names("", True):
+            try:
+                audio_connections[dst] = set(port.name for port in jclient.get_all_connections(dst))
+            except Exception as e:
+                logging.warning(e)
+
+    while audio_connect_events:
+        src, dst, connect = audio_connect_events.popleft()
+        if connect:
+            audio_connections.setdefault(dst, set()).add(src)
+        elif dst in audio_connections:
+            audio_connections[dst].discard(src)
+
+
 def audio_autoconnect():
     # Get Mutex Lock
     if not acquire_lock():
         return
 
-    global deferred_audio_connect
+    global deferred_audio_connect, audio_autoconnect_stats
     deferred_audio_connect = False
 
+    ts = perf_counter()
+    update_audio_graph()
+    connects = 0
+    disconnects = 0
+
     # Workaround for mod-monitor auto routing
     for port in hw_audio_dst_ports:
+        current_routes = audio_connections.get(port.name, set())
         for i in range(1, 3):
-            try:
-                jclient.disconnect(f"mod-monitor:out_{i}", port)
-            except:
-                pass
+            if f"mod-monitor:out_{i}" in current_routes:
+                try:
+                    jclient.disconnect(f"mod-monitor:out_{i}", port)
+                    current_routes.discard(f"mod-monitor:out_{i}")
+                    disconnects += 1
+                except:
+                    pass
 
     # Create graph of required chain routes as sets of sources indexed by destination
     required_routes = {}
 
-    all_audio_dst = jclient.get_ports(is_input=True, is_audio=True)
-    for dst in all_audio_dst:
-        required_routes[dst.name] = set()
+    for dst in get_indexed_port_names("", True):
+        required_routes[dst] = set()
 
     # Chain audio routing
     for chain_id in chain_manager.chains:
-        routes = chain_manager.get_chain_audio_routing(chain_id)
+        # Copy so that chain's routes are not modified when resolving chain destinations
+        routes = chain_manager.get_chain_audio_routing(chain_id).copy()
         normalise = 0 in chain_manager.chains[chain_id].audio_out and chain_manager.chains[0].fader_pos == 0 and len(
             chain_manager.chains[chain_id].audio_slots) == chain_manager.chains[chain_id].fader_pos
         state_manager.zynmixer.normalise(
@@ -859,36 +1018,28 @@ def audio_autoconnect():
                             routes[proc.get_jackname()] = route
                     else:
                         if dst == 0:
-                            for name in list(route):
-                                if name.startswith('zynmixer:output'):
-                                    # Use mixer internal normalisation
-                                    route.remove(name)
+                            # Use mixer internal normalisation
+                            route = [name for name in route if not name.startswith('zynmixer:output')]
                         routes[f"zynmixer:input_{dst_chain.mixer_chan + 1:02d}"] = route
         for dst in routes:
             if dst in sidechain_ports:
                 # This is an exact match so we do want to route exactly this
-                dst_ports = jclient.get_ports(
-                    f"^{dst}$", is_input=True, is_audio=True)
+                dst_ports = get_indexed_port_names(f"^{dst}$", True)
             else:
                 # This may be a client name that will return all input ports, including side-chain inputs
-                dst_ports = jclient.get_ports(
-                    dst, is_input=True, is_audio=True)
                 # Remove side-chain (no route) destinations
-                for port in list(dst_ports):
-                    if port.name in sidechain_ports:
-                        dst_ports.remove(port)
+                dst_ports = [port for port in get_indexed_port_names(dst, True) if port not in sidechain_ports]
             dst_count = len(dst_ports)
 
             for src_name in routes[dst]:
-                src_ports = jclient.get_ports(
-                    src_name, is_output=True, is_audio=True)
+                src_ports = get_indexed_port_names(src_name, False)
                 # Auto mono/stereo routing
                 source_count = len(src_ports)
                 if source_count and dst_count:
                     for i in range(min(2, max(source_count, dst_count))):
                         src = src_ports[min(i, source_count - 1)]
-                        dst = dst_ports[min(i, dst_count - 1)]
-                        required_routes[dst.name].add(src.name)
+                        dst_port = dst_ports[min(i, dst_count - 1)]
+                        required_routes[dst_port].add(src)
 
     # Connect metronome to aux
     required_routes[f"zynmixer:input_{MAIN_MIX_CHAN}a"].add("zynseq:metronome")
@@ -896,18 +1047,17 @@ def audio_autoconnect():
 
     # Connect global audio player to aux
     if state_manager.audio_player and state_manager.audio_player.jackname:
-        ports = jclient.get_ports(
-            state_manager.audio_player.jackname, is_output=True, is_audio=True)
-        required_routes[f"zynmixer:input_{MAIN_MIX_CHAN}a"].add(ports[0].name)
-        required_routes[f"zynmixer:input_{MAIN_MIX_CHAN}b"].add(ports[1].name)
+        ports = get_indexed_port_names(state_manager.audio_player.jackname, False)
+        required_routes[f"zynmixer:input_{MAIN_MIX_CHAN}a"].add(ports[0])
+        required_routes[f"zynmixer:input_{MAIN_MIX_CHAN}b"].add(ports[1])
 
     # Connect inputs to aubionotes
     if zynthian_gui_config.midi_aubionotes_enabled:
         capture_ports = get_audio_capture_ports()
-        for port in jclient.get_ports("aubio", is_input=True, is_audio=True):
+        for port in get_indexed_port_names("aubio", True):
             for i in state_manager.aubio_in:
                 try:
-                    required_routes[port.name].add(capture_ports[i - 1].name)
+                    required_routes[port].add(capture_ports[i - 1].name)
                 except:
                     pass
 
@@ -917,45 +1067,47 @@ def audio_autoconnect():
             required_routes.pop(dst)
 
     # Replicate main output to headphones
-    hp_ports = jclient.get_ports(
-        "Headphones:playback", is_input=True, is_audio=True)
+    hp_ports = get_indexed_port_names("Headphones:playback", True)
     if len(hp_ports) >= 2:
-        required_routes[hp_ports[0].name] = required_routes[hw_audio_dst_ports[0].name]
-        required_routes[hp_ports[1].name] = required_routes[hw_audio_dst_ports[1].name]
+        required_routes[hp_ports[0]] = required_routes[hw_audio_dst_ports[0].name]
+        required_routes[hp_ports[1]] = required_routes[hw_audio_dst_ports[1].name]
 
-    # Connect and disconnect routes
+    # Connect and disconnect routes that differ from current graph model
     for dst, sources in required_routes.items():
         if dst not in zyn_routed_audio:
-            zyn_routed_audio[dst] = sources
-        else:
-            zyn_routed_audio[dst] = zyn_routed_audio[dst].union(sources)
-        try:
-            current_routes = jclient.get_all_connections(dst)
-        except Exception as e:
-            current_routes = []
-            logging.warning(e)
-        for src in current_routes:
-            if src.name in sources:
-                continue
-            if src.name in zyn_routed_audio[dst]:
+            zyn_routed_audio[dst] = set()
+        zyn_routed_audio[dst] |= sources
+        current_routes = audio_connections.setdefault(dst, set())
+        for src in current_routes - sources:
+            if src in zyn_routed_audio[dst]:
                 try:
-                    jclient.disconnect(src.name, dst)
+                    jclient.disconnect(src, dst)
+                    current_routes.discard(src)
+                    disconnects += 1
                 except:
                     pass
-                zyn_routed_audio[dst].remove(src.name)
-        for src in sources:
+                zyn_routed_audio[dst].discard(src)
+        for src in sources - current_routes:
             try:
                 jclient.connect(src, dst)
-                zyn_routed_audio[dst].append(src.name)
+                current_routes.add(src)
+                connects += 1
             except:
                 pass
 
+    audio_autoconnect_stats = {
+        "time": perf_counter() - ts,
+        "connects": connects,
+        "disconnects": disconnects
+    }
+    logger.debug(f"Audio autoconnect in {1000 * audio_autoconnect_stats['time']:.1f}ms => {connects} connects, {disconnects} disconnects")
+
     # Release Mutex Lock
     release_lock()
 
 
 def get_hw_audio_dst_ports():
-    return jclient.get_ports("system:playback", is_input=True, is_audio=True, is_physical=True) + jclient.get_ports("zynaout", is_input=True, is_audio=True)
+    return get_indexed_ports("system:playback", is_input=True, is_audio=True, is_physical=True) + get_indexed_ports("zynaout", is_input=True, is_audio=True)
 
 
 def update_hw_audio_ports():
@@ -1070,10 +1222,11 @@ def start_alsa_in(device):
         return False
     alsa_audio_srcs[device] = proc
     for i in range(10):
-        ports = jclient.get_ports(f"zynain_{device}")
+        ports = get_indexed_ports(f"zynain_{device}")
         if ports:
             for i, port in enumerate(ports):
                 port.set_alias(f"{device} {i + 1}")
+            invalidate_port_index()
             return True
         sleep(0.1)
     logging.warning(f"Failed to set {device} aliases")
@@ -1098,10 +1251,11 @@ def start_alsa_out(device):
         return False
     alsa_audio_dests[device] = proc
     for i in range(10):
-        ports = jclient.get_ports(f"zynaout_{device}")
+        ports = get_indexed_ports(f"zynaout_{device}")
         if ports:
             for i, port in enumerate(ports):
                 port.set_alias(f"{device} {i + 1}")
+            invalidate_port_index()
             return True
         sleep(0.1)
     logging.warning(f"Failed to set {device} aliases")
@@ -1142,7 +1296,7 @@ def audio_connect_ffmpeg(timeout=2.0):
 def get_audio_capture_ports():
     """Get list of hardware audio inputs"""
 
-    return jclient.get_ports("system", is_output=True, is_audio=True, is_physical=True) + jclient.get_ports("zynain", is_output=True, is_audio=True)
+    return get_indexed_ports("system", is_output=True, is_audio=True, is_physical=True) + get_indexed_ports("zynain", is_output=True, is_audio=True)
 
 
 def build_midi_port_name(port):
@@ -1262,6 +1416,7 @@ def update_midi_port_aliases(port):
     except:
         logging.warning(f"Unable to set alias for port {port.name}")
         return False
+    invalidate_port_index()
     return True
 
 
@@ -1393,6 +1548,9 @@ def start(sm):
     try:
         jclient = jack.Client("Zynthian_autoconnect")
         jclient.set_xrun_callback(cb_jack_xrun)
+        jclient.set_port_registration_callback(cb_jack_port_registration, only_available=False)
+        jclient.set_port_connect_callback(cb_jack_port_connect, only_available=False)
+        jclient.set_port_rename_callback(cb_jack_port_rename, only_available=False)
         jclient.activate()
     except Exception as e:
         logger.error(
@@ -1421,7 +1579,7 @@ def start(sm):
 def stop():
     """Reset state and stop autoconnect thread"""
 
-    global exit_flag, jclient, thread, lock, hw_audio_dst_ports
+    global exit_flag, jclient, thread, lock, hw_audio_dst_ports, port_index_dirty, audio_connections_dirty
     exit_flag = True
     if thread:
         thread.join()
@@ -1432,6 +1590,8 @@ def stop():
         lock = None
 
     hw_audio_dst_ports = []
+    port_index_dirty = True
+    audio_connections_dirty = True
 
     stop_all_alsa_in_out()
 
@@ -1475,6 +1635,51 @@ def cb_jack_xrun(delayed_usecs: float):
         state_manager.status_xrun = True
 
 
+def cb_jack_port_registration(port, register):
+    """Jack port registration callback
+
+    port : Jack port (None if not available)
+    register : True if port registered, False if unregistered
+    """
+
+    global port_index_dirty, deferred_audio_connect, deferred_midi_connect
+    port_index_dirty = True
+    if register:
+        # Route new ports on next port check cycle
+        if port is None or port.is_audio:
+            deferred_audio_connect = True
+        if port is None or port.is_midi:
+            deferred_midi_connect = True
+
+
+def cb_jack_port_rename(port, old, new):
+    """Jack port rename callback
+
+    port : Jack port (None if not available)
+    old : Old port name
+    new : New port name
+    """
+
+    invalidate_port_index()
+
+
+def cb_jack_port_connect(a, b, connect):
+    """Jack port connection callback
+
+    a : Jack port (None if not available)
+    b : Jack port (None if not available)
+    connect : True if ports connected, False if disconnected
+    """
+
+    global audio_connections_dirty
+    if a is None or b is None:
+        audio_connections_dirty = True
+    elif a.is_audio:
+        if a.is_input:
+            a, b = b, a
+        audio_connect_events.append((a.name, b.name, connect))
+
+
 def get_jackd_cpu_load():
     """Get the JACK CPU load"""
 
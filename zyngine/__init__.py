@@ -1,45 +1,17 @@
 # -*- coding: utf-8 -*-
+# Engine modules (zynthian_engine_*) are not imported here. They are loaded
+# on demand by the chain manager (see get_engine_class).
 __all__ = [
     "zynthian_controller",
     "zynthian_lv2",
     "zynthian_engine",
-    "zynthian_engine_zynaddsubfx",
-    "zynthian_engine_linuxsampler",
-    "zynthian_engine_fluidsynth",
-    "zynthian_engine_setbfree",
-    "zynthian_engine_modui",
-    "zynthian_engine_pianoteq",
-    "zynthian_engine_puredata",
-    "zynthian_engine_aeolus",
-    "zynthian_engine_jalv",
-    "zynthian_engine_sfizz",
     "zynthian_engine_alsa_mixer",
-    "zynthian_engine_audioplayer",
-    "zynthian_engine_sooperlooper",
-    "zynthian_engine_inet_radio",
-    "zynthian_engine_sysex",
-    "zynthian_engine_midi_control",
     "zynthian_midi_filter",
     "zynthian_zcmidi",
 ]
 from zyngine.zynthian_controller import *
 from zyngine.zynthian_lv2 import *
 from zyngine.zynthian_engine import *
-from zyngine.zynthian_engine_zynaddsubfx import *
-from zyngine.zynthian_engine_linuxsampler import *
-from zyngine.zynthian_engine_fluidsynth import *
-from zyngine.zynthian_engine_setbfree import *
-from zyngine.zynthian_engine_modui import *
-from zyngine.zynthian_engine_pianoteq import *
-from zyngine.zynthian_engine_puredata import *
-from zyngine.zynthian_engine_aeolus import *
-from zyngine.zynthian_engine_jalv import *
-from zyngine.zynthian_engine_sfizz import *
 from zyngine.zynthian_engine_alsa_mixer import *
-from zyngine.zynthian_engine_audioplayer import *
-from zyngine.zynthian_engine_sooperlooper import *
-from zyngine.zynthian_engine_inet_radio import *
-from zyngine.zynthian_engine_sysex import *
-from zyngine.zynthian_engine_midi_control import *
 from zyngine.zynthian_midi_filter import *
 from zyngine.zynthian_zcmidi import *
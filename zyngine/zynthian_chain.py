@@ -432,6 +432,15 @@ class zynthian_chain:
         self.rebuild_midi_graph()
         self.rebuild_audio_graph()
 
+    def get_routing_state(self):
+        """Get snapshot of chain routing, used for detecting routing changes
+
+        Returns : Tuple with copies of MIDI & audio routing config
+        """
+
+        return (list(self.midi_in), list(self.midi_out), self.midi_thru,
+                list(self.audio_in), list(self.audio_out), self.audio_thru)
+
     def get_audio_out(self):
         """Get list of audio playback port names"""
 
@@ -24,6 +24,7 @@
 # ****************************************************************************
 
 import logging
+import importlib
 
 # Zynthian specific modules
 import zynautoconnect
@@ -32,8 +33,6 @@ from zyncoder.zyncore import lib_zyncore
 from zyngine import *
 from zyngine import zynthian_lv2
 from zyngine.zynthian_chain import *
-from zyngine.zynthian_engine_jalv import *
-from zyngine.zynthian_engine_pianoteq import *
 from zyngine.zynthian_signal_manager import zynsigman
 from zyngine.zynthian_processor import zynthian_processor
 from zyngui import zynthian_gui_config
@@ -58,24 +57,63 @@ ZMIP_STEP_INDEX = lib_zyncore.zmip_get_step_index()
 ZMIP_INT_INDEX = lib_zyncore.zmip_get_int_index()
 ZMIP_CTRL_INDEX = lib_zyncore.zmip_get_ctrl_index()
 
-engine2class = {
-    "ZY": zynthian_engine_zynaddsubfx,
-    "FS": zynthian_engine_fluidsynth,
-    "SF": zynthian_engine_sfizz,
-    "LS": zynthian_engine_linuxsampler,
-    "BF": zynthian_engine_setbfree,
-    'JV': zynthian_engine_jalv,
-    "AE": zynthian_engine_aeolus,
-    'PT': zynthian_engine_pianoteq,
-    "AP": zynthian_engine_audioplayer,
-    "SL": zynthian_engine_sooperlooper,
-    'SX': zynthian_engine_sysex,
-    'MC': zynthian_engine_midi_control,
-    'PD': zynthian_engine_puredata,
-    'MD': zynthian_engine_modui,
-    'IR': zynthian_engine_inet_radio
+# Engine module (and class) names indexed by engine code. Modules are imported on first use.
+engine2module = {
+    "ZY": "zynthian_engine_zynaddsubfx",
+    "FS": "zynthian_engine_fluidsynth",
+    "SF": "zynthian_engine_sfizz",
+    "LS": "zynthian_engine_linuxsampler",
+    "BF": "zynthian_engine_setbfree",
+    'JV': "zynthian_engine_jalv",
+    "AE": "zynthian_engine_aeolus",
+    'PT': "zynthian_engine_pianoteq",
+    "AP": "zynthian_engine_audioplayer",
+    "SL": "zynthian_engine_sooperlooper",
+    'SX': "zynthian_engine_sysex",
+    'MC': "zynthian_engine_midi_control",
+    'PD': "zynthian_engine_puredata",
+    'MD': "zynthian_engine_modui",
+    'IR': "zynthian_engine_inet_radio"
 }
 
+engine2class = {}  # Cache of engine classes indexed by engine code (see get_engine_class)
+
+
+def get_engine_module(eng_code):
+    """Get engine module, importing it on first use
+
+    eng_code : Engine code (only the first 2 chars are used)
+    Returns : Engine module object or None if not found
+    """
+
+    try:
+        return importlib.import_module(f"zyngine.{engine2module[eng_code[0:2]]}")
+    except KeyError:
+        logging.error(f"Can't find an engine module for '{eng_code}'")
+    except Exception as e:
+        logging.exception(f"Can't import engine module for '{eng_code}' => {e}")
+    return None
+
+
+def get_engine_class(eng_code):
+    """Get engine class, importing its module on first use
+
+    eng_code : Engine code (only the first 2 chars are used)
+    Returns : Engine class or None if not found
+    """
+
+    try:
+        return engine2class[eng_code[0:2]]
+    except KeyError:
+        pass
+    module = get_engine_module(eng_code)
+    if module is None:
+        return None
+    eng_class = getattr(module, engine2module[eng_code[0:2]])
+    engine2class[eng_code[0:2]] = eng_class
+    return eng_class
+
+
 # ----------------------------------------------------------------------------
 # Zynthian Chain Manager Class
 # ----------------------------------------------------------------------------
@@ -88,6 +126,8 @@ class zynthian_chain_manager:
     SS_MOVE_CHAIN = 2
 
     engine_info = None
+    pianoteq_info = None  # Pianoteq binary info, probed on demand (see probe_pianoteq)
+    pianoteq_info_applied = False
     single_processor_engines = ["BF", "MD", "PT", "PD", "AE", "SL", "IR"]
 
     def __init__(self, state_manager):
@@ -117,6 +157,7 @@ class zynthian_chain_manager:
         self.absolute_midi_cc_binding = {}
         self.chain_midi_cc_binding = {}  # Map of list of zctrls indexed by 16-bit CHAIN,CC
         self.chan_midi_cc_binding = {}  # Map of list of zctrls indexed by 16-bit CHAN,CC
+        self.midi_cc_dispatch = {}  # Compiled CC dispatch tables indexed by zmip (see get_midi_cc_dispatch)
 
         # Map of lists of currently held (sustained) zctrls, indexed by cc number - first element indicates pedal state
         self.held_zctrls = {
@@ -131,39 +172,64 @@ class zynthian_chain_manager:
     # ------------------------------------------------------------------------
 
     @classmethod
-    def get_engine_info(cls):
-        """Get engine config from file and add extra info"""
+    def get_engine_info(cls, probe=True):
+        """Get engine config from file and add extra info
+
+        probe : True to probe optional engines (Pianoteq) if not done yet, False to defer it
+        Returns : Engine info dictionary
+        """
 
         # Get engines info from file, including standalone engines.
         # Yes, names aren't good. They should be refactored!
         eng_info = zynthian_lv2.get_engines()
 
         # Don't recalculate if info not changed
-        if eng_info == cls.engine_info:
-            return cls.engine_info
+        if eng_info != cls.engine_info:
+            cls.engine_info = eng_info
+            # Engine classes are loaded on demand (see get_engine_class). Only check there is one.
+            for key, info in cls.engine_info.items():
+                if key[0:2] not in engine2module:
+                    logging.error(
+                        f"Engine {key} has been disabled. Can't find an engine class for it.")
+                    info['ENABLED'] = False
+            cls.pianoteq_info_applied = False
 
-        cls.engine_info = eng_info
-        # Look for an engine class for each one
-        for key, info in cls.engine_info.items():
-            try:
-                info['ENGINE'] = engine2class[key[0:2]]
-                # logging.debug(f"Found engine class for {key}")
-            except:
-                logging.error(
-                    f"Engine {key} has been disabled. Can't find an engine class for it.")
-                info['ENGINE'] = None
-                info['ENABLED'] = False
-
-        # Complete Pianoteq config
-        pt_info = get_pianoteq_binary_info()
-        if pt_info and pt_info['api']:
-            cls.engine_info['PT']['TITLE'] = pt_info['name']
-        else:
-            cls.engine_info['PT']['ENGINE'] = None
-            cls.engine_info['PT']['ENABLED'] = False
+        if probe:
+            cls.probe_pianoteq()
+        elif cls.pianoteq_info is not None and not cls.pianoteq_info_applied:
+            cls.apply_pianoteq_info()
 
         return cls.engine_info
 
+    @classmethod
+    def probe_pianoteq(cls):
+        """Get Pianoteq binary info (only first call runs the binary) and complete its config"""
+
+        if cls.pianoteq_info is None:
+            module = get_engine_module("PT")
+            try:
+                cls.pianoteq_info = module.get_pianoteq_binary_info()
+            except Exception as e:
+                logging.error(f"Can't get Pianoteq binary info => {e}")
+                cls.pianoteq_info = {}
+            cls.pianoteq_info_applied = False
+        if not cls.pianoteq_info_applied:
+            cls.apply_pianoteq_info()
+
+    @classmethod
+    def apply_pianoteq_info(cls):
+        """Complete Pianoteq config from probed binary info"""
+
+        try:
+            pt_engine_info = cls.engine_info['PT']
+        except (KeyError, TypeError):
+            return
+        if cls.pianoteq_info and cls.pianoteq_info['api']:
+            pt_engine_info['TITLE'] = cls.pianoteq_info['name']
+        else:
+            pt_engine_info['ENABLED'] = False
+        cls.pianoteq_info_applied = True
+
     @classmethod
     def save_engine_info(cls):
         """Save the engine config to file"""
@@ -1014,8 +1080,12 @@ class zynthian_chain_manager:
             zyngine = self.zyngines[eng_code]
         else:
             # Start new engine instance
-            info = self.engine_info[eng_code]
-            zynthian_engine_class = info["ENGINE"]
+            if eng_code == "PT":
+                self.probe_pianoteq()
+            zynthian_engine_class = get_engine_class(eng_code)
+            if zynthian_engine_class is None:
+                logging.error(f"Can't load engine class for '{eng_code}'!")
+                return None
             if eng_code[0:3] == "JV/":
                 eng_key = f"JV/{self.zyngine_counter}"
                 zyngine = zynthian_engine_class(
@@ -1248,6 +1318,8 @@ class zynthian_chain_manager:
             else:
                 self.absolute_midi_cc_binding[key] = [zctrl]
 
+        self.invalidate_midi_cc_dispatch()
+
         # Ensure pedals are always learnt in absolute mode.
         # TODO: This is not OK, just mitigates issue #1277 until a proper solution is implemented
         #  => MIDI CC mode should be stored with MIDI learn info in chain manager, not in zctrl!!
@@ -1298,6 +1370,7 @@ class zynthian_chain_manager:
                 pass
             if not zctrls:
                 self.chain_midi_cc_binding.pop(key)
+        self.invalidate_midi_cc_dispatch()
 
         """
         if proc.eng_code == "MD":
@@ -1317,6 +1390,71 @@ class zynthian_chain_manager:
             if zctrl in zctrls:
                 return [key, False]  # TODO: This isn't right!
 
+    def invalidate_midi_cc_dispatch(self):
+        """Discard compiled CC dispatch tables. They are rebuilt on demand."""
+
+        self.midi_cc_dispatch = {}
+
+    def get_midi_cc_dispatch(self, zmip):
+        """Get the compiled CC dispatch table for a MIDI input device
+
+        zmip : Index of MIDI input device
+        returns : List of 16x128 entries indexed by CHAN << 7 | CC. Each entry is None or a list of
+                  [zctrl, pedal] pairs, where pedal is True if the zctrl is subject to pedal handling.
+
+        Tables merge absolute bindings with chain (ACTI mode) or channel (MULTI mode) bindings, so they are
+        recompiled when the device mode or the active chain changes, or when MIDI learn bindings are modified.
+        """
+
+        dev_mode = zynautoconnect.get_midi_in_dev_mode(zmip)
+        active_chain_id = self.active_chain_id
+        # Bindings are modified from other threads. If tables are invalidated while compiling, this table
+        # is stored in the discarded cache, so it's used for current message only.
+        midi_cc_dispatch = self.midi_cc_dispatch
+        try:
+            dispatch = midi_cc_dispatch[zmip]
+            if dispatch[0] == dev_mode and (not dev_mode or dispatch[1] == active_chain_id):
+                return dispatch[2]
+        except KeyError:
+            pass
+
+        table = [None] * 2048
+        for key, zctrls in list(self.absolute_midi_cc_binding.items()):
+            if (key >> 24) & 0xff == zmip:
+                i = ((key >> 9) & 0x780) | ((key >> 8) & 0x7f)
+                table[i] = [[zctrl, False] for zctrl in list(zctrls)]
+        if dev_mode:
+            # Active chain bindings apply to all MIDI channels
+            if active_chain_id is not None:
+                for key, zctrls in list(self.chain_midi_cc_binding.items()):
+                    if (key >> 16) & 0xff == active_chain_id:
+                        cc_num = (key >> 8) & 0x7f
+                        entry = [[zctrl, cc_num in self.held_zctrls] for zctrl in list(zctrls)]
+                        for i in range(cc_num, 2048, 128):
+                            table[i] = (table[i] or []) + entry
+        else:
+            for key, zctrls in list(self.chan_midi_cc_binding.items()):
+                cc_num = (key >> 8) & 0x7f
+                i = ((key >> 9) & 0x780) | cc_num
+                table[i] = (table[i] or []) + [[zctrl, cc_num in self.held_zctrls] for zctrl in list(zctrls)]
+
+        midi_cc_dispatch[zmip] = [dev_mode, active_chain_id, table]
+        return table
+
+    def get_midi_cc_zctrls(self, zmip, midi_chan, cc_num):
+        """Get the controllers that a MIDI CC message would be sent to
+
+        zmip : Index of MIDI input device
+        midi_chan : MIDI channel
+        cc_num : CC number
+        returns : List of zctrls
+        """
+
+        entry = self.get_midi_cc_dispatch(zmip)[(midi_chan << 7) | cc_num]
+        if entry is None:
+            return []
+        return [zctrl for zctrl, pedal in entry]
+
     def midi_control_change(self, zmip, midi_chan, cc_num, cc_val):
         """Send MIDI CC message to relevant chain
 
@@ -1326,21 +1464,17 @@ class zynthian_chain_manager:
         cc_val : CC value
         """
 
-        # Handle bank change (CC0/32)
-        # TODO: Validate and optimise bank change code
-        if zynthian_gui_config.midi_bank_change:
-            for chain_id in self.midi_chan_2_chain_ids[midi_chan]:
-                chain = self.chains[chain_id]
-                if cc_num == 0:
-                    for processor in chain.get_processors():
+        # Handle bank change (CC0/32) => first processor of first chain in MIDI channel
+        if (cc_num == 0 or cc_num == 32) and zynthian_gui_config.midi_bank_change:
+            chain_ids = self.midi_chan_2_chain_ids[midi_chan]
+            if chain_ids:
+                for processor in self.chains[chain_ids[0]].get_processors():
+                    if cc_num == 0:
                         processor.midi_bank_msb(cc_val)
-                        break
-                    return
-                elif cc_num == 32:
-                    for processor in chain.get_processors():
+                    else:
                         processor.midi_bank_lsb(cc_val)
-                        break
-                    return
+                    break
+                return
 
         # Handle controller feedback from setBfree engine => setBfree sends feedback in channel 0
         # Each engine sending feedback should use a separated zmip, currently only setBfree does.
@@ -1350,8 +1484,7 @@ class zynthian_chain_manager:
                 for proc in zynautoconnect.ctrl_fb_procs:
                     if proc.part_i == midi_chan:
                         key = (proc.chain_id << 16) | (cc_num << 8)
-                        zctrls = self.chain_midi_cc_binding[key]
-                        for zctrl in zctrls:
+                        for zctrl in self.chain_midi_cc_binding.get(key, []):
                             # logging.debug(f"CONTROLLER FEEDBACK {zctrl.symbol} ({midi_chan}) => {cc_val}")
                             zctrl.midi_control_change(cc_val, send=False)
             except Exception as e:
@@ -1359,35 +1492,21 @@ class zynthian_chain_manager:
                     f"Can't manage control feedback for CH{midi_chan}:CC{cc_num} => {e}")
             return
 
-        # Handle absolute CC binding
+        # Handle absolute, active chain & channel CC bindings
         try:
-            key = (zmip << 24) | (midi_chan << 16) | (cc_num << 8)
-            zctrls = self.absolute_midi_cc_binding[key]
-            for zctrl in zctrls:
-                zctrl.midi_control_change(cc_val)
-        except:
-            pass
-
-        # Handle active chain CC binding
-        if zynautoconnect.get_midi_in_dev_mode(zmip):
-            try:
-                key = (self.active_chain_id << 16) | (cc_num << 8)
-                zctrls = self.chain_midi_cc_binding[key]
-                for zctrl in zctrls:
-                    zctrl.midi_control_change(cc_val)
-                    self.handle_pedals(cc_num, cc_val, zctrl)
-            except:
-                pass
-        # Handle channel CC binding
-        else:
+            entry = self.get_midi_cc_dispatch(zmip)[(midi_chan << 7) | cc_num]
+        except Exception as e:
+            logging.error(f"Can't get CC dispatch table for device {zmip} => {e}")
+            return
+        if entry is None:
+            return
+        for zctrl, pedal in entry:
             try:
-                key = (midi_chan << 16) | (cc_num << 8)
-                zctrls = self.chan_midi_cc_binding[key]
-                for zctrl in zctrls:
-                    zctrl.midi_control_change(cc_val)
+                zctrl.midi_control_change(cc_val)
+                if pedal:
                     self.handle_pedals(cc_num, cc_val, zctrl)
-            except:
-                pass
+            except Exception as e:
+                logging.error(f"Can't process CH{midi_chan}:CC{cc_num} for {zctrl.symbol} => {e}")
 
     def handle_pedals(self, cc_num, cc_val, zctrl):
         """Handle pedal CC
@@ -1650,7 +1769,8 @@ class zynthian_chain_manager:
 # -----------------------------------------------------------------------------
 
 
-# Call class method to get engine info into the "engine_info" class variable
-zynthian_chain_manager.get_engine_info()
+# Call class method to get engine info into the "engine_info" class variable.
+# Probing optional engines is deferred until the engine list is needed.
+zynthian_chain_manager.get_engine_info(probe=False)
 
 # -----------------------------------------------------------------------------
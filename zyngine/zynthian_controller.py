@@ -33,6 +33,12 @@ from zyncoder.zyncore import lib_zyncore
 
 MIDI_CC_MODE_DETECT_TIMEOUT = 0.2
 MIDI_CC_MODE_DETECT_STEPS = 8
+# Relative CC modes => [zero value, min delta, max delta]
+MIDI_CC_REL_MODES = {
+    1: [64, -64, 63],
+    2: [0, -64, 63],
+    3: [16, -16, 111]
+}
 
 
 class zynthian_controller:
@@ -377,27 +383,41 @@ class zynthian_controller:
     def send_value(self, send=True):
         mval = None
         if self.engine and send:
-            # Send value using engine method...
-            try:
-                self.engine.send_controller_value(self)
-            # Send value using OSC/MIDI ...
-            except:
-                try:
-                    if self.osc_path:
-                        # logging.debug("Sending OSC Controller '{}', {} => {}".format(self.symbol, self.osc_path, self.get_ctrl_osc_val()))
-                        liblo.send(self.engine.osc_target, self.osc_path, self.get_ctrl_osc_val())
-                    elif self.midi_cc:
-                        mval = self.get_ctrl_midi_val()
-                        # logging.debug("Sending MIDI Controller '{}', CH{}#CC{}={}".format(self.symbol, self.midi_chan, self.midi_cc, mval))
-                        self.send_midi_cc(mval)
-                except Exception as e:
-                    logging.warning("Can't send controller '{}' => {}".format(self.symbol, e))
+            # Rate limited engines merge fast value changes and send them from their own thread
+            if getattr(self.engine, "ctrl_send_rate", 0):
+                self.engine.queue_controller_value(self)
+            else:
+                mval = self.send_engine_value()
 
         # Send feedback to MIDI controllers => What MIDI controllers? Those selected as MIDI-out?
         # TODO: Set midi_feeback to MIDI learn
         if self.midi_feedback:
             self.send_midi_feedback(mval)
 
+    def send_engine_value(self):
+        """Send current value to engine
+
+        Returns MIDI value if sent as MIDI CC, None otherwise
+        """
+
+        mval = None
+        # Send value using engine method...
+        try:
+            self.engine.send_controller_value(self)
+        # Send value using OSC/MIDI ...
+        except:
+            try:
+                if self.osc_path:
+                    # logging.debug("Sending OSC Controller '{}', {} => {}".format(self.symbol, self.osc_path, self.get_ctrl_osc_val()))
+                    liblo.send(self.engine.osc_target, self.osc_path, self.get_ctrl_osc_val())
+                elif self.midi_cc:
+                    mval = self.get_ctrl_midi_val()
+                    # logging.debug("Sending MIDI Controller '{}', CH{}#CC{}={}".format(self.symbol, self.midi_chan, self.midi_cc, mval))
+                    self.send_midi_cc(mval)
+            except Exception as e:
+                logging.warning("Can't send controller '{}' => {}".format(self.symbol, e))
+        return mval
+
     def send_midi_cc(self, mval=None):
         if mval is None:
             mval = self.get_ctrl_midi_val()
@@ -586,6 +606,39 @@ class zynthian_controller:
     def midi_cc_mode_reset(self):
         self.midi_cc_mode = -1
 
+    def get_midi_cc_coalesce_mode(self):
+        """Get the CC mode to use when merging several CC values into one
+
+        Returns 0 if only the last absolute value matters, 1-3 if relative deltas can be added,
+        None if every CC value must be processed (mode unknown, momentary switch, non-linear nudge)
+        """
+
+        if self.midi_cc_mode < 0 or self.midi_cc_momentary_switch:
+            return None
+        if self.midi_cc_mode > 0 and (self.is_logarithmic or self.is_toggle):
+            return None
+        return self.midi_cc_mode
+
+    @staticmethod
+    def midi_cc_rel2delta(cc_mode, val):
+        """Get the delta encoded by a relative mode CC value"""
+
+        if cc_mode == 2 and val >= 64:
+            return val - 128
+        return val - MIDI_CC_REL_MODES[cc_mode][0]
+
+    @staticmethod
+    def midi_cc_delta2rel(cc_mode, dval):
+        """Encode a delta as a list of relative mode CC values"""
+
+        zero, dmin, dmax = MIDI_CC_REL_MODES[cc_mode]
+        vals = []
+        while dval:
+            step = min(dmax, max(dmin, dval))
+            vals.append((zero + step) & 0x7F)
+            dval -= step
+        return vals
+
     def midi_cc_mode_set(self, cc_mode):
         self.midi_cc_mode = cc_mode
 
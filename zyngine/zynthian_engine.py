@@ -31,11 +31,13 @@ import liblo
 import logging
 import pexpect
 import fnmatch
-from time import sleep
+from threading import Thread, Lock, Event
+from time import sleep, monotonic
 from os.path import isfile, isdir, join
 
 import zynautoconnect
 from . import zynthian_controller
+from .zynthian_fs_index import zynexindex, get_fs_index
 from zyngui import zynthian_gui_config
 
 # --------------------------------------------------------------------------------
@@ -161,6 +163,12 @@ class zynthian_engine(zynthian_basic_engine):
     preset_fexts = []
     root_bank_dirs = []
 
+    # Max rate (Hz) for sending controller values to the engine. Values changed faster are merged,
+    # sending only the last one. 0 => send synchronously from the thread changing the value.
+    ctrl_send_rate = 0
+    # Seconds without pending values before the controller send thread ends
+    ctrl_send_idle_timeout = 2
+
     # ---------------------------------------------------------------------------
     # Initialization
     # ---------------------------------------------------------------------------
@@ -194,6 +202,11 @@ class zynthian_engine(zynthian_basic_engine):
         self.preset_favs_fpath = None
         self.show_favs_bank = True
 
+        self.ctrl_send_pending = {}  # zctrls waiting to be sent, in order of change (value is not used)
+        self.ctrl_send_lock = Lock()
+        self.ctrl_send_event = Event()
+        self.ctrl_send_thread = None
+
     def reset(self):
         pass
         # TODO: OSC, IPC, ...
@@ -278,6 +291,9 @@ class zynthian_engine(zynthian_basic_engine):
 
     @classmethod
     def find_some_preset_file(cls, path, recursion=1):
+        fsindex = get_fs_index(path)
+        if fsindex:
+            return len(fsindex.find(path, cls.preset_fexts, first=True)) > 0
         rules = []
         for ext in cls.preset_fexts:
             rules.append(fnmatch.translate("*." + ext))
@@ -289,6 +305,9 @@ class zynthian_engine(zynthian_basic_engine):
 
     @classmethod
     def find_all_preset_files(cls, path, recursion=1):
+        fsindex = get_fs_index(path)
+        if fsindex:
+            return sorted(fsindex.find(path, cls.preset_fexts), key=str.casefold)
         rules = []
         for ext in cls.preset_fexts:
             rules.append(fnmatch.translate("*." + ext))
@@ -311,8 +330,13 @@ class zynthian_engine(zynthian_basic_engine):
             dp = dpd[1]
             dn = dpd[0]
             try:
-                for f in sorted(os.listdir(dp)):
-                    if not f.startswith('.') and isfile(join(dp, f)) and f[-xlen:].lower() == fext:
+                fsindex = get_fs_index(dp)
+                if fsindex:
+                    fnames = fsindex.listdir(dp)[1]
+                else:
+                    fnames = [f for f in sorted(os.listdir(dp)) if isfile(join(dp, f))]
+                for f in fnames:
+                    if not f.startswith('.') and f[-xlen:].lower() == fext:
                         title = str.replace(f[:-xlen], '_', ' ')
                         if dn != '_':
                             title = dn + '/' + title
@@ -326,7 +350,27 @@ class zynthian_engine(zynthian_basic_engine):
         return res
 
     @staticmethod
-    def get_dirlist(dpath, exclude_empty=True):
+    def get_subdirs(dpath):
+        """Get sorted subdirectory names, from filesystem index if path is indexed"""
+
+        fsindex = get_fs_index(dpath)
+        if fsindex:
+            listing = fsindex.listdir(dpath)
+            if listing is None:
+                raise FileNotFoundError(f"Can't access directory '{dpath}'")
+            return listing[0]
+        return sorted(next(os.walk(dpath))[1])
+
+    @staticmethod
+    def is_empty_dir(dpath):
+        fsindex = get_fs_index(dpath)
+        if fsindex:
+            listing = fsindex.listdir(dpath)
+            return listing is None or (not listing[0] and not listing[1])
+        return next(os.scandir(dpath), None) is None
+
+    @classmethod
+    def get_dirlist(cls, dpath, exclude_empty=True):
         res = []
         if isinstance(dpath, str):
             dpath = [('_', dpath)]
@@ -335,11 +379,11 @@ class zynthian_engine(zynthian_basic_engine):
             dp = dpd[1]
             dn = dpd[0]
             try:
-                for f in sorted(os.listdir(dp)):
+                for f in cls.get_subdirs(dp):
                     dpath = join(dp, f)
-                    if not os.path.isdir(dpath) or (exclude_empty and next(os.scandir(dpath), None) is None):
+                    if exclude_empty and cls.is_empty_dir(dpath):
                         continue
-                    if not f.startswith('.') and isdir(dpath):
+                    if not f.startswith('.'):
                         title, ext = os.path.splitext(f)
                         title = str.replace(title, '_', ' ')
                         if dn != '_':
@@ -352,28 +396,42 @@ class zynthian_engine(zynthian_basic_engine):
 
         return res
 
+    @classmethod
+    def get_external_storage_dirs(cls):
+        """Get mounted external storage directories, starting background indexing of new ones"""
+
+        exdirs = zynthian_gui_config.get_external_storage_dirs(cls.ex_data_dir)
+        zynexindex.check_mounts(exdirs)
+        return exdirs
+
+    @staticmethod
+    def get_external_storage_title(exd):
+        """Get bank list header of external storage, with indexing progress"""
+
+        title = f"USB> {os.path.basename(exd)}"
+        progress = zynexindex.get_progress(exd)
+        if progress and not progress["done"]:
+            title += f" (indexing... {progress['files']} files)"
+        return title
+
     # Get bank dir list
     @classmethod
     def get_bank_dirlist(cls, recursion=1, exclude_empty=True, internal_include_empty=False):
         banks = []
 
         # External storage banks
-        for exd in zynthian_gui_config.get_external_storage_dirs(cls.ex_data_dir):
+        for exd in cls.get_external_storage_dirs():
             sbanks = []
             # Add root directory in external storage
             if not exclude_empty or cls.find_some_preset_file(exd, 0):
                 sbanks.append([exd, None, "/", None, "/"])
             # Walk directories inside root
-            walk = next(os.walk(exd))
-            walk[1].sort()
-            for root_bank_dir in walk[1]:
-                root_bank_path = walk[0] + "/" + root_bank_dir
+            for root_bank_dir in cls.get_subdirs(exd):
+                root_bank_path = exd + "/" + root_bank_dir
                 if not exclude_empty or cls.find_some_preset_file(root_bank_path, recursion + 1):
-                    walk = next(os.walk(root_bank_path))
-                    walk[1].sort()
                     count = 0
-                    for bank_dir in walk[1]:
-                        bank_path = walk[0] + "/" + bank_dir
+                    for bank_dir in cls.get_subdirs(root_bank_path):
+                        bank_path = root_bank_path + "/" + bank_dir
                         if not exclude_empty or cls.find_some_preset_file(bank_path, recursion):
                             sbanks.append(
                                 [bank_path, None, root_bank_dir + "/" + bank_dir, None, bank_dir])
@@ -386,16 +444,14 @@ class zynthian_engine(zynthian_basic_engine):
             # Add root's header and banks
             if len(sbanks):
                 banks.append(
-                    [None, None, f"USB> {os.path.basename(exd)}", None, None])
+                    [None, None, cls.get_external_storage_title(exd), None, None])
                 banks += sbanks
 
         # Internal storage banks
         for root_bank_dir in cls.root_bank_dirs:
             sbanks = []
-            walk = next(os.walk(root_bank_dir[1]))
-            walk[1].sort()
-            for bank_dir in walk[1]:
-                bank_path = walk[0] + "/" + bank_dir
+            for bank_dir in cls.get_subdirs(root_bank_dir[1]):
+                bank_path = root_bank_dir[1] + "/" + bank_dir
                 if (not exclude_empty or internal_include_empty) or cls.find_some_preset_file(bank_path, recursion):
                     sbanks.append([bank_path, None, bank_dir, None, bank_dir])
             if len(sbanks):
@@ -686,6 +742,61 @@ class zynthian_engine(zynthian_basic_engine):
     def send_controller_value(self, zctrl):
         raise Exception("NOT IMPLEMENTED!")
 
+    def send_controller_values(self, zctrls):
+        """Send a batch of controller values. Engines may override it for sending all values at once.
+
+        zctrls : List of controllers
+        """
+
+        for zctrl in zctrls:
+            zctrl.send_engine_value()
+
+    def queue_controller_value(self, zctrl):
+        """Queue a controller value to be sent by the controller send thread, at ctrl_send_rate max.
+
+        The value is read when sending, so only the last value is sent if it changes several times.
+        zctrl : Controller object
+        """
+
+        with self.ctrl_send_lock:
+            self.ctrl_send_pending[zctrl] = None
+            if self.ctrl_send_thread is None:
+                self.ctrl_send_thread = Thread(target=self.ctrl_send_thread_task, args=())
+                self.ctrl_send_thread.name = f"ctrl_send_{self.nickname}"
+                self.ctrl_send_thread.daemon = True  # thread dies with the program
+                self.ctrl_send_thread.start()
+        self.ctrl_send_event.set()
+
+    def flush_controller_values(self):
+        """Send queued controller values now, from the calling thread"""
+
+        with self.ctrl_send_lock:
+            zctrls = list(self.ctrl_send_pending)
+            self.ctrl_send_pending.clear()
+        if zctrls:
+            self.send_controller_values(zctrls)
+
+    def ctrl_send_thread_task(self):
+        period = 1 / self.ctrl_send_rate
+        while True:
+            if not self.ctrl_send_event.wait(self.ctrl_send_idle_timeout):
+                # Idle => end thread. It's restarted when needed.
+                with self.ctrl_send_lock:
+                    if not self.ctrl_send_pending:
+                        self.ctrl_send_thread = None
+                        return
+            ts = monotonic()
+            with self.ctrl_send_lock:
+                self.ctrl_send_event.clear()
+                zctrls = list(self.ctrl_send_pending)
+                self.ctrl_send_pending.clear()
+            if zctrls:
+                try:
+                    self.send_controller_values(zctrls)
+                except Exception as e:
+                    logging.error(f"Can't send controller values to {self.name} => {e}")
+            sleep(max(0, period - (monotonic() - ts)))
+
     # ---------------------------------------------------------------------------
     # Options and Extended Config
     # ---------------------------------------------------------------------------
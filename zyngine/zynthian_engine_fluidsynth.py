@@ -28,11 +28,16 @@ import copy
 import shutil
 import logging
 import oyaml as yaml
+from collections import deque
+from time import sleep, monotonic
+from threading import Thread, Lock, RLock
 from subprocess import check_output
 
 import zynautoconnect
 from . import zynthian_engine
 from . import zynthian_controller
+from . import zynthian_soundfont
+from zyngine.zynthian_signal_manager import zynsigman
 from zyngui import zynthian_gui_config
 from zyncoder.zyncore import lib_zyncore
 
@@ -91,6 +96,11 @@ class zynthian_engine_fluidsynth(zynthian_engine):
         ('System', zynthian_engine.data_dir + "/soundfonts/sf2")
     ]
 
+    # Memory budget for loaded soundfonts. Unused soundfonts are kept loaded until it's exceeded.
+    soundfont_budget = 1000000 * int(os.environ.get('ZYNTHIAN_FLUIDSYNTH_SOUNDFONT_BUDGET_MB', "256"))
+    # Soundfonts are preloaded only after the engine has been idle (no bank/preset selection) for this time (seconds)
+    preload_idle_time = 3.0
+
     # ---------------------------------------------------------------------------
     # Initialization
     # ---------------------------------------------------------------------------
@@ -110,12 +120,26 @@ class zynthian_engine_fluidsynth(zynthian_engine):
             self.fs_options)
         self.command_prompt = "\n> "
 
+        self.proc_lock = Lock()  # Serialize fluidsynth commands (soundfonts are preloaded from a background thread)
+        self.soundfont_lock = RLock()  # Protect soundfont index
+        self.preload_lock = Lock()
+        self.preload_queue = deque()
+        self.preload_thread = None
+        self.last_select_ts = monotonic()  # Time of last bank/preset selection
+
         self.start()
         self.reset()
 
+        if self.state_manager:
+            zynsigman.register_queued(zynsigman.S_STATE_MAN, self.state_manager.SS_LOAD_SNAPSHOT, self.cb_zs3_changed)
+            zynsigman.register_queued(zynsigman.S_STATE_MAN, self.state_manager.SS_SAVE_ZS3, self.cb_zs3_changed)
+            zynsigman.register_queued(zynsigman.S_STATE_MAN, self.state_manager.SS_LOAD_ZS3, self.cb_zs3_changed)
+
     def reset(self):
         super().reset()
+        # Loaded soundfonts, least recently used first => {fpath: soundfont ID}
         self.soundfont_index = {}
+        self.soundfont_size = {}
         self.unload_unused_soundfonts()
 
     # ---------------------------------------------------------------------------
@@ -123,14 +147,25 @@ class zynthian_engine_fluidsynth(zynthian_engine):
     # ---------------------------------------------------------------------------
 
     def stop(self):
-        try:
-            self.proc.sendline("quit")
-            self.proc.expect("\ncheers!")
-            # We have asked nicely but sometimes fluidsynth needs more encouragement...
-            self.proc.terminate(True)
-            self.proc = None
-        except:
-            super().stop()
+        if self.state_manager:
+            zynsigman.unregister(zynsigman.S_STATE_MAN, self.state_manager.SS_LOAD_SNAPSHOT, self.cb_zs3_changed)
+            zynsigman.unregister(zynsigman.S_STATE_MAN, self.state_manager.SS_SAVE_ZS3, self.cb_zs3_changed)
+            zynsigman.unregister(zynsigman.S_STATE_MAN, self.state_manager.SS_LOAD_ZS3, self.cb_zs3_changed)
+        with self.preload_lock:
+            self.preload_queue.clear()
+        with self.proc_lock:
+            try:
+                self.proc.sendline("quit")
+                self.proc.expect("\ncheers!")
+                # We have asked nicely but sometimes fluidsynth needs more encouragement...
+                self.proc.terminate(True)
+                self.proc = None
+            except:
+                super().stop()
+
+    def proc_cmd(self, cmd):
+        with self.proc_lock:
+            return super().proc_cmd(cmd)
 
     # ---------------------------------------------------------------------------
     # Processor Management
@@ -175,11 +210,11 @@ class zynthian_engine_fluidsynth(zynthian_engine):
         logging.debug(f"LOADING BANK FILES ...")
 
         # External storage banks
-        for exd in zynthian_gui_config.get_external_storage_dirs(cls.ex_data_dir):
+        for exd in cls.get_external_storage_dirs():
             flist = cls.find_all_preset_files(exd, recursion=2)
             if not exclude_empty or len(flist) > 0:
                 banks.append(
-                    [None, None, f"USB> {os.path.basename(exd)}", None, None])
+                    [None, None, cls.get_external_storage_title(exd), None, None])
             for fpath in flist:
                 fname = os.path.basename(fpath)
                 title, filext = os.path.splitext(fname)
@@ -211,16 +246,23 @@ class zynthian_engine_fluidsynth(zynthian_engine):
             return False
 
     def load_bank(self, bank_fpath, unload_unused_sf=True):
-        if bank_fpath in self.soundfont_index:
-            return True
-        elif self.load_soundfont(bank_fpath):
-            self.load_bank_config(bank_fpath)
-            if unload_unused_sf:
-                self.unload_unused_soundfonts()
-            self.set_all_presets()
-            return True
-        else:
-            return False
+        self.cancel_preload()
+        try:
+            with self.soundfont_lock:
+                if bank_fpath in self.soundfont_index:
+                    self.touch_soundfont(bank_fpath)
+                    return True
+                elif self.load_soundfont(bank_fpath):
+                    self.load_bank_config(bank_fpath)
+                    if unload_unused_sf:
+                        self.unload_unused_soundfonts()
+                    self.set_all_presets()
+                    return True
+                else:
+                    return False
+        finally:
+            # Idle time is counted from end of loading
+            self.last_select_ts = monotonic()
 
     def load_bank_config(self, bank_fpath):
         config_fpath = bank_fpath[0:-3] + "yml"
@@ -248,6 +290,15 @@ class zynthian_engine_fluidsynth(zynthian_engine):
     def get_preset_list(self, bank):
         logging.info("Getting Preset List for {}".format(bank[2]))
         preset_list = []
+        # Get preset headers from soundfont file, so it's not needed to load soundfont in fluidsynth
+        presets = zynthian_soundfont.get_preset_headers(bank[0])
+        if presets is not None:
+            for bank_num, prg, name in presets:
+                preset_list.append([f"{bank[0]}/{bank_num:03d}-{prg:03d} {name}",
+                                    [bank_num % 128, int(bank_num / 128), prg], name.replace('_', ' '), bank[0]])
+            return preset_list
+
+        # Fallback => Load soundfont & get preset list from fluidsynth
         try:
             sfi = self.soundfont_index[bank[0]]
         except:
@@ -270,6 +321,7 @@ class zynthian_engine_fluidsynth(zynthian_engine):
         return preset_list
 
     def set_preset(self, processor, preset, preload=False):
+        self.cancel_preload()
         try:
             sfi = self.soundfont_index[preset[3]]
         except:
@@ -277,6 +329,7 @@ class zynthian_engine_fluidsynth(zynthian_engine):
                 sfi = self.soundfont_index[preset[3]]
             else:
                 return False
+        self.touch_soundfont(preset[3])
 
         midi_bank = preset[1][0]+preset[1][1]*128
         midi_prg = preset[1][2]
@@ -364,15 +417,27 @@ class zynthian_engine_fluidsynth(zynthian_engine):
     # Specific functions
     # ---------------------------------------------------------------------------
 
-    def load_soundfont(self, sf):
-        if sf not in self.soundfont_index:
+    def load_soundfont(self, sf, reset=True):
+        """Load soundfont in fluidsynth
+
+        sf : Soundfont file path
+        reset : False to keep channel presets (background preload)
+        returns : Soundfont ID or False if it can't be loaded
+        """
+
+        with self.soundfont_lock:
+            if sf in self.soundfont_index:
+                return self.soundfont_index[sf]
             logging.info(f"Loading SoundFont '{sf}' ...")
             # Send command to FluidSynth
-            output = self.proc_cmd(f"load \"{sf}\"")
+            if reset:
+                output = self.proc_cmd(f"load \"{sf}\"")
+            else:
+                output = self.proc_cmd(f"load \"{sf}\" 0")
             # Parse ouput ...
             sfi = None
             cre = re.compile(r"loaded SoundFont has ID (\d+)")
-            for line in output.split("\n"):
+            for line in (output or "").split("\n"):
                 # logging.debug(f" => {line}")
                 res = cre.match(line)
                 if res:
@@ -382,33 +447,144 @@ class zynthian_engine_fluidsynth(zynthian_engine):
                 logging.info(f"Loaded SoundFont '{sf}' => {sfi}")
                 # Insert ID in soundfont_index dictionary
                 self.soundfont_index[sf] = sfi
+                self.soundfont_size[sf] = self.get_soundfont_size(sf)
                 # Return soundfont ID
                 return sfi
             else:
                 logging.warning("SoundFont '{}' can't be loaded".format(sf))
                 return False
-        else:
-            return self.soundfont_index[sf]
 
-    def unload_unused_soundfonts(self):
-        # Make a copy of soundfont index and remove used soundfonts
-        sf_unload = copy.copy(self.soundfont_index)
+    @staticmethod
+    def get_soundfont_size(sf):
+        """Estimate memory used by a loaded soundfont from its file size (SF3 samples are compressed, so it's a low estimate)"""
+
+        try:
+            return os.path.getsize(sf)
+        except OSError:
+            return 0
+
+    def get_loaded_soundfonts_size(self):
+        with self.soundfont_lock:
+            return sum(self.soundfont_size.get(sf, 0) for sf in self.soundfont_index)
+
+    def touch_soundfont(self, sf):
+        """Mark soundfont as most recently used"""
+
+        with self.soundfont_lock:
+            try:
+                self.soundfont_index[sf] = self.soundfont_index.pop(sf)
+            except KeyError:
+                pass
+
+    def get_used_soundfonts(self):
+        """Get soundfonts selected by processors"""
+
+        used = set()
         for processor in self.processors:
             bi = processor.bank_info
-            if bi is not None:
-                if bi[2] and bi[0] in sf_unload:
-                    # print("Skip "+bi[0]+"("+str(sf_unload[bi[0]])+")")
-                    del sf_unload[bi[0]]
+            if bi is not None and bi[2]:
+                used.add(bi[0])
             pi = processor.preset_info
-            if pi is not None:
-                if pi[2] and pi[3] in sf_unload:
-                    # print("Skip "+pi[0]+"("+str(sf_unload[pi[3]])+")")
-                    del sf_unload[pi[3]]
-        # Then, remove the remaining ;-)
-        for sf, sfi in sf_unload.items():
-            logging.info("Unload SoundFont => {}".format(sfi))
-            self.proc_cmd("unload {}".format(sfi))
-            del self.soundfont_index[sf]
+            if pi is not None and pi[2]:
+                used.add(pi[3])
+        return used
+
+    def unload_unused_soundfonts(self, budget=None):
+        """Unload least recently used soundfonts not selected by any processor, until loaded soundfonts fit in memory budget
+
+        budget : Memory budget in bytes (default: soundfont_budget). 0 unloads all unused soundfonts.
+        """
+
+        if budget is None:
+            budget = self.soundfont_budget
+        with self.soundfont_lock:
+            used = self.get_used_soundfonts()
+            size = self.get_loaded_soundfonts_size()
+            for sf, sfi in list(self.soundfont_index.items()):
+                if size <= budget:
+                    break
+                if sf in used:
+                    continue
+                logging.info("Unload SoundFont => {}".format(sfi))
+                self.proc_cmd("unload {}".format(sfi))
+                del self.soundfont_index[sf]
+                size -= self.soundfont_size.pop(sf, 0)
+
+    def get_zs3_soundfonts(self):
+        """Get soundfonts selected by this engine's processors in stored ZS3s"""
+
+        sfs = []
+        proc_ids = [str(processor.id) for processor in self.processors]
+        for zs3_id in list(self.state_manager.zs3):
+            try:
+                zs3_state = self.state_manager.get_zs3_state(zs3_id)
+            except Exception as e:
+                logging.warning(f"Can't get ZS3 '{zs3_id}' state => {e}")
+                continue
+            for proc_id, proc_state in zs3_state.get("processors", {}).items():
+                if str(proc_id) not in proc_ids or not isinstance(proc_state, dict):
+                    continue
+                try:
+                    sf = proc_state["preset_info"][3]
+                except (KeyError, IndexError, TypeError):
+                    try:
+                        sf = proc_state["bank_info"][0]
+                    except (KeyError, IndexError, TypeError):
+                        continue
+                if sf and sf not in sfs:
+                    sfs.append(sf)
+        return sfs
+
+    def cb_zs3_changed(self, **kwargs):
+        self.preload_soundfonts(self.get_zs3_soundfonts())
+
+    def preload_soundfonts(self, sfs):
+        """Load soundfonts in background while they fit in memory budget, so selecting them is instantaneous.
+
+        Loaded soundfonts are never unloaded for preloading. Preloading waits until engine is idle (see preload_idle_time)
+        and it's cancelled by bank/preset selection, so selection waits for one soundfont load at most.
+        sfs : List of soundfont file paths, by priority
+        """
+
+        with self.preload_lock:
+            self.preload_queue = deque(sfs)
+            if self.preload_queue and self.preload_thread is None:
+                self.preload_thread = Thread(target=self.preload_thread_task, args=())
+                self.preload_thread.name = f"preload_{self.nickname}"
+                self.preload_thread.daemon = True  # thread dies with the program
+                self.preload_thread.start()
+
+    def cancel_preload(self):
+        """Discard pending soundfont preloads before selecting bank/preset"""
+
+        with self.preload_lock:
+            self.preload_queue.clear()
+            self.last_select_ts = monotonic()
+
+    def preload_thread_task(self):
+        while True:
+            with self.preload_lock:
+                if not self.preload_queue or self.proc is None:
+                    self.preload_thread = None
+                    return
+                # Wait until engine is idle
+                idle_wait = self.preload_idle_time - (monotonic() - self.last_select_ts)
+                if idle_wait <= 0:
+                    sf = self.preload_queue.popleft()
+            if idle_wait > 0:
+                sleep(idle_wait)
+                continue
+            with self.soundfont_lock:
+                if sf in self.soundfont_index or not os.path.isfile(sf):
+                    continue
+                if self.get_loaded_soundfonts_size() + self.get_soundfont_size(sf) > self.soundfont_budget:
+                    logging.debug(f"Not preloading SoundFont '{sf}' => memory budget exceeded")
+                    continue
+                try:
+                    if self.load_soundfont(sf, reset=False):
+                        self.load_bank_config(sf)
+                except Exception as e:
+                    logging.error(f"Can't preload SoundFont '{sf}' => {e}")
 
     # Set presets for all processors to restore soundfont assign (select) after load/unload soundfonts
     def set_all_presets(self):
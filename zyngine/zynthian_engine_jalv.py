@@ -26,6 +26,8 @@ import os
 import re
 import sys
 import copy
+import socket
+import struct
 import shutil
 import logging
 from time import sleep
@@ -73,6 +75,16 @@ class zynthian_engine_jalv(zynthian_engine):
         'https://git.code.sf.net/p/qmidiarp/seq': {"RPi5": "X11UI", "RPi4": "X11UI", "RPi3": "X11UI", "RPi2": "X11UI"}
     }
 
+    # Optional binary control channel, announced by jalv at startup as "CTRL Socket: <path>".
+    # It's a SEQPACKET unix socket. Each packet carries a batch of records: type, port index & value.
+    ctrl_sock_record = struct.Struct("<BxxxIf")
+    CTRL_SOCK_SET = 0
+    CTRL_SOCK_CTR = 1
+    CTRL_SOCK_MON = 2
+
+    # Max rate (Hz) for sending controller values to jalv
+    ctrl_send_rate = 100
+
     plugins_custom_gui = {
         'http://gareus.org/oss/lv2/meters#spectr30mono': "/zynthian/zynthian-ui/zyngui/zynthian_widget_spectr30.py",
         'http://gareus.org/oss/lv2/meters#spectr30stereo': "/zynthian/zynthian-ui/zyngui/zynthian_widget_spectr30.py",
@@ -156,6 +168,9 @@ class zynthian_engine_jalv(zynthian_engine):
         super().__init__(state_manager)
 
         self.proc_poll_thread = None
+        self.ctrl_sock = None
+        self.ctrl_sock_thread = None
+        self.lv2_port_symbols = {}  # Port symbols indexed by port index, as reported by jalv
 
         self.save_bank = None
         self.save_preset_uri = None
@@ -224,7 +239,8 @@ class zynthian_engine_jalv(zynthian_engine):
                     if line[0:10] == "JACK Name:":
                         self.jackname = line[11:].strip()
                         logging.debug("Jack Name => {}".format(self.jackname))
-                        break
+                    elif line[0:12] == "CTRL Socket:":
+                        self.open_ctrl_sock(line[13:].strip())
 
             # Setup MIDI Controllers
             self._ctrls = []
@@ -310,6 +326,7 @@ class zynthian_engine_jalv(zynthian_engine):
                     "Can't start engine {} => {}".format(self.name, err))
 
     def stop(self):
+        self.close_ctrl_sock()
         if self.proc:
             try:
                 logging.info("Stopping Engine " + self.name)
@@ -380,6 +397,7 @@ class zynthian_engine_jalv(zynthian_engine):
                 if zctrl.graph_path is None:
                     try:
                         zctrl.graph_path = int(symparts[0])
+                        self.lv2_port_symbols[zctrl.graph_path] = zctrl.symbol
                         #logging.debug(f"UPDATING JALV ZCTRL INDEX FOR '{symparts[1]}' => {zctrl.graph_path}")
                     except:
                         logging.warning(f"Cant't parse controller index from jalv output: {line}")
@@ -401,6 +419,8 @@ class zynthian_engine_jalv(zynthian_engine):
             #logging.debug(f"#MON> {symparts[1]} ({symparts[0]}) = {val}")
             try:
                 self.lv2_monitors_dict[symparts[1]] = val
+                if symparts[0].isdigit():
+                    self.lv2_port_symbols[int(symparts[0])] = symparts[1]
             except Exception as e:
                 # TODO This shouldn't happen when property parameters are fully implemented
                 logging.warning(f"Unknown monitor when parsing jalv output => {line}")
@@ -415,6 +435,88 @@ class zynthian_engine_jalv(zynthian_engine):
         else:
             logging.warning(f"Wrong preset format when parsing jalv output => {line}")
 
+    def open_ctrl_sock(self, path):
+        """Connect to jalv's binary control channel and start the thread reading from it
+
+        path : Path of the unix socket announced by jalv
+        """
+
+        try:
+            self.ctrl_sock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            self.ctrl_sock.connect(path)
+            self.ctrl_sock.settimeout(0.5)
+        except Exception as e:
+            logging.warning(f"Can't connect to control socket '{path}' => using text protocol ({e})")
+            self.ctrl_sock = None
+            return
+        logging.debug(f"Using control socket '{path}' for {self.jackname}")
+        self.ctrl_sock_thread = Thread(target=self.ctrl_sock_thread_task, args=())
+        self.ctrl_sock_thread.name = f"ctrl_sock_{self.jackname}"
+        self.ctrl_sock_thread.daemon = True  # thread dies with the program
+        self.ctrl_sock_thread.start()
+
+    def close_ctrl_sock(self):
+        """Close binary control channel, falling back to text protocol"""
+
+        sock = self.ctrl_sock
+        self.ctrl_sock = None
+        if sock:
+            try:
+                sock.close()
+            except:
+                pass
+
+    def ctrl_sock_send(self, zctrls):
+        """Send a batch of controller values through the binary control channel
+
+        zctrls : List of controllers, all of them with known port index (graph_path)
+        Returns True on success, False if the channel is not available
+        """
+
+        sock = self.ctrl_sock
+        if sock is None:
+            return False
+        data = bytearray(self.ctrl_sock_record.size * len(zctrls))
+        for i, zctrl in enumerate(zctrls):
+            self.ctrl_sock_record.pack_into(data, i * self.ctrl_sock_record.size,
+                                            self.CTRL_SOCK_SET, zctrl.graph_path, zctrl.value)
+        try:
+            sock.send(data)
+            return True
+        except Exception as e:
+            logging.warning(f"Control socket error for {self.jackname} => using text protocol ({e})")
+            self.close_ctrl_sock()
+            return False
+
+    def ctrl_sock_thread_task(self):
+        record_size = self.ctrl_sock_record.size
+        while not self.proc_exit and self.ctrl_sock:
+            try:
+                data = self.ctrl_sock.recv(4096)
+            except socket.timeout:
+                continue
+            except Exception as e:
+                if self.ctrl_sock:
+                    logging.warning(f"Control socket error for {self.jackname} => using text protocol ({e})")
+                    self.close_ctrl_sock()
+                break
+            if not data:
+                self.close_ctrl_sock()
+                break
+            for rtype, index, val in self.ctrl_sock_record.iter_unpack(data[:len(data) - len(data) % record_size]):
+                try:
+                    symbol = self.lv2_port_symbols[index]
+                except KeyError:
+                    # Port index not reported by the text protocol yet
+                    continue
+                if rtype == self.CTRL_SOCK_CTR:
+                    try:
+                        self.lv2_zctrl_dict[symbol].set_value(val, False)
+                    except KeyError:
+                        pass
+                elif rtype == self.CTRL_SOCK_MON:
+                    self.lv2_monitors_dict[symbol] = val
+
     def start_proc_poll_thread(self):
         self.proc_poll_thread = Thread(target=self.proc_poll_thread_task, args=())
         self.proc_poll_thread.name = f"proc_poll_{self.jackname}"
@@ -551,6 +653,8 @@ class zynthian_engine_jalv(zynthian_engine):
     def set_preset(self, processor, preset, preload=False):
         if not preset[0]:
             return
+        # Don't let queued controller values overwrite the preset
+        self.flush_controller_values()
         self.proc_cmd(f"preset {preset[0]}")
         return True
 
@@ -803,7 +907,8 @@ class zynthian_engine_jalv(zynthian_engine):
     def send_controller_value(self, zctrl):
         try:
             if zctrl.graph_path is not None:
-                self.proc_cmd("set %d %.6f" % (zctrl.graph_path, zctrl.value))
+                if not self.ctrl_sock_send([zctrl]):
+                    self.proc_cmd("set %d %.6f" % (zctrl.graph_path, zctrl.value))
             else:
                 self.proc_cmd("%s=%.6f" % (zctrl.symbol, zctrl.value))
         except:
@@ -813,6 +918,14 @@ class zynthian_engine_jalv(zynthian_engine):
                                                       zctrl.midi_cc,
                                                       zctrl.get_ctrl_midi_val())
 
+    def send_controller_values(self, zctrls):
+        # Send all indexed controllers in a single packet if binary control channel is available
+        if self.ctrl_sock:
+            indexed = [zctrl for zctrl in zctrls if zctrl.graph_path is not None]
+            if indexed and self.ctrl_sock_send(indexed):
+                zctrls = [zctrl for zctrl in zctrls if zctrl.graph_path is None]
+        super().send_controller_values(zctrls)
+
     # ---------------------------------------------------------------------------
     # API methods
     # ---------------------------------------------------------------------------
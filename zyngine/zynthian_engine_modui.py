@@ -52,6 +52,9 @@ class zynthian_engine_modui(zynthian_engine):
     base_api_url = 'http://localhost:8888'
     websocket_url = 'ws://localhost:8888/websocket'
 
+    # Max rate (Hz) for sending controller values through the websocket
+    ctrl_send_rate = 50
+
     bank_dirs = [
         ('EX', zynthian_engine.ex_data_dir + "/presets/mod-ui/pedalboards"),
         # this is a symlink to zynthian_engine.my_data_dir + "/presets/mod-ui/pedalboards"
@@ -203,6 +206,8 @@ class zynthian_engine_modui(zynthian_engine):
         return preset_list
 
     def set_preset(self, processor, preset, preload=False):
+        # Don't let queued controller values overwrite the preset
+        self.flush_controller_values()
         if preset[3]:
             self.load_effect_preset(preset[3], preset[0])
         else:
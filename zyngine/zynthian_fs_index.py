@@ -0,0 +1,615 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ******************************************************************************
+# ZYNTHIAN PROJECT: Zynthian Filesystem Index
+#
+# zynthian filesystem index
+#
+# ******************************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ******************************************************************************
+
+import os
+import errno
+import struct
+import ctypes
+import logging
+from collections import deque
+from time import sleep, monotonic
+from threading import Thread, Lock, RLock
+
+from zyngine.zynthian_signal_manager import zynsigman
+
+# ------------------------------------------------------------------------------
+# Filesystem index
+# ------------------------------------------------------------------------------
+#
+# Directory listings of the data trees are kept in memory, so bank & preset
+# lists are built without scanning directories each time. A directory listing
+# is scanned when first needed and it's valid until:
+#   inotify reports a change in the directory
+#   directory's modification time changes (if inotify is not available)
+# Adding, removing or renaming an entry changes the directory's modification
+# time, so checking it is enough for validating the listing.
+# ------------------------------------------------------------------------------
+
+# inotify events
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+IN_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+# Directory listing: [mtime_ns, (st_dev, st_ino), dirs, files, wd]
+NODE_MTIME = 0
+NODE_ID = 1
+NODE_DIRS = 2
+NODE_FILES = 3
+NODE_WD = 4
+
+
+class zynthian_fs_index:
+
+    def __init__(self, roots, use_inotify=True):
+        """Filesystem index
+
+        roots : List of directory trees to index
+        use_inotify : False for validating listings by modification time only
+        """
+
+        self.roots = [os.path.normpath(root) for root in roots]
+        self.nodes = {}  # Directory listings indexed by path
+        self.watches = {}  # Directory paths indexed by inotify watch descriptor
+        self.lock = RLock()
+        self.stats = {"scans": 0, "hits": 0, "invalidated": 0}
+        self.generation = 0  # Incremented when a directory listing is invalidated
+        self.find_cache = {}  # find results indexed by (path, extensions, first)
+        self.find_cache_generation = 0
+        self.libc = None
+        self.inotify_fd = -1
+        if use_inotify:
+            self.init_inotify()
+
+    def init_inotify(self):
+        try:
+            self.libc = ctypes.CDLL(None, use_errno=True)
+            self.libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            self.libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+            fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+            self.inotify_fd = fd
+        except Exception as e:
+            logging.warning(f"inotify not available, checking modification time => {e}")
+            self.inotify_fd = -1
+
+    def stop(self):
+        with self.lock:
+            self.nodes = {}
+            self.watches = {}
+            self.find_cache = {}
+            if self.inotify_fd >= 0:
+                os.close(self.inotify_fd)
+                self.inotify_fd = -1
+
+    def covers(self, dpath):
+        """Check if path is inside an indexed tree
+
+        dpath : Path
+        returns : True if path is indexed
+        """
+
+        dpath = os.path.normpath(dpath)
+        for root in self.roots:
+            if dpath == root or dpath.startswith(root + "/"):
+                return True
+        return False
+
+    # ---------------------------------------------------------------------------
+    # Directory listings
+    # ---------------------------------------------------------------------------
+
+    def scan_dir(self, dpath):
+        """Scan directory and store its listing
+
+        dpath : Normalized directory path
+        returns : Directory listing or None if it can't be accessed
+        """
+
+        wd = -1
+        if self.inotify_fd >= 0:
+            # Add watch before scanning, so no change is lost
+            wd = self.libc.inotify_add_watch(self.inotify_fd, os.fsencode(dpath), IN_WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    logging.warning(f"Can't watch '{dpath}' (inotify max_user_watches reached), checking modification time")
+                wd = -1
+        try:
+            st = os.stat(dpath)
+            dirs = []
+            files = []
+            with os.scandir(dpath) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            dirs.append(entry.name)
+                        elif entry.is_file():
+                            files.append(entry.name)
+                    except OSError:
+                        pass
+        except OSError:
+            self.remove_node(dpath)
+            if wd >= 0 and wd not in self.watches:
+                self.libc.inotify_rm_watch(self.inotify_fd, wd)
+            return None
+        dirs.sort()
+        files.sort()
+        if wd >= 0:
+            if self.watches.setdefault(wd, dpath) != dpath:
+                # Same directory reached by another path (symlink) => Events are reported for the other path
+                wd = -1
+        node = [st.st_mtime_ns, (st.st_dev, st.st_ino), dirs, files, wd]
+        self.nodes[dpath] = node
+        self.stats["scans"] += 1
+        return node
+
+    def remove_node(self, dpath):
+        """Remove directory listing from index, without removing its inotify watch"""
+
+        if self.nodes.pop(dpath, None) is not None:
+            self.generation += 1
+            self.stats["invalidated"] += 1
+
+    def remove_tree(self, dpath):
+        """Remove directory listings of a tree from index (i.e. when it's moved or deleted)"""
+
+        prefix = dpath + "/"
+        for path in [path for path in self.nodes if path == dpath or path.startswith(prefix)]:
+            wd = self.nodes[path][NODE_WD]
+            self.remove_node(path)
+            if wd >= 0 and self.watches.pop(wd, None) is not None:
+                self.libc.inotify_rm_watch(self.inotify_fd, wd)
+
+    def process_events(self):
+        """Read pending inotify events and invalidate changed directory listings"""
+
+        if self.inotify_fd < 0:
+            return
+        while True:
+            try:
+                buf = os.read(self.inotify_fd, 65536)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                logging.error(f"Can't read inotify events => {e}")
+                return
+            i = 0
+            while i + IN_EVENT.size <= len(buf):
+                wd, mask, cookie, nlen = IN_EVENT.unpack_from(buf, i)
+                name = buf[i + IN_EVENT.size:i + IN_EVENT.size + nlen].split(b"\0", 1)[0]
+                i += IN_EVENT.size + nlen
+                if mask & IN_Q_OVERFLOW:
+                    # Events lost => Invalidate all
+                    for dpath in list(self.nodes):
+                        self.remove_node(dpath)
+                    continue
+                dpath = self.watches.get(wd)
+                if dpath is None:
+                    continue
+                if mask & IN_IGNORED:
+                    del self.watches[wd]
+                    self.remove_node(dpath)
+                elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    self.remove_tree(dpath)
+                else:
+                    self.remove_node(dpath)
+                    if mask & IN_ISDIR and mask & (IN_DELETE | IN_MOVED_FROM):
+                        self.remove_tree(os.path.join(dpath, os.fsdecode(name)))
+
+    def get_node(self, dpath):
+        """Get valid directory listing, scanning directory if needed
+
+        dpath : Normalized directory path
+        returns : Directory listing or None if it can't be accessed
+        """
+
+        node = self.nodes.get(dpath)
+        if node is not None:
+            if node[NODE_WD] >= 0:
+                self.stats["hits"] += 1
+                return node
+            try:
+                if os.stat(dpath).st_mtime_ns == node[NODE_MTIME]:
+                    self.stats["hits"] += 1
+                    return node
+            except OSError:
+                self.remove_node(dpath)
+                return None
+        return self.scan_dir(dpath)
+
+    def listdir(self, dpath):
+        """Get directory listing
+
+        dpath : Directory path
+        returns : Tuple of (subdirectory names, file names), sorted, or None if directory can't be accessed.
+            Symlinks are classified by their target, like os.path.isdir & os.path.isfile.
+        """
+
+        dpath = os.path.normpath(dpath)
+        with self.lock:
+            self.process_events()
+            node = self.get_node(dpath)
+            if node is None:
+                return None
+            return list(node[NODE_DIRS]), list(node[NODE_FILES])
+
+    def find(self, dpath, fexts, first=False):
+        """Find entries by extension in a directory tree, like glob's recursive "**" (hidden entries are skipped)
+
+        Results are cached while no directory in the tree changes (only if all directories are watched by inotify).
+
+        dpath : Root directory path
+        fexts : List of extensions, without dot (case insensitive)
+        first : True for returning only the first entry found
+        returns : List of entry paths (files & directories)
+        """
+
+        dpath = os.path.normpath(dpath)
+        fexts = tuple("." + ext.lower() for ext in fexts)
+        key = (dpath, fexts, first)
+        with self.lock:
+            self.process_events()
+            if self.find_cache_generation != self.generation:
+                self.find_cache = {}
+                self.find_cache_generation = self.generation
+            res = self.find_cache.get(key)
+            if res is not None:
+                self.stats["hits"] += 1
+                return list(res)
+            res = []
+            watched = True
+            stack = [(dpath, frozenset())]
+            while stack:
+                path, parents = stack.pop()
+                node = self.get_node(path)
+                # Symlinked directories could create loops
+                if node is None or node[NODE_ID] in parents:
+                    continue
+                parents = parents | {node[NODE_ID]}
+                if node[NODE_WD] < 0:
+                    watched = False
+                for name in node[NODE_FILES]:
+                    if not name.startswith(".") and name.lower().endswith(fexts):
+                        res.append(path + "/" + name)
+                if first and res:
+                    break
+                for name in reversed(node[NODE_DIRS]):
+                    if not name.startswith("."):
+                        stack.append((path + "/" + name, parents))
+                        if name.lower().endswith(fexts):
+                            res.append(path + "/" + name)
+                if first and res:
+                    break
+            if watched:
+                self.find_cache[key] = res
+            return list(res[:1] if first else res)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["dirs"] = len(self.nodes)
+            stats["watches"] = len(self.watches)
+            stats["inotify"] = self.inotify_fd >= 0
+        return stats
+
+# ------------------------------------------------------------------------------
+# External storage index
+# ------------------------------------------------------------------------------
+#
+# External storage (USB) can hold big sample libraries, so it's indexed by a
+# background thread when mounted, breadth first, and queries get the entries
+# indexed so far instead of waiting for a full scan:
+#   find => entries by extension, from the per-extension index
+#   listdir => directory listing, scanned when needed & validated by
+#              modification time, so new files (i.e. recordings) are listed
+# Progress is signaled (S_EXT_STORAGE, SS_EXT_STORAGE_INDEX) with kwargs:
+#   exdpath, dirs (indexed directories), files (indexed files), done
+# ------------------------------------------------------------------------------
+
+
+class zynthian_ex_index:
+
+    progress_interval = 0.5  # Minimum time between progress signals (seconds)
+
+    def __init__(self):
+        self.mounts = {}  # Index of each mount, indexed by mount path (see new_mount)
+        self.lock = Lock()
+        self.queue = deque()  # Mount paths pending indexing
+        self.thread = None
+        self.exit_flag = False
+
+    def stop(self):
+        with self.lock:
+            self.exit_flag = True
+            self.queue.clear()
+        if self.thread:
+            self.thread.join()
+        with self.lock:
+            self.mounts = {}
+            self.exit_flag = False
+
+    def check_mounts(self, exdpaths):
+        """Start indexing new mounts & remove unmounted ones
+
+        exdpaths : List of mounted external storage paths
+        """
+
+        exdpaths = [os.path.normpath(exdpath) for exdpath in exdpaths]
+        mounted = []
+        unmounted = []
+        with self.lock:
+            for exdpath in list(self.mounts):
+                if exdpath not in exdpaths:
+                    del self.mounts[exdpath]
+                    unmounted.append(exdpath)
+            for exdpath in exdpaths:
+                if exdpath not in self.mounts:
+                    self.mounts[exdpath] = self.new_mount(exdpath)
+                    self.queue.append(exdpath)
+                    mounted.append(exdpath)
+            if self.queue and self.thread is None:
+                self.thread = Thread(target=self.thread_task, args=())
+                self.thread.name = "ex_index"
+                self.thread.daemon = True  # thread dies with the program
+                self.thread.start()
+        for exdpath in unmounted:
+            logging.info(f"External storage '{exdpath}' unmounted")
+            zynsigman.send_queued(zynsigman.S_EXT_STORAGE, zynsigman.SS_EXT_STORAGE_UNMOUNT, exdpath=exdpath)
+        for exdpath in mounted:
+            logging.info(f"External storage '{exdpath}' mounted => indexing ...")
+            zynsigman.send_queued(zynsigman.S_EXT_STORAGE, zynsigman.SS_EXT_STORAGE_MOUNT, exdpath=exdpath)
+
+    @staticmethod
+    def new_mount(exdpath):
+        return {
+            "dirs": {},  # Directory listings indexed by path: [mtime_ns, dirs, files]
+            "fexts": {},  # Per-extension index: {ext: {dpath: [names]}}
+            "pending": deque([exdpath]),  # Directories pending indexing
+            "files": 0,  # Number of indexed files
+            "done": False,
+            "ts": 0  # Time of last progress signal
+        }
+
+    def get_mount(self, dpath):
+        """Get index of the mount containing a path (lock must be held)"""
+
+        for exdpath, mount in self.mounts.items():
+            if dpath == exdpath or dpath.startswith(exdpath + "/"):
+                return mount
+        return None
+
+    def covers(self, dpath):
+        """Check if path is in a mounted external storage
+
+        dpath : Path
+        returns : True if path is indexed
+        """
+
+        with self.lock:
+            return self.get_mount(os.path.normpath(dpath)) is not None
+
+    def is_ready(self, dpath):
+        """Check if external storage containing path is fully indexed
+
+        dpath : Path
+        returns : True if indexing is done
+        """
+
+        with self.lock:
+            mount = self.get_mount(os.path.normpath(dpath))
+            return mount is not None and mount["done"]
+
+    def get_progress(self, exdpath):
+        """Get indexing progress of an external storage
+
+        exdpath : Mount path
+        returns : Dictionary {"dirs", "files", "done"} or None if not mounted
+        """
+
+        with self.lock:
+            mount = self.mounts.get(os.path.normpath(exdpath))
+            if mount is None:
+                return None
+            return {"dirs": len(mount["dirs"]), "files": mount["files"], "done": mount["done"]}
+
+    # ---------------------------------------------------------------------------
+    # Indexing
+    # ---------------------------------------------------------------------------
+
+    @staticmethod
+    def scan_dir(dpath):
+        """Scan directory, without holding the lock
+
+        dpath : Directory path
+        returns : Directory listing [mtime_ns, dirs, files] & list of subdirectory paths to index
+        """
+
+        st = os.stat(dpath)
+        dirs = []
+        files = []
+        subdirs = []
+        with os.scandir(dpath) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        dirs.append(entry.name)
+                        # Symlinks are listed, but not followed
+                        if not entry.name.startswith(".") and not entry.is_symlink():
+                            subdirs.append(entry.path)
+                    elif entry.is_file():
+                        files.append(entry.name)
+                except OSError:
+                    pass
+        dirs.sort()
+        files.sort()
+        subdirs.sort()
+        return [st.st_mtime_ns, dirs, files], subdirs
+
+    @staticmethod
+    def set_listing(mount, dpath, listing):
+        """Store directory listing & update per-extension index (lock must be held)"""
+
+        old_listing = mount["dirs"].get(dpath)
+        if old_listing is not None:
+            mount["files"] -= len(old_listing[2])
+            for fexts in mount["fexts"].values():
+                fexts.pop(dpath, None)
+        mount["dirs"][dpath] = listing
+        mount["files"] += len(listing[2])
+        if "/." in dpath:
+            return
+        for names in listing[1], listing[2]:
+            for name in names:
+                if name.startswith("."):
+                    continue
+                ext = os.path.splitext(name)[1][1:].lower()
+                if ext:
+                    mount["fexts"].setdefault(ext, {}).setdefault(dpath, []).append(name)
+
+    def thread_task(self):
+        while True:
+            with self.lock:
+                if self.exit_flag or not self.queue:
+                    self.thread = None
+                    return
+                exdpath = self.queue[0]
+                mount = self.mounts.get(exdpath)
+                if mount is None or not mount["pending"]:
+                    # Unmounted or done
+                    self.queue.popleft()
+                    if mount is not None:
+                        mount["done"] = True
+                        logging.info(f"External storage '{exdpath}' indexed => {len(mount['dirs'])} directories, {mount['files']} files")
+                        zynsigman.send_queued(zynsigman.S_EXT_STORAGE, zynsigman.SS_EXT_STORAGE_INDEX,
+                                              exdpath=exdpath, dirs=len(mount["dirs"]), files=mount["files"], done=True)
+                    continue
+                dpath = mount["pending"].popleft()
+            try:
+                listing, subdirs = self.scan_dir(dpath)
+            except OSError as e:
+                logging.debug(f"Can't index '{dpath}' => {e}")
+                continue
+            with self.lock:
+                if self.mounts.get(exdpath) is not mount:
+                    continue
+                self.set_listing(mount, dpath, listing)
+                mount["pending"].extend(subdirs)
+                now = monotonic()
+                if now - mount["ts"] > self.progress_interval:
+                    mount["ts"] = now
+                    zynsigman.send_queued(zynsigman.S_EXT_STORAGE, zynsigman.SS_EXT_STORAGE_INDEX,
+                                          exdpath=exdpath, dirs=len(mount["dirs"]), files=mount["files"], done=False)
+            # Let other threads (i.e. UI) run
+            sleep(0)
+
+    # ---------------------------------------------------------------------------
+    # Queries
+    # ---------------------------------------------------------------------------
+
+    def listdir(self, dpath):
+        """Get directory listing. Directory is scanned if it's not indexed yet or it has changed.
+
+        dpath : Directory path
+        returns : Tuple of (subdirectory names, file names), sorted, or None if directory can't be accessed.
+        """
+
+        dpath = os.path.normpath(dpath)
+        with self.lock:
+            mount = self.get_mount(dpath)
+            listing = mount["dirs"].get(dpath) if mount else None
+        try:
+            if listing is not None and os.stat(dpath).st_mtime_ns == listing[0]:
+                return list(listing[1]), list(listing[2])
+            listing = self.scan_dir(dpath)[0]
+        except OSError:
+            return None
+        with self.lock:
+            if mount is not None and self.get_mount(dpath) is mount:
+                self.set_listing(mount, dpath, listing)
+        return list(listing[1]), list(listing[2])
+
+    def find(self, dpath, fexts, first=False):
+        """Find indexed entries by extension in a directory tree (hidden entries are skipped).
+        Results are partial until indexing is done (see is_ready).
+
+        dpath : Root directory path
+        fexts : List of extensions, without dot (case insensitive)
+        first : True for returning only the first entry found
+        returns : List of entry paths (files & directories)
+        """
+
+        dpath = os.path.normpath(dpath)
+        prefix = dpath + "/"
+        res = []
+        with self.lock:
+            mount = self.get_mount(dpath)
+            if mount is None:
+                return res
+            for ext in fexts:
+                for path, names in mount["fexts"].get(ext.lower(), {}).items():
+                    if path == dpath or path.startswith(prefix):
+                        for name in names:
+                            res.append(path + "/" + name)
+                            if first:
+                                return res
+        return res
+
+# ------------------------------------------------------------------------------
+# Shared index of data trees
+# ------------------------------------------------------------------------------
+
+
+zynfsindex = zynthian_fs_index([
+    os.environ.get('ZYNTHIAN_DATA_DIR', "/zynthian/zynthian-data"),
+    os.environ.get('ZYNTHIAN_MY_DATA_DIR', "/zynthian/zynthian-my-data")
+])
+
+# Shared index of external storage
+zynexindex = zynthian_ex_index()
+
+
+def get_fs_index(dpath):
+    """Get index covering a path
+
+    dpath : Path
+    returns : zynfsindex for data trees, zynexindex for external storage or None if path is not indexed
+    """
+
+    if zynfsindex.covers(dpath):
+        return zynfsindex
+    if zynexindex.covers(dpath):
+        return zynexindex
+    return None
+
+# ------------------------------------------------------------------------------
@@ -32,9 +32,12 @@ import copy
 import time
 import string
 import hashlib
+import sqlite3
 import logging
 import urllib.parse
+import multiprocessing
 from enum import Enum
+from threading import RLock
 from random import randrange
 
 # ------------------------------------------------------------------------------
@@ -179,28 +182,54 @@ ENGINE_CONFIG_FILE = "{}/engine_config.json".format(
     os.environ.get('ZYNTHIAN_CONFIG_DIR'))
 JALV_LV2_CONFIG_FILE = "{}/jalv/plugins.json".format(
     os.environ.get('ZYNTHIAN_CONFIG_DIR'))
+LV2_BUNDLE_MANIFEST_FILE = "{}/jalv/bundles.json".format(
+    os.environ.get('ZYNTHIAN_CONFIG_DIR'))
+LV2_PRESETS_DB_FILE = "{}/jalv/presets.db".format(
+    os.environ.get('ZYNTHIAN_CONFIG_DIR'))
 
 engines = None
 engines_by_type = None
 engines_mtime = None
 
+world = None  # Shared lilv world. Initialised on first use (see get_lilv_world)
+world_lock = RLock()  # Serializes lilv world (re)initialisation and RDF queries
+
+presets_db = None  # Bank/Preset index database connection. Opened on first use (see get_presets_db)
+presets_db_lock = RLock()
+
 # ------------------------------------------------------------------------------
 # Lilv LV2 library initialization
 # ------------------------------------------------------------------------------
 
 
 def init_lilv():
+    """(Re)create the shared lilv world, loading all LV2 bundles"""
     global world
-    world = lilv.World()
-    # Disable language filtering
-    # world.set_option(lilv.OPTION_FILTER_LANG, world.new_bool(False))
-    world.load_all()
-    world.ns.ev = lilv.Namespace(world, "http://lv2plug.in/ns/ext/event#")
-    world.ns.presets = lilv.Namespace(world, "http://lv2plug.in/ns/ext/presets#")
-    world.ns.portprops = lilv.Namespace(world, "http://lv2plug.in/ns/ext/port-props#")
-    world.ns.portgroups = lilv.Namespace(world, "http://lv2plug.in/ns/ext/port-groups#")
-    world.ns.parameters = lilv.Namespace(world, "http://lv2plug.in/ns/ext/parameters#")
-    world.ns.patch = lilv.Namespace(world, "http://lv2plug.in/ns/ext/patch#")
+    with world_lock:
+        start = time.monotonic()
+        lworld = lilv.World()
+        # Disable language filtering
+        # lworld.set_option(lilv.OPTION_FILTER_LANG, lworld.new_bool(False))
+        lworld.load_all()
+        lworld.ns.ev = lilv.Namespace(lworld, "http://lv2plug.in/ns/ext/event#")
+        lworld.ns.presets = lilv.Namespace(lworld, "http://lv2plug.in/ns/ext/presets#")
+        lworld.ns.portprops = lilv.Namespace(lworld, "http://lv2plug.in/ns/ext/port-props#")
+        lworld.ns.portgroups = lilv.Namespace(lworld, "http://lv2plug.in/ns/ext/port-groups#")
+        lworld.ns.parameters = lilv.Namespace(lworld, "http://lv2plug.in/ns/ext/parameters#")
+        lworld.ns.patch = lilv.Namespace(lworld, "http://lv2plug.in/ns/ext/patch#")
+        world = lworld
+        logging.info(f"Lilv world initialised in {time.monotonic() - start:.2f}s")
+
+
+def get_lilv_world():
+    """Get the shared lilv world, initialising it on first use
+
+    Callers doing RDF queries should hold world_lock while using it.
+    """
+    with world_lock:
+        if world is None:
+            init_lilv()
+        return world
 
 
 # ------------------------------------------------------------------------------
@@ -344,9 +373,17 @@ def generate_engines_config_file(refresh=True, reset_rankings=None):
 
     hash = hashlib.new('sha1')
     start = int(round(time.time()))
+    world_lock.acquire()
     try:
         if refresh:
             init_lilv()
+        else:
+            get_lilv_world()
+
+        # Find LV2 bundles changed since last generation
+        manifest = load_bundle_manifest()
+        bundles, changed, removed = scan_lv2_bundles(manifest.get('engines', {}))
+        dirty_bundles = changed | removed
 
         # Add standalone engines
         i = 0
@@ -447,6 +484,14 @@ def generate_engines_config_file(refresh=True, reset_rankings=None):
                 engine_quality = randrange(5)
                 engine_complex = randrange(5)
 
+            # UI detection parses plugin data files => reuse it if bundle has not changed
+            try:
+                if get_uri_path(plugin.get_bundle_uri()) in dirty_bundles:
+                    raise KeyError
+                engine_ui = engines[key]['UI']
+            except:
+                engine_ui = is_plugin_ui(plugin)
+
             genengines[key] = {
                 'ID': engine_id,
                 'NAME': engine_name,
@@ -456,7 +501,7 @@ def generate_engines_config_file(refresh=True, reset_rankings=None):
                 'ENABLED': is_engine_enabled(key, False),
                 'INDEX': engine_index,
                 'URL': engine_uri,
-                'UI': is_plugin_ui(plugin),
+                'UI': engine_ui,
                 'DESCR': engine_descr,
                 "QUALITY": engine_quality,
                 "COMPLEX": engine_complex,
@@ -473,8 +518,13 @@ def generate_engines_config_file(refresh=True, reset_rankings=None):
             json.dump(engines, f)
         engines_mtime = os.stat(ENGINE_CONFIG_FILE).st_mtime
 
+        manifest['engines'] = bundles
+        save_bundle_manifest(manifest)
+
     except Exception as e:
         logging.error(e)
+    finally:
+        world_lock.release()
 
     dt = int(round(time.time())) - start
     logging.debug('Generating engine config file took {}s'.format(dt))
@@ -574,6 +624,137 @@ def get_plugin_cat(plugin):
     except:
         return "Other"
 
+# ------------------------------------------------------------------------------
+# LV2 bundle manifest
+# ------------------------------------------------------------------------------
+#
+# The manifest file records the state of every LV2 bundle when the engine config
+# and presets cache were last generated, so regeneration only has to process
+# added, changed or removed bundles:
+#   "engines": {bundle_path: [mtime, hash]}
+#   "presets": {bundle_path: [mtime, hash]}
+#   "plugins": {plugin_url: {"name": plugin_name, "bundles": [bundle_path, ...]}}
+# ------------------------------------------------------------------------------
+
+
+def get_lv2_path():
+    """Get list of LV2 bundle search directories"""
+    lv2_path = os.environ.get('LV2_PATH')
+    if lv2_path:
+        return [path for path in lv2_path.split(":") if path]
+    return [os.path.expanduser("~/.lv2"), "/usr/local/lib/lv2", "/usr/lib/lv2"]
+
+
+def get_uri_path(uri):
+    """Get filesystem path from a file URI, without trailing slash
+
+    uri : File URI (string or lilv node)
+    returns : Path or None if not a file URI
+    """
+    uri = str(uri)
+    if not uri.startswith("file://"):
+        return None
+    return urllib.parse.unquote(uri[7:]).rstrip("/")
+
+
+def get_bundle_signature(bundle_path, prev_signature=None):
+    """Get signature of a bundle
+
+    Only turtle files are considered. The content hash is only calculated when
+    the modification time differs from the previous signature.
+
+    bundle_path : Bundle directory path
+    prev_signature : Previous signature [mtime, hash] (optional)
+    returns : Signature [mtime, hash]
+    """
+    ttl_files = []
+    mtime = 0
+    for root, dirs, files in os.walk(bundle_path):
+        mtime = max(mtime, os.stat(root).st_mtime)
+        for fname in files:
+            if fname.endswith(".ttl"):
+                fpath = os.path.join(root, fname)
+                ttl_files.append(fpath)
+                mtime = max(mtime, os.stat(fpath).st_mtime)
+    if prev_signature and prev_signature[0] == mtime:
+        return prev_signature
+    chash = hashlib.new('sha1')
+    for fpath in sorted(ttl_files):
+        chash.update(os.path.relpath(fpath, bundle_path).encode())
+        with open(fpath, 'rb') as f:
+            chash.update(f.read())
+    return [mtime, chash.hexdigest()]
+
+
+def scan_lv2_bundles(prev_bundles):
+    """Scan LV2 bundles and compare with a previous scan
+
+    prev_bundles : Bundle signatures from previous scan {bundle_path: [mtime, hash]}
+    returns : Tuple (bundles, changed, removed) => current bundle signatures, set of added or changed bundles and set of removed bundles
+    """
+    start = time.monotonic()
+    bundles = {}
+    changed = set()
+    for lv2_dir in get_lv2_path():
+        try:
+            entries = list(os.scandir(lv2_dir))
+        except OSError:
+            continue
+        for entry in entries:
+            if not entry.name.endswith(".lv2") or not entry.is_dir() or entry.path in bundles:
+                continue
+            prev_signature = prev_bundles.get(entry.path)
+            try:
+                signature = get_bundle_signature(entry.path, prev_signature)
+            except OSError as e:
+                logging.warning(f"Can't scan LV2 bundle '{entry.path}' => {e}")
+                continue
+            bundles[entry.path] = signature
+            if prev_signature is None or prev_signature[1] != signature[1]:
+                changed.add(entry.path)
+    removed = set(prev_bundles) - set(bundles)
+    logging.info(f"Scanned {len(bundles)} LV2 bundles in {time.monotonic() - start:.2f}s => {len(changed)} added/changed, {len(removed)} removed")
+    return bundles, changed, removed
+
+
+def load_bundle_manifest():
+    try:
+        with open(LV2_BUNDLE_MANIFEST_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.warning(f"Can't load LV2 bundle manifest => {e}")
+    return {}
+
+
+def save_bundle_manifest(manifest):
+    try:
+        with open(LV2_BUNDLE_MANIFEST_FILE, 'w') as f:
+            json.dump(manifest, f)
+    except Exception as e:
+        logging.error(f"Can't save LV2 bundle manifest => {e}")
+
+
+def get_plugin_bundles(plugin):
+    """Get bundles holding data for a plugin: its own bundle and those with its banks and presets
+
+    plugin : lilv plugin object
+    returns : List of bundle paths
+    """
+    bundles = set()
+    path = get_uri_path(plugin.get_bundle_uri())
+    if path:
+        bundles.add(path)
+    for cls in (world.ns.presets.Bank, world.ns.presets.Preset):
+        for node in plugin.get_related(cls):
+            for see_also in world.find_nodes(node, world.ns.rdfs.seeAlso, None):
+                path = get_uri_path(see_also)
+                if path:
+                    bundles.add(os.path.dirname(path))
+    return sorted(bundles)
+
+
 # ------------------------------------------------------------------------------
 # LV2 Bank/Preset management
 # ------------------------------------------------------------------------------
@@ -581,32 +762,120 @@ def get_plugin_cat(plugin):
 # workaround to fix segfault:
 def generate_presets_cache_workaround():
     start = int(round(time.time()))
-    for plugin in world.get_all_plugins():
-        plugin.get_name()
+    with world_lock:
+        for plugin in get_lilv_world().get_all_plugins():
+            plugin.get_name()
     logging.info('Workaround took {}s'.format(int(round(time.time())) - start))
 
 
-def generate_all_presets_cache(refresh=True):
-    if refresh:
-        init_lilv()
+def generate_all_presets_cache(refresh=True, force=False, nproc=None):
+    """Generate presets cache for plugins with added, changed or removed bundles
+
+    refresh : True to reload LV2 bundles
+    force : True to regenerate presets cache for all plugins
+    nproc : Number of worker processes (Default: number of CPUs)
+    """
+    start = time.monotonic()
+    with world_lock:
+        if refresh:
+            init_lilv()
+        wplugins = get_lilv_world().get_all_plugins()
+
+        manifest = load_bundle_manifest()
+        bundles, changed, removed = scan_lv2_bundles({} if force else manifest.get('presets', {}))
+        dirty_bundles = changed | removed
+        prev_plugins = manifest.get('plugins', {})
+        cached_names = get_cached_plugin_names()
+        plugins = {}
+        plugin_urls = []
+        for plugin in wplugins:
+            plugin_url = str(plugin.get_uri())
+            plugin_name = str(plugin.get_name())
+            plugin_bundles = get_plugin_bundles(plugin)
+            plugins[plugin_url] = {'name': plugin_name, 'bundles': plugin_bundles}
+            try:
+                prev_plugin = prev_plugins[plugin_url]
+                if (prev_plugin['name'] != plugin_name
+                        or dirty_bundles.intersection(plugin_bundles)
+                        or dirty_bundles.intersection(prev_plugin['bundles'])
+                        or plugin_name not in cached_names):
+                    raise KeyError
+            except KeyError:
+                plugin_urls.append(plugin_url)
 
-    for plugin in world.get_all_plugins():
-        _generate_plugin_presets_cache(plugin)
+        # Remove cache from plugins that don't exist anymore
+        names = set(info['name'] for info in plugins.values())
+        for plugin_name in cached_names - names:
+            remove_plugin_presets_cache(plugin_name)
 
+        _generate_presets_caches(plugin_urls, nproc)
 
-def generate_plugin_presets_cache(plugin_url, refresh=True):
-    if refresh:
-        init_lilv()
+        manifest['presets'] = bundles
+        manifest['plugins'] = plugins
+        save_bundle_manifest(manifest)
+
+    logging.info(f"Generated presets cache for {len(plugin_urls)} of {len(plugins)} plugins in {time.monotonic() - start:.2f}s")
+
+
+def _generate_presets_caches(plugin_urls, nproc=None):
+    """Generate presets cache for a list of plugins, using a process pool
 
-    wplugins = world.get_all_plugins()
-    return _generate_plugin_presets_cache(wplugins[plugin_url])
+    Worker processes are forked so they share the already loaded lilv world.
+    They only query lilv. Results are stored in the presets database by the
+    calling process.
 
+    plugin_urls : List of plugin URLs
+    nproc : Number of worker processes (Default: number of CPUs)
+    """
+    if nproc is None:
+        nproc = os.cpu_count() or 1
+    nproc = min(nproc, len(plugin_urls))
+    if nproc > 1:
+        try:
+            with multiprocessing.get_context("fork").Pool(nproc) as pool:
+                for res in pool.imap_unordered(_get_plugin_presets_info_task, plugin_urls):
+                    if res:
+                        save_plugin_presets_cache(*res)
+            return
+        except Exception as e:
+            logging.warning(f"Can't generate presets cache in parallel => {e}")
+    for plugin_url in plugin_urls:
+        res = _get_plugin_presets_info_task(plugin_url)
+        if res:
+            save_plugin_presets_cache(*res)
+
+
+def _get_plugin_presets_info_task(plugin_url):
+    try:
+        plugin = world.get_all_plugins()[plugin_url]
+        return str(plugin.get_name()), _get_plugin_presets_info(plugin), plugin_url
+    except Exception as e:
+        logging.error(f"Can't generate presets cache for <{plugin_url}> => {e}")
+        return None
 
+
+def generate_plugin_presets_cache(plugin_url, refresh=True):
+    with world_lock:
+        if refresh:
+            init_lilv()
+        wplugins = get_lilv_world().get_all_plugins()
+        return _generate_plugin_presets_cache(wplugins[plugin_url])
+
+
+# Legacy per-plugin JSON presets cache (imported into presets database on first access)
 def _get_plugin_preset_cache_fpath(plugin_name):
     return "{}/jalv/presets_{}.json".format(os.environ.get('ZYNTHIAN_CONFIG_DIR'), sanitize_fname(plugin_name))
 
 
 def _generate_plugin_presets_cache(plugin):
+    plugin_name = str(plugin.get_name())
+    plugin_url = str(plugin.get_uri())
+    presets_info = _get_plugin_presets_info(plugin)
+    save_plugin_presets_cache(plugin_name, presets_info, plugin_url)
+    return presets_info
+
+
+def _get_plugin_presets_info(plugin):
     plugin_name = str(plugin.get_name())
     plugin_url = str(plugin.get_uri())
     logging.debug(
@@ -686,20 +955,71 @@ def _generate_plugin_presets_cache(plugin):
             presets_info[k]['presets'] = sorted(
                 presets_info[k]['presets'], key=lambda k: k['label'])
 
-    # Save cache file
-    save_plugin_presets_cache(plugin_name, presets_info)
+    return presets_info
+
+
+# ------------------------------------------------------------------------------
+# Bank/Preset index database
+# ------------------------------------------------------------------------------
+#
+# Bank & preset info for all LV2 plugins is kept in a single SQLite database,
+# indexed by plugin name. Banks and presets are returned in insertion order.
+# ------------------------------------------------------------------------------
+
+
+def get_presets_db():
+    """Get presets database connection, opening (and creating) it on first use"""
+    global presets_db
+    with presets_db_lock:
+        if presets_db is None:
+            db = sqlite3.connect(LV2_PRESETS_DB_FILE, check_same_thread=False)
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS plugins (name TEXT PRIMARY KEY, url TEXT) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS banks (plugin TEXT NOT NULL, label TEXT NOT NULL, url TEXT);
+                CREATE TABLE IF NOT EXISTS presets (plugin TEXT NOT NULL, bank TEXT NOT NULL, label TEXT NOT NULL, url TEXT);
+                CREATE INDEX IF NOT EXISTS banks_plugin ON banks (plugin);
+                CREATE INDEX IF NOT EXISTS presets_plugin ON presets (plugin);
+            """)
+            presets_db = db
+        return presets_db
+
+
+def get_cached_plugin_names():
+    """Get set of plugin names with presets info in database"""
+    with presets_db_lock:
+        return set(row[0] for row in get_presets_db().execute("SELECT name FROM plugins"))
+
 
+def read_plugin_presets_cache(plugin_name):
+    """Read plugin's bank & presets info from database
+
+    plugin_name : Plugin name
+    returns : Presets info {bank_label: {'bank_url': url, 'presets': [{'label': label, 'url': url}, ...]}} or None if not cached
+    """
+    with presets_db_lock:
+        db = get_presets_db()
+        if db.execute("SELECT 1 FROM plugins WHERE name=?", (plugin_name,)).fetchone() is None:
+            return None
+        presets_info = {}
+        for label, url in db.execute("SELECT label, url FROM banks WHERE plugin=? ORDER BY rowid", (plugin_name,)):
+            presets_info[label] = {'bank_url': url, 'presets': []}
+        for bank, label, url in db.execute("SELECT bank, label, url FROM presets WHERE plugin=? ORDER BY rowid", (plugin_name,)):
+            try:
+                presets_info[bank]['presets'].append({'label': label, 'url': url})
+            except KeyError:
+                presets_info[bank] = {'bank_url': None, 'presets': [{'label': label, 'url': url}]}
     return presets_info
 
 
 def get_plugin_presets_cache(plugin_name):
-    fpath_cache = _get_plugin_preset_cache_fpath(plugin_name)
+    presets_info = None
     try:
-        with open(fpath_cache) as f:
-            presets_info = json.load(f)
+        presets_info = read_plugin_presets_cache(plugin_name)
     except Exception as e:
-        logging.error(
-            "Can't load presets cache file '{}': {}".format(fpath_cache, e))
+        logging.error("Can't read presets cache for '{}': {}".format(plugin_name, e))
+    if presets_info is None:
+        presets_info = _import_legacy_presets_cache(plugin_name)
+    if presets_info is None:
         try:
             return generate_plugin_presets_cache(engines["JV/" + plugin_name]['URL'])
         except Exception as e:
@@ -714,15 +1034,97 @@ def get_plugin_presets(plugin_name):
     return get_plugin_presets_cache(plugin_name)
 
 
-def save_plugin_presets_cache(plugin_name, presets_info):
-    # Dump json to file
+def get_plugin_bank_list(plugin_name):
+    """Get plugin's bank list from database, without presets
+
+    plugin_name : Plugin name
+    returns : List of (bank_label, bank_url, num_presets)
+    """
+    with presets_db_lock:
+        return get_presets_db().execute("""
+            SELECT label, url, (SELECT COUNT(*) FROM presets WHERE presets.plugin=banks.plugin AND presets.bank=banks.label)
+            FROM banks WHERE plugin=? ORDER BY rowid""", (plugin_name,)).fetchall()
+
+
+def search_presets(text, limit=None):
+    """Search presets by label across all plugins
+
+    text : Text to search for (case insensitive for ASCII)
+    limit : Max number of results (Default: no limit)
+    returns : List of (plugin_name, bank_label, preset_label, preset_url)
+    """
+    text = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    sql = "SELECT plugin, bank, label, url FROM presets WHERE label LIKE ? ESCAPE '\\' ORDER BY plugin, rowid"
+    args = [f"%{text}%"]
+    if limit:
+        sql += " LIMIT ?"
+        args.append(limit)
+    with presets_db_lock:
+        return get_presets_db().execute(sql, args).fetchall()
+
+
+def save_plugin_presets_cache(plugin_name, presets_info, plugin_url=None):
+    """Store plugin's bank & presets info in database, replacing existing one
+
+    plugin_name : Plugin name
+    presets_info : Presets info, as returned by get_plugin_presets_cache
+    plugin_url : Plugin URL (optional)
+    """
+    try:
+        with presets_db_lock:
+            db = get_presets_db()
+            with db:
+                _delete_plugin_presets(db, plugin_name)
+                db.execute("INSERT INTO plugins (name, url) VALUES (?, ?)", (plugin_name, plugin_url))
+                db.executemany("INSERT INTO banks (plugin, label, url) VALUES (?, ?, ?)",
+                               [(plugin_name, bank, info['bank_url']) for bank, info in presets_info.items()])
+                db.executemany("INSERT INTO presets (plugin, bank, label, url) VALUES (?, ?, ?, ?)",
+                               [(plugin_name, bank, preset['label'], preset['url'])
+                                for bank, info in presets_info.items() for preset in info['presets']])
+    except Exception as e:
+        logging.error(
+            "Can't save presets cache for '{}': {}".format(plugin_name, e))
+
+
+def remove_plugin_presets_cache(plugin_name):
+    try:
+        with presets_db_lock:
+            db = get_presets_db()
+            with db:
+                _delete_plugin_presets(db, plugin_name)
+    except Exception as e:
+        logging.error(
+            "Can't remove presets cache for '{}': {}".format(plugin_name, e))
+
+
+def _delete_plugin_presets(db, plugin_name):
+    db.execute("DELETE FROM plugins WHERE name=?", (plugin_name,))
+    db.execute("DELETE FROM banks WHERE plugin=?", (plugin_name,))
+    db.execute("DELETE FROM presets WHERE plugin=?", (plugin_name,))
+
+
+def _import_legacy_presets_cache(plugin_name):
+    """Import presets cache from legacy per-plugin JSON file into database
+
+    plugin_name : Plugin name
+    returns : Presets info or None if there is no legacy cache file
+    """
     fpath_cache = _get_plugin_preset_cache_fpath(plugin_name)
     try:
-        with open(fpath_cache, 'w') as f:
-            json.dump(presets_info, f)
+        with open(fpath_cache) as f:
+            presets_info = json.load(f)
+    except FileNotFoundError:
+        return None
     except Exception as e:
         logging.error(
-            "Can't save presets cache file '{}': {}".format(fpath_cache, e))
+            "Can't load presets cache file '{}': {}".format(fpath_cache, e))
+        return None
+    save_plugin_presets_cache(plugin_name, presets_info)
+    try:
+        os.remove(fpath_cache)
+    except OSError:
+        pass
+    return presets_info
 
 
 def sanitize_fname(s):
@@ -760,7 +1162,12 @@ def get_node_value(node):
 
 
 def get_plugin_ports(plugin_url):
-    wplugins = world.get_all_plugins()
+    with world_lock:
+        return _get_plugin_ports(plugin_url)
+
+
+def _get_plugin_ports(plugin_url):
+    wplugins = get_lilv_world().get_all_plugins()
     plugin = wplugins[plugin_url]
 
     ports_info = {}
@@ -963,8 +1370,7 @@ def get_plugin_ports(plugin_url):
 # ------------------------------------------------------------------------------
 
 
-# Init Lilv
-init_lilv()
+# Lilv world is initialised on demand (see get_lilv_world)
 # Load engine info from cache
 load_engines()
 
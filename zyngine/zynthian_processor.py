@@ -90,6 +90,7 @@ class zynthian_processor:
         self.preload_info = None
 
         self.controllers_dict = {}  # Map of zctrls indexed by symbol
+        self.controllers_version = 0  # Incremented when controllers are rebuilt
         self.ctrl_screens_dict = {}
         self.current_screen_index = -1
         self.auto_save_bank = False
@@ -545,6 +546,9 @@ class zynthian_processor:
         TODO: This should be in UI
         """
 
+        # Controllers have been rebuilt => references to zctrls may be stale
+        self.controllers_version += 1
+
         # Build control screens ...
         self.ctrl_screens_dict = {}
         for cscr in self.engine._ctrl_screens:
@@ -724,12 +728,33 @@ class zynthian_processor:
             state['controllers'][symbol] = self.controllers_dict[symbol].get_state()
         return state
 
-    def set_state(self, state):
+    def set_state(self, state, diff=False):
         """Configure processor from state model dictionary
 
         state : Processor state
+        diff : True to skip bank & preset selection when they match the current ones, and unchanged controller values
+        Returns : Number of engine sends avoided (bank/preset selection and unchanged controller values)
+        """
+
+        avoided = self.set_bank_preset_state(state, diff)
+        # Cached controller values are stale after changing bank/preset
+        diff = diff and avoided > 0
+        # Set controller values
+        if "controllers" in state:
+            values, switches = self.get_controllers_values(state["controllers"])
+            avoided += self.set_controllers_values(values, switches, diff)
+        return avoided
+
+    def set_bank_preset_state(self, state, diff=False):
+        """Select bank & preset from state model dictionary
+
+        state : Processor state
+        diff : True to skip selection when bank & preset match the current ones
+        Returns : Number of engine sends avoided (0 if bank & preset were selected)
         """
 
+        if diff and self.is_bank_preset_state(state):
+            return 2
         try:
             self.get_bank_list()
         except:
@@ -751,18 +776,67 @@ class zynthian_processor:
             except:
                 # Legacy snapshots without preset_info
                 self.set_preset(state["preset_info"], force_set_engine=False)
-        # Set controller values
-        if "controllers" in state:
-            for symbol, ctrl_state in state["controllers"].items():
-                try:
-                    zctrl = self.controllers_dict[symbol]
-                    if "value" in ctrl_state:
-                        zctrl.set_value(ctrl_state["value"], True)
-                    if "midi_cc_momentary_switch" in ctrl_state:
-                        zctrl.midi_cc_momentary_switch = ctrl_state['midi_cc_momentary_switch']
-                except Exception as e:
-                    logging.warning("Invalid controller for processor {}: {}".format(
-                        self.get_basepath(), e))
+        return 0
+
+    def get_controllers_values(self, ctrl_states):
+        """Resolve controller states by symbol
+
+        ctrl_states : Dictionary of controller states indexed by symbol
+        Returns : Tuple of lists (values, switches) => [(zctrl, value), ...], [(zctrl, midi_cc_momentary_switch), ...]
+        """
+
+        values = []
+        switches = []
+        for symbol, ctrl_state in ctrl_states.items():
+            try:
+                zctrl = self.controllers_dict[symbol]
+            except KeyError as e:
+                logging.warning("Invalid controller for processor {}: {}".format(
+                    self.get_basepath(), e))
+                continue
+            if "value" in ctrl_state:
+                values.append((zctrl, ctrl_state["value"]))
+            if "midi_cc_momentary_switch" in ctrl_state:
+                switches.append((zctrl, ctrl_state["midi_cc_momentary_switch"]))
+        return values, switches
+
+    def set_controllers_values(self, values, switches=(), diff=False):
+        """Set controller values, as returned by get_controllers_values
+
+        values : List of (zctrl, value) pairs
+        switches : List of (zctrl, midi_cc_momentary_switch) pairs
+        diff : True to skip values matching the current ones. Only valid if bank & preset didn't change.
+        Returns : Number of controllers not sent because value didn't change
+        """
+
+        avoided = 0
+        for zctrl, value in values:
+            if diff and value == zctrl.value:
+                avoided += 1
+                continue
+            try:
+                zctrl.set_value(value, True)
+            except Exception as e:
+                logging.warning("Invalid controller for processor {}: {}".format(
+                    self.get_basepath(), e))
+        for zctrl, switch in switches:
+            zctrl.midi_cc_momentary_switch = switch
+        return avoided
+
+    def is_bank_preset_state(self, state):
+        """Check if bank & preset in state match the currently selected ones
+
+        state : Processor state
+        Returns : True if both match
+        """
+
+        try:
+            bank_info = state["bank_info"]
+            if bank_info and (bank_info[0] != self.bank_info[0] or bank_info[2] != self.bank_info[2]):
+                return False
+            return self.engine.cmp_presets(state["preset_info"], self.preset_info)
+        except:
+            return False
 
     def restore_state_legacy(self, state):
         """Restore legacy states from state
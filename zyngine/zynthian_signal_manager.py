@@ -24,8 +24,11 @@
 
 import logging
 import traceback
-from queue import SimpleQueue
-from threading import Thread
+from time import monotonic
+from functools import partial
+from weakref import WeakMethod
+from collections import deque
+from threading import Thread, Condition
 
 # ----------------------------------------------------------------------------
 # Zynthian Signal Manager Class
@@ -47,6 +50,7 @@ class zynthian_signal_manager:
     S_CUIA = 10
     S_GUI = 11
     S_MIDI = 12
+    S_EXT_STORAGE = 13
 
     SS_CUIA_REFRESH = 0
     SS_CUIA_MIDI_EVENT = 1
@@ -60,9 +64,20 @@ class zynthian_signal_manager:
     SS_MIDI_NOTE_ON = 3
     SS_MIDI_NOTE_OFF = 4
 
-    last_signal = 13
+    SS_EXT_STORAGE_MOUNT = 0
+    SS_EXT_STORAGE_UNMOUNT = 1
+    SS_EXT_STORAGE_INDEX = 2
+
+    last_signal = 14
     last_subsignal = 10
 
+    # Queued signal priorities. Higher priority signals are dispatched first.
+    PRIO_HIGH = 0
+    PRIO_NORMAL = 1
+    PRIO_LOW = 2
+
+    queue_max_size = 2048  # Max number of queued callback calls
+
     def __init__(self):
         """ Create an instance of a signal manager
 
@@ -71,12 +86,30 @@ class zynthian_signal_manager:
 
         self.exit_flag = False
 
-        # List of lists of registered callback functions.
-        # Indexes ar signal & subsignal numbers
+        # List of lists of registered callbacks: dictionaries of (callback reference, queued), indexed by callback key.
+        # Indexes are signal & subsignal numbers
         self.signal_register = None
         self.reset_register()
 
-        self.queue = SimpleQueue()
+        # Queued signal dispatch configuration, indexed by (signal, subsignal)
+        self.signal_priority = {}  # Priority, default PRIO_NORMAL
+        self.signal_coalesce = {}  # Tuple of kwargs names used as coalesce key
+        self.set_signal_priority(self.S_STATE_MAN, None, self.PRIO_HIGH)
+        self.set_signal_priority(self.S_CHAIN_MAN, None, self.PRIO_HIGH)
+        self.set_signal_priority(self.S_GUI, None, self.PRIO_HIGH)
+        self.set_signal_priority(self.S_MIDI, self.SS_MIDI_CC, self.PRIO_LOW, ("izmip", "chan", "num"))
+        self.set_signal_priority(self.S_MIDI, self.SS_MIDI_NOTE_ON, self.PRIO_LOW)
+        self.set_signal_priority(self.S_MIDI, self.SS_MIDI_NOTE_OFF, self.PRIO_LOW)
+        self.set_signal_priority(self.S_EXT_STORAGE, self.SS_EXT_STORAGE_INDEX, self.PRIO_LOW, ("exdpath",))
+
+        # Queues of pending callback calls, one per priority.
+        # Each call is a list: [signal, subsignal, callback, kwargs, enqueue time, coalesce key]
+        self.queue = [deque() for i in range(self.PRIO_LOW + 1)]
+        self.queue_size = 0
+        self.queue_overflow = False
+        self.queue_coalesced = {}  # Pending calls indexed by coalesce key
+        self.queue_cond = Condition()
+        self.queue_stats = {}
         self.queue_thread = None
         self.start_queue_thread()
 
@@ -88,60 +121,98 @@ class zynthian_signal_manager:
     # ----------------------------------------------------------------------------
 
     def reset_register(self):
-        # self.signal_register = [[[]] * self.last_subsignal] * self.last_signal
         self.signal_register = []
         for i in range(self.last_signal):
             self.signal_register.append([])
             for j in range(self.last_subsignal):
-                self.signal_register[i].append([])
+                self.signal_register[i].append({})
+
+    @staticmethod
+    def get_callback_key(callback):
+        """ Get registry key of a callback
+
+        Bound methods are identified by their object & function, so that the same method of the same object gives the same key.
+        """
+
+        try:
+            return id(callback.__self__), callback.__func__
+        except AttributeError:
+            return callback
 
     def register(self, signal, subsignal, callback, queued=False):
+        """ Register a callback for a signal
+
+        Bound methods are weakly referenced, so that registering doesn't keep their object alive.
+        They are removed from register when their object is destroyed.
+        """
+
         if 0 <= signal <= self.last_signal and 0 <= subsignal <= self.last_subsignal:
             # logging.debug(f"Registering callback '{callback.__name__}()' for signal({signal},{subsignal})")
-            self.signal_register[signal][subsignal].append((callback, queued))
+            register = self.signal_register[signal][subsignal]
+            key = self.get_callback_key(callback)
+            try:
+                ref = WeakMethod(callback, partial(self.prune_callback, register, key))
+            except TypeError:
+                # Not a bound method => strong reference
+                ref = partial(lambda cb: cb, callback)
+            register[key] = (ref, queued)
 
     def register_queued(self, signal, subsignal, callback):
-        if 0 <= signal <= self.last_signal and 0 <= subsignal <= self.last_subsignal:
-            # logging.debug(f"Registering queued callback '{callback.__name__}()' for signal({signal},{subsignal})")
-            self.signal_register[signal][subsignal].append((callback, True))
+        self.register(signal, subsignal, callback, True)
+
+    @staticmethod
+    def prune_callback(register, key, ref):
+        """ Remove dead bound method from register (weakref callback)
+        """
+
+        try:
+            if register[key][0] is ref:
+                del register[key]
+        except KeyError:
+            pass
 
     def unregister(self, signal, subsignal, callback):
         if 0 <= signal <= self.last_signal and 0 <= subsignal <= self.last_subsignal:
             # logging.debug(f"Unregistering callback '{callback.__name__}()' from signal({signal},{subsignal})")
-            n = 0
-            for k, rdata in enumerate(self.signal_register[signal][subsignal]):
-                if rdata[0] == callback:
-                    del self.signal_register[signal][subsignal][k]
-                    n += 1
-            if n == 0:
+            try:
+                del self.signal_register[signal][subsignal][self.get_callback_key(callback)]
+            except KeyError:
                 logging.warning(
                     f"Callback not registered for signal({signal},{subsignal})")
 
     def unregister_all(self, callback):
         n = 0
+        key = self.get_callback_key(callback)
         for i in range(self.last_signal):
             for j in range(self.last_subsignal):
-                for k, rdata in enumerate(self.signal_register[i][j]):
-                    if rdata[0] == callback:
-                        del self.signal_register[i][j][k]
-                        n += 1
+                if self.signal_register[i][j].pop(key, None):
+                    n += 1
         if n == 0:
             logging.warning(f"Callback not registered")
 
+    def get_num_callbacks(self, signal, subsignal):
+        """ Get quantity of registered callbacks for a signal
+        """
+
+        return len(self.signal_register[signal][subsignal])
+
     def process_signal(self, force_queued, signal, subsignal, **kwargs):
         if 0 <= signal <= self.last_signal and 0 <= subsignal <= self.last_subsignal:
             # logging.debug(f"Signal({signal},{subsignal}): {kwargs}")
-            for rdata in self.signal_register[signal][subsignal]:
-                if force_queued == 1 or rdata[1]:
-                    self.queue.put_nowait(
-                        (signal, subsignal, rdata[0], kwargs))
+            # Iterate a copy because callbacks may (un)register callbacks
+            for ref, queued in list(self.signal_register[signal][subsignal].values()):
+                callback = ref()
+                if callback is None:
+                    continue
+                if force_queued == 1 or queued:
+                    self.queue_call(signal, subsignal, callback, kwargs)
                 else:
                     try:
-                        # logging.debug(f"  => calling {rdata[0].__name__}(...)")
-                        rdata[0](**kwargs)
+                        # logging.debug(f"  => calling {callback.__name__}(...)")
+                        callback(**kwargs)
                     except Exception as e:
                         logging.error(
-                            f"Callback '{rdata[0].__name__}(...)' for signal({signal},{subsignal}): {e}")
+                            f"Callback '{callback.__name__}(...)' for signal({signal},{subsignal}): {e}")
                         logging.exception(traceback.format_exc())
 
     def send(self, signal, subsignal, **kwargs):
@@ -164,12 +235,133 @@ class zynthian_signal_manager:
         self.queue_thread.daemon = True  # thread dies with the program
         self.queue_thread.start()
 
+    def set_signal_priority(self, signal, subsignal, priority, coalesce=None):
+        """ Configure dispatch of queued signal
+
+        signal : Signal number
+        subsignal : Subsignal number or None for all subsignals
+        priority : Dispatch priority [PRIO_HIGH | PRIO_NORMAL | PRIO_LOW]
+        coalesce : Tuple of kwargs names. Queued calls with same signal, subsignal, callback and kwargs values are replaced by the latest one. None to disable coalescing.
+        """
+
+        if subsignal is None:
+            subsignals = range(self.last_subsignal)
+        else:
+            subsignals = [subsignal]
+        for ss in subsignals:
+            self.signal_priority[(signal, ss)] = priority
+            if coalesce:
+                self.signal_coalesce[(signal, ss)] = tuple(coalesce)
+            else:
+                self.signal_coalesce.pop((signal, ss), None)
+
+    def get_stats(self, signal, subsignal):
+        try:
+            return self.queue_stats[(signal, subsignal)]
+        except KeyError:
+            stats = {"queued": 0, "coalesced": 0, "dropped": 0, "dispatched": 0, "depth": 0, "max_depth": 0,
+                     "latency": 0.0, "max_latency": 0.0}
+            self.queue_stats[(signal, subsignal)] = stats
+            return stats
+
+    def get_queue_stats(self):
+        """ Get queued signal statistics
+
+        Returns : Dictionary of statistics indexed by (signal, subsignal): {"queued", "coalesced", "dropped", "dispatched",
+         "depth" (current), "max_depth", "latency" (mean, seconds), "max_latency" (seconds)}
+        """
+
+        with self.queue_cond:
+            result = {}
+            for key, stats in self.queue_stats.items():
+                result[key] = stats.copy()
+                if stats["dispatched"]:
+                    result[key]["latency"] = stats["latency"] / stats["dispatched"]
+            return result
+
+    def reset_queue_stats(self):
+        with self.queue_cond:
+            for stats in self.queue_stats.values():
+                depth = stats["depth"]
+                stats.update({"queued": 0, "coalesced": 0, "dropped": 0, "dispatched": 0, "depth": depth,
+                              "max_depth": depth, "latency": 0.0, "max_latency": 0.0})
+
+    def queue_call(self, signal, subsignal, callback, kwargs):
+        """ Add a callback call to dispatch queue, coalescing or dropping calls as configured
+        """
+
+        priority = self.signal_priority.get((signal, subsignal), self.PRIO_NORMAL)
+        coalesce = self.signal_coalesce.get((signal, subsignal))
+        if coalesce:
+            key = (signal, subsignal, callback) + tuple(kwargs.get(name) for name in coalesce)
+        else:
+            key = None
+        with self.queue_cond:
+            stats = self.get_stats(signal, subsignal)
+            if key is not None:
+                try:
+                    # Replace arguments of pending call
+                    self.queue_coalesced[key][3] = kwargs
+                    stats["coalesced"] += 1
+                    return
+                except KeyError:
+                    pass
+            if self.queue_size >= self.queue_max_size:
+                if not self.queue_overflow:
+                    self.queue_overflow = True
+                    logging.warning("Signal queue overflow! Dropping queued signals.")
+                # Drop oldest call with same or lower priority
+                for prio in range(self.PRIO_LOW, priority - 1, -1):
+                    if self.queue[prio]:
+                        dropped = self.dequeue_call(prio)
+                        self.queue_stats[(dropped[0], dropped[1])]["dropped"] += 1
+                        break
+                else:
+                    stats["dropped"] += 1
+                    return
+            call = [signal, subsignal, callback, kwargs, monotonic(), key]
+            self.queue[priority].append(call)
+            self.queue_size += 1
+            if key is not None:
+                self.queue_coalesced[key] = call
+            stats["queued"] += 1
+            stats["depth"] += 1
+            if stats["depth"] > stats["max_depth"]:
+                stats["max_depth"] = stats["depth"]
+            self.queue_cond.notify()
+
+    def dequeue_call(self, priority):
+        """ Remove oldest call from queue. Must be called with queue_cond locked.
+
+        priority : Priority of queue
+        Returns : Removed call
+        """
+
+        call = self.queue[priority].popleft()
+        self.queue_size -= 1
+        if call[5] is not None:
+            self.queue_coalesced.pop(call[5], None)
+        stats = self.queue_stats[(call[0], call[1])]
+        stats["depth"] -= 1
+        return call
+
     def queue_thread_task(self):
         while not self.exit_flag:
-            try:
-                data = self.queue.get(True, 1)
-            except:
-                continue
+            with self.queue_cond:
+                if not self.queue_size:
+                    self.queue_overflow = False
+                    self.queue_cond.wait(1)
+                    continue
+                for prio in range(self.PRIO_LOW + 1):
+                    if self.queue[prio]:
+                        data = self.dequeue_call(prio)
+                        break
+                stats = self.queue_stats[(data[0], data[1])]
+                latency = monotonic() - data[4]
+                stats["dispatched"] += 1
+                stats["latency"] += latency
+                if latency > stats["max_latency"]:
+                    stats["max_latency"] = latency
             try:
                 # logging.debug(f"  => calling {data[2].__name__}(...)")
                 data[2](**data[3])
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ******************************************************************************
+# ZYNTHIAN PROJECT: Zynthian SoundFont helpers
+#
+# zynthian SoundFont
+#
+# ******************************************************************************
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of
+# the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# For a full copy of the GNU General Public License see the LICENSE.txt file.
+#
+# ******************************************************************************
+
+import os
+import json
+import struct
+import logging
+from threading import Lock
+
+# ------------------------------------------------------------------------------
+# SoundFont preset headers
+# ------------------------------------------------------------------------------
+#
+# SF2 & SF3 files are RIFF files: "RIFF" <size> "sfbk" followed by 3 LIST chunks:
+#   "INFO" => information
+#   "sdta" => samples (most of file size)
+#   "pdta" => preset, instrument & sample headers
+# Preset headers ("phdr" chunk in "pdta") are 38 byte records:
+#   name (20 chars), preset (u16), bank (u16), bag index (u16), library, genre & morphology (u32)
+# The last record ("EOP") terminates the list.
+#
+# Preset headers are cached by file path, size & modification time:
+#   {fpath: [size, mtime, [[bank, program, name], ...]]}
+# ------------------------------------------------------------------------------
+
+PRESET_CACHE_FILE = "{}/soundfont_presets.json".format(
+    os.environ.get('ZYNTHIAN_CONFIG_DIR', "/zynthian/config"))
+
+PHDR_RECORD = struct.Struct("<20sHHHIII")
+
+preset_cache = None  # Preset headers cache. Loaded on first use (see get_preset_headers)
+preset_cache_lock = Lock()
+
+
+def parse_preset_headers(fpath):
+    """Parse preset headers from a SF2/SF3 file, without reading sample data
+
+    fpath : SoundFont file path
+    returns : List of [bank, program, name] sorted by bank & program, like fluidsynth "inst" command
+    raises : ValueError if file is not a valid soundfont, OSError if it can't be read
+    """
+
+    with open(fpath, "rb") as f:
+        riff_id, riff_size, form = struct.unpack("<4sI4s", f.read(12))
+        if riff_id != b"RIFF" or form != b"sfbk":
+            raise ValueError("Not a SoundFont file")
+        end = 8 + riff_size
+        pos = 12
+        while pos + 12 <= end:
+            f.seek(pos)
+            chunk_id, chunk_size, list_type = struct.unpack("<4sI4s", f.read(12))
+            if chunk_id == b"LIST" and list_type == b"pdta":
+                pdta_end = pos + 8 + chunk_size
+                pos += 12
+                while pos + 8 <= pdta_end:
+                    f.seek(pos)
+                    sub_id, sub_size = struct.unpack("<4sI", f.read(8))
+                    if sub_id == b"phdr":
+                        data = f.read(sub_size)
+                        if len(data) != sub_size or sub_size % PHDR_RECORD.size:
+                            raise ValueError("Bad preset headers chunk")
+                        presets = []
+                        # Skip terminal record (EOP)
+                        for i in range(0, sub_size - PHDR_RECORD.size, PHDR_RECORD.size):
+                            name, prog, bank = PHDR_RECORD.unpack_from(data, i)[:3]
+                            name = name.split(b"\0", 1)[0].decode("latin-1").strip()
+                            presets.append([bank, prog, name])
+                        presets.sort(key=lambda p: (p[0], p[1]))
+                        return presets
+                    pos += 8 + sub_size + (sub_size & 1)
+                break
+            # Skip chunk (sample data is never read)
+            pos += 8 + chunk_size + (chunk_size & 1)
+    raise ValueError("Preset headers not found")
+
+
+def load_preset_cache():
+    try:
+        with open(PRESET_CACHE_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.warning(f"Can't load soundfont presets cache => {e}")
+    return {}
+
+
+def save_preset_cache(cache):
+    try:
+        tmp_fpath = PRESET_CACHE_FILE + ".tmp"
+        with open(tmp_fpath, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_fpath, PRESET_CACHE_FILE)
+    except Exception as e:
+        logging.error(f"Can't save soundfont presets cache => {e}")
+
+
+def get_preset_headers(fpath):
+    """Get preset headers of a SF2/SF3 file, from cache if file has not changed
+
+    fpath : SoundFont file path
+    returns : List of [bank, program, name] or None if file can't be parsed
+    """
+
+    global preset_cache
+
+    try:
+        st = os.stat(fpath)
+    except OSError as e:
+        logging.warning(f"Can't access soundfont '{fpath}' => {e}")
+        return None
+    with preset_cache_lock:
+        if preset_cache is None:
+            preset_cache = load_preset_cache()
+        try:
+            size, mtime, presets = preset_cache[fpath]
+            if size == st.st_size and mtime == st.st_mtime:
+                return presets
+        except (KeyError, ValueError):
+            pass
+    try:
+        presets = parse_preset_headers(fpath)
+    except (OSError, ValueError, struct.error) as e:
+        logging.warning(f"Can't parse soundfont '{fpath}' => {e}")
+        return None
+    with preset_cache_lock:
+        preset_cache[fpath] = [st.st_size, st.st_mtime, presets]
+        save_preset_cache(preset_cache)
+    return presets
+
+# ------------------------------------------------------------------------------
@@ -23,8 +23,11 @@
 #
 # ****************************************************************************
 
+import sys
+import copy
 import base64
 import ctypes
+import select
 import logging
 import traceback
 from glob import glob
@@ -49,8 +52,10 @@ from zynlibs.zynsmf.zynsmf import libsmf  # Direct access to shared library
 
 from zyngine.zynthian_chain_manager import *
 from zyngine.zynthian_processor import zynthian_processor
+from zyngine.zynthian_controller import zynthian_controller
 from zyngine.zynthian_audio_recorder import zynthian_audio_recorder
 from zyngine.zynthian_signal_manager import zynsigman
+from zyngine.zynthian_fs_index import zynexindex
 from zyngine import zynthian_legacy_snapshot
 from zyngine import zynthian_engine_audio_mixer
 from zyngine import zynthian_midi_filter
@@ -63,6 +68,8 @@ from zyngine.zynthian_ctrldev_manager import zynthian_ctrldev_manager
 # ----------------------------------------------------------------------------
 
 SNAPSHOT_SCHEMA_VERSION = 1
+ZS3_BASE_ID = "zs3-0"  # ZS3 used as base state. Other ZS3 only store differences from it.
+ZS3_DELETED_KEY = "_deleted"  # Key for list of keys removed from base state in ZS3 deltas
 capture_dir_sdc = os.environ.get('ZYNTHIAN_MY_DATA_DIR', "/zynthian/zynthian-my-data") + "/capture"
 ex_data_dir = os.environ.get('ZYNTHIAN_EX_DATA_DIR', "/media/root")
 
@@ -83,6 +90,9 @@ class zynthian_state_manager:
     SS_AUDIO_RECORDER_STATE = 1
     SS_AUDIO_RECORDER_ARM = 2
 
+    # Chain zmop parameters restored by ZS3: [name, default value]
+    zs3_zmop_params = (("note_low", 0), ("note_high", 127), ("transpose_octave", 0), ("transpose_semitone", 0))
+
     def __init__(self):
         """ Create an instance of a state manager
 
@@ -109,6 +119,9 @@ class zynthian_state_manager:
         self.snapshot_program = 0
         self.zs3 = {}  # Dictionary or zs3 configs indexed by "ch/pc"
         self.last_zs3_id = None
+        self.zs3_recall_stats = None  # Stats of last ZS3 recall: {"zs3_id", "time", "avoided"}
+        self.zs3_plans = {}  # ZS3 recall plans indexed by ZS3 ID (see compile_zs3_plan)
+        self.zs3_plans_key = None  # Chains & processors the ZS3 recall plans were compiled for
 
         # Power saving
         self.power_save_mode = False
@@ -263,6 +276,7 @@ class zynthian_state_manager:
         if self.slow_thread and self.slow_thread.is_alive():
             self.slow_thread.join()
         self.slow_thread = None
+        zynexindex.stop()
 
         self.last_snapshot_fpath = ""
         self.zynseq.transport_stop("ALL")
@@ -553,6 +567,7 @@ class zynthian_state_manager:
         # Short delay after startup before first slow update
         next_second_check = monotonic() + 2
         self.add_slow_update_callback(3600, self.check_for_updates)
+        self.add_slow_update_callback(2, self.check_external_storage)
 
         while not self.exit_flag:
             # Get CPU Load
@@ -620,9 +635,6 @@ class zynthian_state_manager:
                     self.status_midi_recorder = status_midi_recorder
                     zynsigman.send(zynsigman.S_STATE_MAN, self.SS_MIDI_RECORDER_STATE, state=status_midi_recorder)
 
-                # Sequencer Status => It must be improved using callbacks
-                self.zynseq.update_state()
-
                 # Clean some status flags
                 if xruns_status:
                     self.status_xrun = False
@@ -668,10 +680,44 @@ class zynthian_state_manager:
     def fast_thread_task(self):
         """Perform fast / high priority background tasks"""
 
+        zynmidi_fd = self.get_zynmidi_event_fd()
+        if zynmidi_fd < 0:
+            # Legacy lib_zyncore without notification fd => poll the buffer
+            logging.info("Using polling MIDI reader")
+            while not self.exit_flag:
+                self.zynmidi_read()
+                sleep(0.01)
+            return
+
+        # Event driven MIDI reader: wake only when lib_zyncore signals new events.
+        # Timeout just allows the thread to check the exit flag.
+        logging.info("Using event-driven MIDI reader")
+        poller = select.poll()
+        poller.register(zynmidi_fd, select.POLLIN)
         while not self.exit_flag:
-            # Process MIDI events
+            try:
+                if not poller.poll(200):
+                    continue
+                # Clear the notification before draining, so events written meanwhile signal again
+                os.read(zynmidi_fd, 8)
+            except BlockingIOError:
+                pass
+            except Exception as e:
+                logging.error(e)
+                sleep(0.01)
             self.zynmidi_read()
-            sleep(0.01)
+
+    @staticmethod
+    def get_zynmidi_event_fd():
+        """Get the file descriptor signalled by lib_zyncore when zynmidi events are written
+
+        Returns fd (eventfd/pipe) or -1 if not supported by lib_zyncore
+        """
+
+        try:
+            return lib_zyncore.get_zynmidi_event_fd()
+        except (AttributeError, TypeError):
+            return -1
 
     def add_slow_update_callback(self, rate, cb):
         """Add a callback to be called every "rate" seconds
@@ -699,6 +745,136 @@ class zynthian_state_manager:
     # MIDI processing
     # ------------------------------------------------------------------
 
+    @staticmethod
+    def decode_zynmidi_buffer(midi_events, n):
+        """Decode a batch of words read from the zynmidi buffer in a single pass
+
+        midi_events - ctypes c_uint32 array
+        n - Quantity of valid words in midi_events
+        Returns list of (izmip, ev) tuples in reception order. SysEx messages spanning
+        several words are reassembled into a single event, cropped at 0xF7.
+        """
+
+        # Each word is [izmip, status, data1, data2] (MSB first). Reorder the whole
+        # buffer at once so word i is at data[4*i:4*i+4], whatever the host byte order.
+        raw = memoryview(midi_events).cast('B')[:n * 4]
+        if sys.byteorder == "little":
+            data = bytearray(n * 4)
+            data[0::4] = raw[3::4]
+            data[1::4] = raw[2::4]
+            data[2::4] = raw[1::4]
+            data[3::4] = raw[0::4]
+        else:
+            data = bytearray(raw)
+        heads = data[1::4]
+
+        events = []
+        i = 0
+        while i < n:
+            pos = i * 4
+            izmip = data[pos]
+            if heads[i] != 0xF0:
+                events.append((izmip, bytes(data[pos + 1:pos + 4])))
+                i += 1
+                continue
+            # SysEx continues on following words until a word containing 0xF7
+            end = data.find(0xF7, pos + 4)
+            if end < 0:
+                # This is probably not correct and we should continue reading in the next period
+                logging.error(f"SysEx message from device {izmip} is not terminated")
+                break
+            # logging.debug(f"  SYSEX DATA FROM {izmip} => {data[pos + 1:end + 1]}")
+            events.append((izmip, bytes(data[pos + 1:end + 1])))
+            i = end // 4 + 1
+        return events
+
+    def get_midi_cc_coalesce_mode(self, izmip, chan, ccnum):
+        """Get how CC messages with the same device, channel & number may be merged within a batch
+
+        izmip - MIDI input device index
+        chan - MIDI channel
+        ccnum - CC number
+        Returns 0 to keep last value (absolute), 1-3 to add deltas (relative) or None to keep every message
+        """
+
+        # Devices managed by ctrldev drivers, master channel, special CCs, pedals and feedback are not merged
+        if izmip in self.ctrldev_manager.drivers or izmip == ZMIP_CTRL_INDEX:
+            return None
+        if chan == zynthian_gui_config.master_midi_channel:
+            return None
+        if ccnum >= 120 or ccnum in (0, 32) or ccnum in self.chain_manager.held_zctrls:
+            return None
+        if self.zynmixer.midi_learn_zctrl:
+            return None
+
+        zctrls = self.chain_manager.get_midi_cc_zctrls(izmip, chan, ccnum)
+        for learned_cc in self.zynmixer.learned_cc:
+            if ccnum in learned_cc:
+                zctrls.append(learned_cc[ccnum])
+                break
+        # ALSA mixer dispatches CC to controllers learned on any channel
+        try:
+            for learned_cc in self.alsa_mixer_processor.engine.learned_cc:
+                if ccnum in learned_cc:
+                    zctrls.append(learned_cc[ccnum])
+        except AttributeError:
+            pass
+        cc_mode = 0
+        for i, zctrl in enumerate(zctrls):
+            zctrl_mode = zctrl.get_midi_cc_coalesce_mode()
+            if zctrl_mode is None or (i > 0 and zctrl_mode != cc_mode):
+                return None
+            cc_mode = zctrl_mode
+        return cc_mode
+
+    def coalesce_midi_cc(self, events):
+        """Merge redundant CC messages within a batch of decoded zynmidi events
+
+        events - List of (izmip, ev) tuples, as returned by decode_zynmidi_buffer
+        Returns list of events where CC messages for each (izmip, chan, ccnum) are replaced, at the
+        position of the last one, by the last value (absolute mode) or the accumulated delta (relative mode).
+        """
+
+        cc_modes = {}  # CC mode indexed by (izmip, chan, ccnum), None if not merged
+        last = {}  # Index of last event indexed by (izmip, chan, ccnum)
+        deltas = {}  # Accumulated relative delta indexed by (izmip, chan, ccnum)
+        count = 0  # Quantity of mergeable events
+        for i, (izmip, ev) in enumerate(events):
+            if len(ev) != 3 or ev[0] & 0xF0 != 0xB0:
+                continue
+            key = (izmip, ev[0] & 0x0F, ev[1] & 0x7F)
+            try:
+                cc_mode = cc_modes[key]
+            except KeyError:
+                cc_mode = cc_modes[key] = self.get_midi_cc_coalesce_mode(*key)
+            if cc_mode is None:
+                continue
+            last[key] = i
+            count += 1
+            if cc_mode > 0:
+                deltas[key] = deltas.get(key, 0) + zynthian_controller.midi_cc_rel2delta(cc_mode, ev[2] & 0x7F)
+
+        # Nothing to merge
+        if count == len(last):
+            return events
+
+        result = []
+        for i, (izmip, ev) in enumerate(events):
+            if len(ev) != 3 or ev[0] & 0xF0 != 0xB0:
+                result.append((izmip, ev))
+                continue
+            key = (izmip, ev[0] & 0x0F, ev[1] & 0x7F)
+            cc_mode = cc_modes[key]
+            if cc_mode is None:
+                result.append((izmip, ev))
+            elif last[key] == i:
+                if cc_mode == 0:
+                    result.append((izmip, ev))
+                else:
+                    for val in zynthian_controller.midi_cc_delta2rel(cc_mode, deltas[key]):
+                        result.append((izmip, bytes((ev[0], ev[1], val))))
+        return result
+
     def zynmidi_read(self):
         try:
             n = lib_zyncore.get_zynmidi_num_pending()
@@ -706,34 +882,11 @@ class zynthian_state_manager:
                 return
             midi_events = (ctypes.c_uint32 * n)()
             n = lib_zyncore.read_zynmidi_buffer(midi_events, n)
-            i = 0
-            while i < n:
-                ev = midi_events[i].to_bytes(4, 'big')
-                i += 1
-                izmip = ev[0]
-                evhead = ev[1]
-                ev = ev[1:]
-
-                # Process SysEx
-                if evhead == 0xF0:
-                    # logging.debug(f"RECEIVED SYSEX FROM {izmip}...")
-                    sysex_data = bytearray(ev)
-                    while i < n:
-                        chunk = midi_events[i].to_bytes(4, 'big')
-                        sysex_data.extend(chunk)
-                        if 0xF7 in chunk:
-                            break
-                        i += 1
-                    # This is probably not correct and we should continue reading in the next period
-                    if i == n:
-                        logging.error(
-                            f"SysEx message from device {izmip} is not terminated")
-                        continue
-                    # Crop data until find the 0xF7 mark
-                    while sysex_data[-1] != 0xF7:
-                        del sysex_data[-1]
-                    # logging.debug(f"  SYSEX DATA => {sysex_data}")
-                    ev = bytes(sysex_data)
+            midi_events = self.decode_zynmidi_buffer(midi_events, n)
+            if zynthian_gui_config.midi_cc_coalesce and not self.midi_learn_zctrl:
+                midi_events = self.coalesce_midi_cc(midi_events)
+            for izmip, ev in midi_events:
+                evhead = ev[0]
 
                 # Try to manage with a control device driver
                 if self.ctrldev_manager.midi_event(izmip, ev):
@@ -1192,7 +1345,9 @@ class zynthian_state_manager:
                 zs3 = self.sanitize_zs3_from_json(state["zs3"])
                 if not merge:
                     self.zs3 = zs3
-                self.load_zs3(zs3["zs3-0"], autoconnect=False)
+                    self.compact_zs3()
+                self.load_zs3(zs3["zs3-0"], autoconnect=False, diff=False)
+                self.compile_zs3_plans()
                 try:
                     mute |= self.zs3["zs3-0"]["mixer"]["chan_16"]["mute"]
                 except:
@@ -1343,7 +1498,7 @@ class zynthian_state_manager:
         self.zs3[zs3_id]["title"] = title
 
     def toggle_zs3_chain_restore_flag(self, zs3_id, chain_id):
-        zs3_state = self.zs3[zs3_id]
+        zs3_state = self.get_zs3_state(zs3_id)
         if chain_id == "mixer":
             tstate = zs3_state["mixer"]
         else:
@@ -1352,14 +1507,19 @@ class zynthian_state_manager:
             tstate["restore"] = not tstate["restore"]
         except:
             tstate["restore"] = False
+        self.set_zs3_state(zs3_id, zs3_state)
 
-    def load_zs3(self, zs3_id, autoconnect=True):
+    def load_zs3(self, zs3_id, autoconnect=True, diff=True):
         """Restore a ZS3
 
         zs3_id : ID of ZS3 to restore or zs3 dict
+        autoconnect : True to request autoconnect if routing changed
+        diff : True to only apply settings that differ from current state, False to apply all
         Returns : True on success
         """
 
+        ts = monotonic()
+
         if isinstance(zs3_id, str):
             # Try loading exact match
             try:
@@ -1372,6 +1532,7 @@ class zynthian_state_manager:
                 except:
                     logging.info(f"Not found ZS3 matching '{zs3_id}'")
                     return False
+            plan = self.get_zs3_plan(zs3_id)
         else:
             try:
                 zs3_state = zs3_id
@@ -1380,141 +1541,261 @@ class zynthian_state_manager:
                     zs3_id = "zs3-0"
             except:
                 zs3_id = "zs3-0"
+            plan = self.compile_zs3_plan(zs3_state)
+
+        avoided, routing_changed = self.run_zs3_plan(plan, diff)
+
+        if zs3_id != 'zs3-0':
+            self.last_zs3_id = zs3_id
+            #self.zs3['zs3-0'] = self.zs3[zs3_id].copy()
+        self.zs3_recall_stats = {
+            "zs3_id": zs3_id,
+            "time": monotonic() - ts,
+            "avoided": avoided
+        }
+        logging.info(f"ZS3 '{zs3_id}' recalled in {1000 * self.zs3_recall_stats['time']:.1f}ms => {avoided} sends avoided")
+        zynsigman.send(zynsigman.S_STATE_MAN, self.SS_LOAD_ZS3, zs3_id=zs3_id)
+
+        if autoconnect and (routing_changed or not diff):
+            zynautoconnect.request_midi_connect(True)
+            zynautoconnect.request_audio_connect(True)
+        return True
+
+    def get_zs3_plan_key(self):
+        """Get key identifying current chains & processors, used for validating ZS3 recall plans"""
+
+        return (tuple((chain_id, chain, chain.mixer_chan) for chain_id, chain in self.chain_manager.chains.items()),
+                tuple((proc_id, processor, processor.chain_id) for proc_id, processor in self.chain_manager.processors.items()))
+
+    def get_zs3_plan(self, zs3_id):
+        """Get recall plan for a stored ZS3, compiling it if needed
+
+        zs3_id : ZS3 ID
+        Returns : Recall plan
+        """
+
+        plan_key = self.get_zs3_plan_key()
+        if plan_key != self.zs3_plans_key:
+            self.zs3_plans = {}
+            self.zs3_plans_key = plan_key
+        try:
+            plan = self.zs3_plans[zs3_id]
+            if plan["source"] is self.zs3[zs3_id]:
+                return plan
+        except KeyError:
+            pass
+        plan = self.compile_zs3_plan(self.get_zs3_state(zs3_id))
+        plan["source"] = self.zs3[zs3_id]
+        self.zs3_plans[zs3_id] = plan
+        return plan
+
+    def compile_zs3_plans(self):
+        """Compile recall plans for all stored ZS3"""
+
+        self.zs3_plans = {}
+        self.zs3_plans_key = self.get_zs3_plan_key()
+        for zs3_id in self.zs3:
+            try:
+                self.zs3_plans[zs3_id] = self.compile_zs3_plan(self.get_zs3_state(zs3_id))
+                self.zs3_plans[zs3_id]["source"] = self.zs3[zs3_id]
+            except Exception as e:
+                logging.error(f"Can't compile ZS3 '{zs3_id}' => {e}")
+
+    def invalidate_zs3_plan(self, zs3_id=None):
+        """Invalidate ZS3 recall plan
+
+        zs3_id : ZS3 ID (Default: all)
+        """
+
+        if zs3_id is None:
+            self.zs3_plans = {}
+        else:
+            self.zs3_plans.pop(zs3_id, None)
+
+    def compile_zs3_plan(self, zs3_state):
+        """Compile ZS3 state into a recall plan
+
+        Chain, processor & controller references are resolved, so recalling
+        only has to apply the values. Controllers are resolved again by symbol
+        when recalling if the processor rebuilt them since compiling (see
+        zynthian_processor.controllers_version) or if bank & preset selection
+        changed.
+
+        zs3_state : ZS3 state dictionary
+        Returns : Recall plan dictionary
+        """
+
+        plan = {
+            "source": zs3_state,  # Stored ZS3 the plan was compiled from
+            "chains": [],  # [chain, chain_state, mute]
+            "processors": [],  # [processor, proc_state, values, switches, controllers_version]
+            "midi_cc": [],  # [processor, cc, symbol, zctrl, controllers_version]
+            "mixer": None,
+            "global": zs3_state.get("global")
+        }
+        # Only present in plan if present in ZS3 state
+        for key in "active_chain", "midi_capture":
+            if key in zs3_state:
+                plan[key] = zs3_state[key]
 
         restored_chains = []
-        restored_cc_mapping = []
-        mute_pause = False
-        if "chains" in zs3_state:
-            self.set_busy_details("restoring chains state")
-            for chain_id, chain_state in zs3_state["chains"].items():
-                chain_id = int(chain_id)
+        for chain_id, chain_state in zs3_state.get("chains", {}).items():
+            chain_id = int(chain_id)
+            if not chain_state.get("restore", True):
+                continue
+            chain = self.chain_manager.get_chain(chain_id)
+            if not chain:
+                continue
+            restored_chains.append(chain_id)
+            try:
+                mute = bool(zs3_state["mixer"][f"chan_{chain.mixer_chan:02}"]["mute"])
+            except:
+                mute = False
+            plan["chains"].append([chain, chain_state, mute])
+            for cc, cfg in chain_state.get("midi_cc", {}).items():
+                for proc_id, symbol in cfg:
+                    try:
+                        processor = self.chain_manager.processors[proc_id]
+                    except KeyError:
+                        continue
+                    plan["midi_cc"].append([processor, int(cc), symbol,
+                        processor.controllers_dict.get(symbol), processor.controllers_version])
 
-                try:
-                    restore_flag = chain_state["restore"]
-                except:
-                    restore_flag = True
+        for proc_id, proc_state in zs3_state.get("processors", {}).items():
+            try:
+                processor = self.chain_manager.processors[int(proc_id)]
+            except KeyError:
+                logging.error(f"Failed to restore processor {proc_id} state => not found")
+                continue
+            if processor.chain_id not in restored_chains:
+                continue
+            values, switches = processor.get_controllers_values(proc_state.get("controllers", {}))
+            plan["processors"].append([processor, proc_state, values, switches, processor.controllers_version])
 
-                if not restore_flag:
-                    continue
+        if "mixer" in zs3_state and zs3_state["mixer"].get("restore", True):
+            plan["mixer"] = zs3_state["mixer"]
 
-                chain = self.chain_manager.get_chain(chain_id)
-                if chain:
-                    restored_chains.append(chain_id)
-                else:
-                    continue
+        return plan
 
-                try:
-                    if zs3_state["mixer"][f"chan_{chain.mixer_chan:02}"]["mute"]:
-                        # Avoid subsequent config changes from being heard on muted chains
-                        self.zynmixer.set_mute(chain.mixer_chan, 1)
-                        mute_pause = True
-                except:
-                    pass
+    def run_zs3_plan(self, plan, diff=True):
+        """Apply a ZS3 recall plan
 
-                if "midi_chan" in chain_state:
-                    if chain.midi_chan is not None and chain.midi_chan != chain_state['midi_chan']:
-                        self.chain_manager.set_midi_chan(chain_id, chain_state['midi_chan'])
+        plan : Recall plan, as returned by compile_zs3_plan
+        diff : True to only apply settings that differ from current state, False to apply all
+        Returns : Tuple (avoided, routing_changed) => number of avoided sends, True if some routing changed
+        """
 
-                if chain.zmop_index is not None:
-                    if "note_low" in chain_state:
-                        lib_zyncore.zmop_set_note_low(chain.zmop_index, chain_state["note_low"])
-                    else:
-                        lib_zyncore.zmop_set_note_low(chain.zmop_index, 0)
-                    if "note_high" in chain_state:
-                        lib_zyncore.zmop_set_note_high(chain.zmop_index, chain_state["note_high"])
-                    else:
-                        lib_zyncore.zmop_set_note_high(chain.zmop_index, 127)
-                    if "transpose_octave" in chain_state:
-                        lib_zyncore.zmop_set_transpose_octave(chain.zmop_index, chain_state["transpose_octave"])
-                    else:
-                        lib_zyncore.zmop_set_transpose_octave(chain.zmop_index, 0)
-                    if "transpose_semitone" in chain_state:
-                        lib_zyncore.zmop_set_transpose_semitone(chain.zmop_index, chain_state["transpose_semitone"])
+        routing_changed = False
+        avoided = 0
+        mute_pause = False
+        if plan["chains"]:
+            self.set_busy_details("restoring chains state")
+        for chain, chain_state, mute in plan["chains"]:
+            if mute:
+                # Avoid subsequent config changes from being heard on muted chains
+                self.zynmixer.set_mute(chain.mixer_chan, 1)
+                mute_pause = True
+
+            if "midi_chan" in chain_state:
+                if chain.midi_chan is not None and chain.midi_chan != chain_state['midi_chan']:
+                    self.chain_manager.set_midi_chan(chain.chain_id, chain_state['midi_chan'])
+                    routing_changed = True
+
+            if chain.zmop_index is not None:
+                for key, default in self.zs3_zmop_params:
+                    value = chain_state.get(key, default)
+                    if diff and getattr(lib_zyncore, f"zmop_get_{key}")(chain.zmop_index) == value:
+                        avoided += 1
                     else:
-                        lib_zyncore.zmop_set_transpose_semitone(chain.zmop_index, 0)
-                if "midi_in" in chain_state:
-                    chain.midi_in = chain_state["midi_in"]
-                if "midi_out" in chain_state:
-                    chain.midi_out = chain_state["midi_out"]
-                if "midi_thru" in chain_state:
-                    chain.midi_thru = chain_state["midi_thru"]
-                if "audio_in" in chain_state:
-                    chain.audio_in = chain_state["audio_in"]
-                chain.audio_out = []
-                if "audio_out" in chain_state:
-                    for out in chain_state["audio_out"]:
-                        if isinstance(out, list):
-                            chain.audio_out.append(f"{self.chain_manager.processors[out[0]].jackname}:{out[1]}")
-                        elif isinstance(out, str) and out.startswith("system:playback_["):
-                            # Nasty temporary fix for change of output routing
-                            chain.audio_out.append("^system:playback_1$|^system:playback_2$")
-                        elif out not in chain.audio_out:
-                            chain.audio_out.append(out)
-
-                if "audio_thru" in chain_state:
-                    chain.audio_thru = chain_state["audio_thru"]
+                        getattr(lib_zyncore, f"zmop_set_{key}")(chain.zmop_index, value)
+            routing = chain.get_routing_state()
+            if "midi_in" in chain_state:
+                chain.midi_in = chain_state["midi_in"]
+            if "midi_out" in chain_state:
+                chain.midi_out = chain_state["midi_out"]
+            if "midi_thru" in chain_state:
+                chain.midi_thru = chain_state["midi_thru"]
+            if "audio_in" in chain_state:
+                chain.audio_in = chain_state["audio_in"]
+            chain.audio_out = []
+            if "audio_out" in chain_state:
+                for out in chain_state["audio_out"]:
+                    if isinstance(out, list):
+                        chain.audio_out.append(f"{self.chain_manager.processors[out[0]].jackname}:{out[1]}")
+                    elif isinstance(out, str) and out.startswith("system:playback_["):
+                        # Nasty temporary fix for change of output routing
+                        chain.audio_out.append("^system:playback_1$|^system:playback_2$")
+                    elif out not in chain.audio_out:
+                        chain.audio_out.append(out)
+
+            if "audio_thru" in chain_state:
+                chain.audio_thru = chain_state["audio_thru"]
+            if diff and chain.get_routing_state() == routing:
+                avoided += 1
+            else:
                 chain.rebuild_graph()
-                if "midi_cc" in chain_state:
-                    for cc, cfg in chain_state["midi_cc"].items():
-                        for proc_id, symbol in cfg:
-                            if proc_id in self.chain_manager.processors:
-                                restored_cc_mapping.append((proc_id, int(cc), symbol))
+                routing_changed = True
         if mute_pause:
             # Wait for soft mutes to apply before changing settings
             sleep(self.jack_period)
 
-        if "processors" in zs3_state:
-            for proc_id, proc_state in zs3_state["processors"].items():
-                try:
-                    processor = self.chain_manager.processors[int(proc_id)]
-                    if processor.chain_id in restored_chains:
-                        self.set_busy_details(f"restoring {processor.get_basepath()} state")
-                        processor.set_state(proc_state)
-                except Exception as e:
-                    logging.error(f"Failed to restore processor {proc_id} state => {e}")
-
-        for cc_map in restored_cc_mapping:
-            processor = self.chain_manager.processors[cc_map[0]]
+        for entry in plan["processors"]:
+            processor, proc_state = entry[0], entry[1]
+            try:
+                self.set_busy_details(f"restoring {processor.get_basepath()} state")
+                proc_avoided = processor.set_bank_preset_state(proc_state, diff)
+                if proc_avoided == 0 or entry[4] != processor.controllers_version:
+                    # Bank/preset selected or controllers rebuilt => resolve controllers again
+                    entry[2], entry[3] = processor.get_controllers_values(proc_state.get("controllers", {}))
+                    entry[4] = processor.controllers_version
+                # Cached controller values are stale after changing bank/preset
+                avoided += proc_avoided + processor.set_controllers_values(entry[2], entry[3], diff and proc_avoided > 0)
+            except Exception as e:
+                logging.error(f"Failed to restore processor {processor.id} state => {e}")
+
+        for entry in plan["midi_cc"]:
+            processor, cc, symbol = entry[0], entry[1], entry[2]
+            if entry[4] != processor.controllers_version:
+                entry[3] = processor.controllers_dict.get(symbol)
+                entry[4] = processor.controllers_version
+            if entry[3] is None:
+                logging.warning(f"Failed to restore MIDI learning {cc} => {symbol}")
+                continue
             try:
-                zctrl = processor.controllers_dict[cc_map[2]]
-                self.chain_manager.add_midi_learn(processor.midi_chan, cc_map[1], zctrl)
+                self.chain_manager.add_midi_learn(processor.midi_chan, cc, entry[3])
             except:
-                logging.warning(f"Failed to restore MIDI learning {cc_map[1]} => {cc_map[2]}")
+                logging.warning(f"Failed to restore MIDI learning {cc} => {symbol}")
 
-        if "active_chain" in zs3_state:
-            self.chain_manager.set_active_chain_by_id(zs3_state["active_chain"])
+        if "active_chain" in plan:
+            self.chain_manager.set_active_chain_by_id(plan["active_chain"])
 
-        if "mixer" in zs3_state:
-            try:
-                restore_flag = zs3_state["mixer"]["restore"]
-            except:
-                restore_flag = True
-            if restore_flag:
-                self.set_busy_details("restoring mixer state")
-                self.zynmixer.set_state(zs3_state["mixer"])
+        if plan["mixer"]:
+            self.set_busy_details("restoring mixer state")
+            self.zynmixer.set_state(plan["mixer"])
 
-        if "midi_capture" in zs3_state:
+        if "midi_capture" in plan:
             self.set_busy_details("restoring midi capture state")
-            self.set_midi_capture_state(zs3_state['midi_capture'])
+            self.set_midi_capture_state(plan["midi_capture"])
 
-        if "global" in zs3_state:
-            if "midi_transpose" in zs3_state["global"]:
-                lib_zyncore.set_global_transpose(int(zs3_state["global"]["midi_transpose"]))
-            if "zctrl_x" in zs3_state["global"]:
+        zs3_global = plan["global"]
+        if zs3_global:
+            if "midi_transpose" in zs3_global:
+                lib_zyncore.set_global_transpose(int(zs3_global["midi_transpose"]))
+            if "zctrl_x" in zs3_global:
                 try:
-                    processor = self.chain_manager.processors[zs3_state["global"]["zctrl_x"][0]]
-                    self.zctrl_x = processor.controllers_dict[zs3_state["global"]["zctrl_x"][1]]
+                    processor = self.chain_manager.processors[zs3_global["zctrl_x"][0]]
+                    self.zctrl_x = processor.controllers_dict[zs3_global["zctrl_x"][1]]
                 except:
                     self.zctrl_x = None
-            if "zctrl_y" in zs3_state["global"]:
+            if "zctrl_y" in zs3_global:
                 try:
-                    processor = self.chain_manager.processors[zs3_state["global"]["zctrl_y"][0]]
-                    self.zctrl_y = processor.controllers_dict[zs3_state["global"]["zctrl_y"][1]]
+                    processor = self.chain_manager.processors[zs3_global["zctrl_y"][0]]
+                    self.zctrl_y = processor.controllers_dict[zs3_global["zctrl_y"][1]]
                 except:
                     self.zctrl_y = None
-            if "zynaptik" in zs3_state["global"]:
+            if "zynaptik" in zs3_global:
                 try:
-                    zynaptik_config = zs3_state["global"]["zynaptik"]
+                    zynaptik_config = zs3_global["zynaptik"]
                     lib_zyncore.zynaptik_cvin_set_volts_octave(ctypes.c_float(zynaptik_config["cvin_volts_octave"]))
                     lib_zyncore.zynaptik_cvin_set_note0(zynaptik_config["cvin_note0"])
                     lib_zyncore.zynaptik_cvout_set_volts_octave(ctypes.c_float(zynaptik_config["cvout_volts_octave"]))
@@ -1522,15 +1803,7 @@ class zynthian_state_manager:
                 except:
                     pass
 
-        if zs3_id != 'zs3-0':
-            self.last_zs3_id = zs3_id
-            #self.zs3['zs3-0'] = self.zs3[zs3_id].copy()
-        zynsigman.send(zynsigman.S_STATE_MAN, self.SS_LOAD_ZS3, zs3_id=zs3_id)
-
-        if autoconnect:
-            zynautoconnect.request_midi_connect(True)
-            zynautoconnect.request_audio_connect(True)
-        return True
+        return avoided, routing_changed
 
     def save_zs3(self, zs3_id=None, title=None):
         """Store current state as ZS3
@@ -1565,7 +1838,7 @@ class zynthian_state_manager:
                 title = zs3_id.upper()
 
         # Initialise zs3
-        self.zs3[zs3_id] = {
+        zs3_state = {
             "title": title,
             "active_chain": self.chain_manager.active_chain_id,
             "global": {}
@@ -1619,7 +1892,7 @@ class zynthian_state_manager:
             if chain_state:
                 chain_states[chain_id] = chain_state
         if chain_states:
-            self.zs3[zs3_id]["chains"] = chain_states
+            zs3_state["chains"] = chain_states
 
         # Add processors
         processor_states = {}
@@ -1634,30 +1907,30 @@ class zynthian_state_manager:
                 processor_state["controllers"][symbol] = zctrl.get_state()
             processor_states[id] = processor_state
         if processor_states:
-            self.zs3[zs3_id]["processors"] = processor_states
+            zs3_state["processors"] = processor_states
 
         # Add mixer state
         mixer_state = self.zynmixer.get_state(False)
         if mixer_state:
-            self.zs3[zs3_id]["mixer"] = mixer_state
+            zs3_state["mixer"] = mixer_state
 
         # Add MIDI capture state
         mcstate = self.get_midi_capture_state()
         if mcstate:
-            self.zs3[zs3_id]["midi_capture"] = mcstate
+            zs3_state["midi_capture"] = mcstate
 
         # Add global parameters
-        self.zs3[zs3_id]["global"]["midi_transpose"] = lib_zyncore.get_global_transpose()
+        zs3_state["global"]["midi_transpose"] = lib_zyncore.get_global_transpose()
         try:
             processor_id = self.zctrl_x.processor.id
             symbol = self.zctrl_x.symbol
-            self.zs3[zs3_id]["global"]["zctrl_x"] = [processor_id, symbol]
+            zs3_state["global"]["zctrl_x"] = [processor_id, symbol]
         except:
             pass
         try:
             processor_id = self.zctrl_y.processor.id
             symbol = self.zctrl_y.symbol
-            self.zs3[zs3_id]["global"]["zctrl_y"] = [processor_id, symbol]
+            zs3_state["global"]["zctrl_y"] = [processor_id, symbol]
         except:
             pass
         try:
@@ -1670,7 +1943,7 @@ class zynthian_state_manager:
                     "cvout_volts_octave": lib_zyncore.zynaptik_cvout_get_volts_octave(),
                     "cvout_note0": lib_zyncore.zynaptik_cvout_get_note0()
                 }
-                self.zs3[zs3_id]["global"]["zynaptik"] = zynaptik_config
+                zs3_state["global"]["zynaptik"] = zynaptik_config
         except:
             pass
 
@@ -1678,6 +1951,11 @@ class zynthian_state_manager:
             self.last_zs3_id = zs3_id
             # Jofemodo: this has not sense from my POV
             #self.zs3['zs3-0'] = self.zs3[zs3_id].copy()
+        self.set_zs3_state(zs3_id, zs3_state)
+        try:
+            self.get_zs3_plan(zs3_id)
+        except Exception as e:
+            logging.error(f"Can't compile ZS3 '{zs3_id}' => {e}")
         zynsigman.send(zynsigman.S_STATE_MAN, self.SS_SAVE_ZS3, zs3_id=zs3_id)
 
     def delete_zs3(self, zs3_id):
@@ -1686,18 +1964,193 @@ class zynthian_state_manager:
         zs3_id : Index of ZS3 to remove
         """
         try:
+            if zs3_id == ZS3_BASE_ID:
+                # Other ZS3 can't depend on the removed base state anymore
+                for zid in self.zs3:
+                    if zid != zs3_id:
+                        self.zs3[zid] = self.get_zs3_state(zid)
             del (self.zs3[zs3_id])
+            self.invalidate_zs3_plan(zs3_id)
             if self.last_zs3_id == zs3_id:
                 self.last_zs3_id = None
 
         except:
             logging.info("Tried to remove non-existant ZS3")
 
+    def get_zs3_state(self, zs3_id):
+        """Get full state of a ZS3, reconstructing it from base state if needed
+
+        zs3_id : ZS3 ID
+        Returns : ZS3 state dictionary (a copy)
+        """
+
+        zs3_state = self.zs3[zs3_id]
+        if zs3_state.get("base") == ZS3_BASE_ID and ZS3_BASE_ID in self.zs3:
+            zs3_state = self.apply_state_delta(self.zs3[ZS3_BASE_ID], zs3_state)
+            del zs3_state["base"]
+            return zs3_state
+        return copy.deepcopy(zs3_state)
+
+    def set_zs3_state(self, zs3_id, zs3_state):
+        """Store ZS3 state, keeping only differences from base state
+
+        Storing the base state rebases all other ZS3.
+
+        zs3_id : ZS3 ID
+        zs3_state : Full ZS3 state dictionary
+        """
+
+        if zs3_id == ZS3_BASE_ID:
+            old_base_state = self.zs3.get(ZS3_BASE_ID)
+            self.zs3[zs3_id] = zs3_state
+            if old_base_state is not None:
+                for zid, state in self.zs3.items():
+                    if zid != ZS3_BASE_ID and state.get("base") == ZS3_BASE_ID:
+                        self.zs3[zid] = copy.deepcopy(self.rebase_state_delta(old_base_state, zs3_state, state))
+        else:
+            self.zs3[zs3_id] = self.get_zs3_delta(zs3_state)
+        self.invalidate_zs3_plan(zs3_id)
+
+    def get_zs3_delta(self, zs3_state):
+        """Get ZS3 delta from base state
+
+        zs3_state : Full ZS3 state dictionary
+        Returns : ZS3 delta dictionary, or full ZS3 state if there is no base state
+        """
+
+        try:
+            base_state = self.zs3[ZS3_BASE_ID]
+        except KeyError:
+            return zs3_state
+        zs3_delta = copy.deepcopy(self.get_state_delta(base_state, zs3_state))
+        zs3_delta["base"] = ZS3_BASE_ID
+        zs3_delta["title"] = zs3_state["title"]
+        return zs3_delta
+
+    def compact_zs3(self):
+        """Convert full ZS3 states (i.e. from legacy snapshots) to deltas from base state"""
+
+        if ZS3_BASE_ID not in self.zs3:
+            return
+        for zs3_id, zs3_state in self.zs3.items():
+            if zs3_id != ZS3_BASE_ID and zs3_state.get("base") != ZS3_BASE_ID:
+                self.zs3[zs3_id] = self.get_zs3_delta(zs3_state)
+
+    @staticmethod
+    def get_state_delta(base, state):
+        """Get differences between state dictionaries
+
+        Nested dictionaries are compared recursively. Keys missing in state are
+        listed in ZS3_DELETED_KEY. Returned values may reference state's values.
+
+        base : Base state dictionary
+        state : State dictionary
+        Returns : Delta dictionary
+        """
+
+        delta = {}
+        for key, value in state.items():
+            try:
+                base_value = base[key]
+            except KeyError:
+                delta[key] = value
+                continue
+            if isinstance(value, dict) and isinstance(base_value, dict):
+                value_delta = zynthian_state_manager.get_state_delta(base_value, value)
+                if value_delta:
+                    delta[key] = value_delta
+            elif value != base_value:
+                delta[key] = value
+        deleted = [key for key in base if key not in state]
+        if deleted:
+            delta[ZS3_DELETED_KEY] = deleted
+        return delta
+
+    @staticmethod
+    def rebase_state_delta(old_base, new_base, delta):
+        """Get delta from a new base state, without reconstructing the full state
+
+        Subtrees not changed by delta are compared between bases, so unchanged
+        parts are cheap. Returned values may reference values from the arguments.
+
+        old_base : Base state dictionary delta refers to
+        new_base : New base state dictionary
+        delta : Delta dictionary from old_base
+        Returns : Delta dictionary from new_base
+        """
+
+        result = {}
+        deleted = delta.get(ZS3_DELETED_KEY, ())
+        new_deleted = []
+        for key in set(old_base) | set(delta) | set(new_base):
+            if key == ZS3_DELETED_KEY:
+                continue
+            old_value = old_base.get(key)
+            new_value = new_base.get(key)
+            if key in delta:
+                value = delta[key]
+                if isinstance(value, dict) and isinstance(old_value, dict) and key not in deleted:
+                    # Partial delta from old base
+                    if isinstance(new_value, dict):
+                        value = zynthian_state_manager.rebase_state_delta(old_value, new_value, value)
+                        if value:
+                            result[key] = value
+                    else:
+                        result[key] = zynthian_state_manager.apply_state_delta(old_value, value, False)
+                    continue
+            elif key in old_base and key not in deleted:
+                value = old_value
+            else:
+                # Not in state
+                if key in new_base:
+                    new_deleted.append(key)
+                continue
+            if key not in new_base:
+                result[key] = value
+            elif isinstance(value, dict) and isinstance(new_value, dict):
+                if value != new_value:
+                    result[key] = zynthian_state_manager.get_state_delta(new_value, value)
+            elif value != new_value:
+                result[key] = value
+        if new_deleted:
+            result[ZS3_DELETED_KEY] = new_deleted
+        return result
+
+    @staticmethod
+    def apply_state_delta(base, delta, deep=True):
+        """Reconstruct state dictionary from base state and delta
+
+        base : Base state dictionary
+        delta : Delta dictionary, as returned by get_state_delta
+        deep : True to return a deep copy, False to share values with base and delta
+        Returns : State dictionary
+        """
+
+        deleted = delta.get(ZS3_DELETED_KEY, ())
+        state = {}
+        for key, value in base.items():
+            if key in deleted:
+                continue
+            try:
+                value_delta = delta[key]
+            except KeyError:
+                state[key] = copy.deepcopy(value) if deep else value
+                continue
+            if isinstance(value_delta, dict) and isinstance(value, dict):
+                state[key] = zynthian_state_manager.apply_state_delta(value, value_delta, deep)
+            else:
+                state[key] = copy.deepcopy(value_delta) if deep else value_delta
+        for key, value in delta.items():
+            if key not in base and key != ZS3_DELETED_KEY:
+                state[key] = copy.deepcopy(value) if deep else value
+        return state
+
     def reset_zs3(self):
         """Remove all ZS3"""
 
         # ZS3 list (subsnapshots)
         self.zs3 = {}
+        self.invalidate_zs3_plan()
 
     def sanitize_zs3_from_json(self, zs3_state):
         """Fix chain & processor ID keys in ZS3 data decoded from JSON"""
@@ -1712,6 +2165,9 @@ class zynthian_state_manager:
             if 'chains' in state:
                 fixed_chains = {}
                 for chain_id, chain_state in state['chains'].items():
+                    if chain_id == ZS3_DELETED_KEY:
+                        fixed_chains[chain_id] = [int(cid) for cid in chain_state]
+                        continue
                     try:
                         chain_id = int(chain_id)
                     except:
@@ -1723,6 +2179,9 @@ class zynthian_state_manager:
             if 'processors' in state:
                 fixed_processors = {}
                 for processor_id, processor_state in state['processors'].items():
+                    if processor_id == ZS3_DELETED_KEY:
+                        fixed_processors[processor_id] = [int(pid) for pid in processor_state]
+                        continue
                     try:
                         processor_id = int(processor_id)
                     except:
@@ -1738,20 +2197,27 @@ class zynthian_state_manager:
         """Remove non-existant chains and processors from ZS3 state"""
 
         for key, state in self.zs3.items():
-            if state["active_chain"] not in self.chain_manager.chains:
+            if "active_chain" in state and state["active_chain"] not in self.chain_manager.chains:
                 state["active_chain"] = self.chain_manager.active_chain_id
+                self.invalidate_zs3_plan(key)
             if "processors" in state:
                 for processor_id in list(state["processors"]):
+                    if processor_id == ZS3_DELETED_KEY:
+                        continue
                     if int(processor_id) not in self.chain_manager.processors:
                         logging.debug(
                             f"Purging processor {processor_id} from ZS3 {key}")
                         del state["processors"][processor_id]
+                        self.invalidate_zs3_plan(key)
             if "chains" in state:
                 for chain_id in list(state["chains"]):
+                    if chain_id == ZS3_DELETED_KEY:
+                        continue
                     if int(chain_id) not in self.chain_manager.chains:
                         logging.debug(
                             f"Purging chain {chain_id} from ZS3 {key}")
                         del state["chains"][chain_id]
+                        self.invalidate_zs3_plan(key)
 
     # ------------------------------------------------------------------
     # Jackd Info
@@ -2723,6 +3189,11 @@ class zynthian_state_manager:
         except:
             return False
 
+    def check_external_storage(self):
+        """Start background indexing of new external storage mounts"""
+
+        zynexindex.check_mounts(zynthian_gui_config.get_external_storage_dirs(ex_data_dir))
+
     def check_for_updates(self):
         if self.checking_for_updates:
             return
@@ -115,6 +115,7 @@ class zynthian_gui:
         self.capture_dir_sdc = os.environ.get('ZYNTHIAN_MY_DATA_DIR', "/zynthian/zynthian-my-data") + "/capture"
         self.ex_data_dir = os.environ.get('ZYNTHIAN_EX_DATA_DIR', "/media/root")
 
+        self.startup_ts = monotonic()  # Startup timestamp, used for measuring time to first screen
         self.test_mode = False
         self.alt_mode = False
         self.ignore_next_touch_release = False
@@ -554,6 +555,7 @@ class zynthian_gui:
 
         # Show initial screen
         self.show_screen(init_screen, zynthian_gui.SCREEN_HMODE_RESET)
+        logging.info(f"Time to first screen: {monotonic() - self.startup_ts:.2f}s")
 
     def hide_screens(self, exclude=None):
         if not exclude:
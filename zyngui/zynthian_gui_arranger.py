@@ -164,6 +164,7 @@ class zynthian_gui_arranger(zynthian_gui_base.zynthian_gui_base):
 
         # Local copy so we know if it has changed and grid needs redrawing
         self.bank = self.zynseq.bank
+        self.timeline_version = None
         self.update_sequence_tracks()
         # 0:No refresh, 1:Refresh cell, 2:Refresh row, 3:Refresh grid, 4: Redraw grid
         self.redraw_pending = 4
@@ -810,8 +811,9 @@ class zynthian_gui_arranger(zynthian_gui_base.zynthian_gui_base):
             return
         if redraw_sequence_titles:
             self.draw_sequence_label(row)
+        timeline = self.zynseq.get_timeline(self.zynseq.bank)
         for col in range(self.horizontal_zoom):
-            self.draw_cell(col, row)
+            self.draw_cell(col, row, timeline)
 
     # Function to handle sequence title click
     def on_sequence_click(self, event):
@@ -839,7 +841,8 @@ class zynthian_gui_arranger(zynthian_gui_base.zynthian_gui_base):
     # Function to draw a grid cell
     #  col: Column index (0..horizontal zoom)
     #  row: Row index (0..vertical zoom)
-    def draw_cell(self, col, row):
+    #  timeline: Pattern placement (from zynseq.get_timeline) or None to get from library
+    def draw_cell(self, col, row, timeline=None):
         if row >= self.vertical_zoom:
             return
         # Cells are stored in array sequentially: 1st row, 2nd row...
@@ -852,23 +855,21 @@ class zynthian_gui_arranger(zynthian_gui_base.zynthian_gui_base):
         time = (self.col_offset + col) * \
             self.clocks_per_division  # time in clock cycles
 
-        pattern = self.zynseq.libseq.getPattern(
-            self.zynseq.bank, sequence, track, time)
-        if pattern == -1 and col == 0:
+        if timeline is None:
+            timeline = self.zynseq.get_timeline(self.zynseq.bank)
+        track_patterns = timeline.get((sequence, track), {})
+        pattern = -1
+        if time in track_patterns:
+            pattern, length = track_patterns[time]
+            duration = int(length / self.clocks_per_division)
+        elif col == 0:
             # Search for earlier pattern that extends into view
-            pattern = self.zynseq.libseq.getPatternAt(
-                self.zynseq.bank, sequence, track, time)
-            if pattern != -1:
-                duration = int(self.zynseq.libseq.getPatternLength(
-                    pattern) / self.clocks_per_division)
-                while time > 0 and duration > 1:
-                    time -= self.clocks_per_division
-                    duration -= 1
-                    if pattern == self.zynseq.libseq.getPattern(self.zynseq.bank, sequence, track, time):
-                        break
-        elif pattern != -1:
-            duration = int(self.zynseq.libseq.getPatternLength(
-                pattern) / self.clocks_per_division)
+            for position, (pat, length) in track_patterns.items():
+                if position < time < position + length:
+                    pattern = pat
+                    duration = int(length / self.clocks_per_division) - \
+                        (time - position) // self.clocks_per_division
+                    break
         if pattern == -1:
             duration = 1
             fill = CANVAS_BACKGROUND
@@ -1173,6 +1174,12 @@ class zynthian_gui_arranger(zynthian_gui_base.zynthian_gui_base):
     # Function to refresh playhead
     def refresh_status(self):
         super().refresh_status()
+        timeline_version = self.zynseq.libseq.getTimelineVersion()
+        if timeline_version != self.timeline_version:
+            # Timeline changed outside this screen
+            self.timeline_version = timeline_version
+            if not self.redraw_pending:
+                self.redraw_pending = 3
         if self.redraw_pending:
             self.draw_grid()
         previous_sequence = -1
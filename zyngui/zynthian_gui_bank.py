@@ -28,6 +28,7 @@ import logging
 import copy
 
 # Zynthian specific modules
+from zyngine.zynthian_signal_manager import zynsigman
 from zyngui import zynthian_gui_config
 from zyngui.zynthian_gui_selector import zynthian_gui_selector
 
@@ -60,6 +61,8 @@ class zynthian_gui_bank(zynthian_gui_selector):
                     self.index = 0
                 else:
                     self.processor.set_show_fav_presets(False)
+            zynsigman.register_queued(
+                zynsigman.S_EXT_STORAGE, zynsigman.SS_EXT_STORAGE_INDEX, self.cb_ext_storage_index)
             return super().build_view()
         else:
             return False
@@ -68,6 +71,31 @@ class zynthian_gui_bank(zynthian_gui_selector):
         if len(self.list_data) > 0:
             super().show()
 
+    def hide(self):
+        if self.shown:
+            zynsigman.unregister(
+                zynsigman.S_EXT_STORAGE, zynsigman.SS_EXT_STORAGE_INDEX, self.cb_ext_storage_index)
+            super().hide()
+
+    def cb_ext_storage_index(self, exdpath, **kwargs):
+        """Refresh bank list while external storage is being indexed
+
+        exdpath : Mount point of external storage
+        """
+
+        if not self.shown or not self.processor:
+            return
+        try:
+            bank = self.list_data[self.index][0]
+        except IndexError:
+            bank = None
+        self.update_list()
+        for i, row in enumerate(self.list_data):
+            if bank is not None and row[0] == bank:
+                if i != self.index:
+                    self.select(i)
+                break
+
     def select_action(self, i, t='S'):
         if self.list_data and self.list_data[i][0] == '*FAVS*':
             self.processor.set_show_fav_presets(True)
@@ -354,7 +354,7 @@ def config_zyntof():
 
 def set_midi_config():
     global active_midi_channel, preset_preload_noteon, midi_prog_change_zs3
-    global midi_bank_change, midi_fine_tuning
+    global midi_bank_change, midi_cc_coalesce, midi_fine_tuning
     global midi_filter_rules, midi_sys_enabled, midi_usb_by_port
     global midi_network_enabled, midi_rtpmidi_enabled, midi_netump_enabled
     global midi_touchosc_enabled, bluetooth_enabled, ble_controller, midi_aubionotes_enabled
@@ -370,6 +370,7 @@ def set_midi_config():
     active_midi_channel = int(os.environ.get('ZYNTHIAN_MIDI_ACTIVE_CHANNEL', "0"))
     midi_prog_change_zs3 = int(os.environ.get('ZYNTHIAN_MIDI_PROG_CHANGE_ZS3', "1"))
     midi_bank_change = int(os.environ.get('ZYNTHIAN_MIDI_BANK_CHANGE', "0"))
+    midi_cc_coalesce = int(os.environ.get('ZYNTHIAN_MIDI_CC_COALESCE', "1"))
     preset_preload_noteon = int(os.environ.get('ZYNTHIAN_MIDI_PRESET_PRELOAD_NOTEON', "1"))
     midi_sys_enabled = int(os.environ.get('ZYNTHIAN_MIDI_SYS_ENABLED', "1"))
     midi_usb_by_port = int(os.environ.get("ZYNTHIAN_MIDI_USB_BY_PORT", "0"))
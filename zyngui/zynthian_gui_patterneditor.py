@@ -1104,13 +1104,23 @@ class zynthian_gui_patterneditor(zynthian_gui_base.zynthian_gui_base):
         self.drawing = False
         self.select_cell(step, row)
 
+    # Function to get snapshot of pattern notes for drawing
+    # Returns: Dictionary of note parameters, indexed by (step, note)
+    def get_pattern_notes(self):
+        # Flush modified flag to avoid refresh redrawing whole grid => Is this OK?
+        self.zynseq.libseq.isPatternModified()
+        return self.zynseq.get_pattern_notes()
+
     # Function to draw a grid row
     # row: Row number (keymap index)
     # colour: Black, white or None (default) to not care
-    def draw_row(self, row, white=None):
+    # notes: Snapshot of pattern notes (from get_pattern_notes) or None to get from library
+    def draw_row(self, row, white=None, notes=None):
+        if notes is None:
+            notes = self.get_pattern_notes()
         self.grid_canvas.itemconfig(f"lastnotetext{row}", state="hidden")
         for step in range(self.n_steps):
-            self.draw_cell(step, row, white)
+            self.draw_cell(step, row, white, notes)
 
     # Function to get cell coordinates
     # col: Column number (step)
@@ -1129,9 +1139,10 @@ class zynthian_gui_patterneditor(zynthian_gui_base.zynthian_gui_base):
     # step: Step (column) index
     # row: Index of row
     # white: True for white notes
-    def draw_cell(self, step, row, white=None):
-        # Flush modified flag to avoid refresh redrawing whole grid => Is this OK?
-        self.zynseq.libseq.isPatternModified()
+    # notes: Snapshot of pattern notes (from get_pattern_notes) or None to get from library
+    def draw_cell(self, step, row, white=None, notes=None):
+        if notes is None:
+            notes = self.get_pattern_notes()
         # Cells are stored in array sequentially: 1st row, 2nd row...
         cellIndex = row * self.n_steps + step
         if cellIndex >= len(self.cells):
@@ -1144,11 +1155,12 @@ class zynthian_gui_patterneditor(zynthian_gui_base.zynthian_gui_base):
             else:
                 white = True
 
-        velocity_colour = self.zynseq.libseq.getNoteVelocity(step, note)
+        try:
+            velocity_colour, duration, offset = notes[(step, note)][:3]
+        except KeyError:
+            velocity_colour = 0
         if velocity_colour:
             velocity_colour += 70
-            duration = self.zynseq.libseq.getNoteDuration(step, note)
-            offset = self.zynseq.libseq.getNoteOffset(step, note)
             fill_colour = f"#{velocity_colour:02x}{velocity_colour:02x}{velocity_colour:02x}"
         else:
             self.grid_canvas.delete(cell)
@@ -1241,6 +1253,7 @@ class zynthian_gui_patterneditor(zynthian_gui_base.zynthian_gui_base):
                 row_min = self.selected_cell[1]
                 row_max = self.selected_cell[1]
 
+            notes = self.get_pattern_notes()
             for row in range(row_min, row_max):
                 # Create last note labels in grid
                 self.grid_canvas.create_text(self.total_width - self.select_thickness, int(self.row_height * (
@@ -1274,7 +1287,7 @@ class zynthian_gui_patterneditor(zynthian_gui_base.zynthian_gui_base):
                     self.grid_canvas.create_line(
                         0, ypos, self.total_width, ypos, fill=GRID_LINE_WEAK, tags="gridline")
                 # Draw row of note cells
-                self.draw_row(row, (colour == "white"))
+                self.draw_row(row, (colour == "white"), notes)
 
         # Set z-order to allow duration to show
         if redraw_pending > 2:
@@ -1632,8 +1645,10 @@ class zynthian_gui_patterneditor(zynthian_gui_base.zynthian_gui_base):
             pending_rows = set()
             while not self.rows_pending.empty():
                 pending_rows.add(self.rows_pending.get_nowait())
-            while len(pending_rows):
-                self.draw_row(pending_rows.pop(), None)
+            if pending_rows:
+                notes = self.get_pattern_notes()
+                while len(pending_rows):
+                    self.draw_row(pending_rows.pop(), None, notes)
         self.save_pattern_snapshot(now=False, force=False)
 
     # Function to handle MIDI notes (only used to refresh screen - actual MIDI input handled by lib)
@@ -76,7 +76,7 @@ class zynthian_gui_zs3_options(zynthian_gui_selector):
 
     def zs3_restoring_submenu(self):
         try:
-            state = self.zyngui.state_manager.zs3[self.zs3_id]
+            state = self.zyngui.state_manager.get_zs3_state(self.zs3_id)
         except:
             logging.error("Bad ZS3 id ({}).".format(self.zs3_id))
             return
@@ -88,7 +88,7 @@ class zynthian_gui_zs3_options(zynthian_gui_selector):
 
     def zs3_restoring_options_cb(self):
         try:
-            state = self.zyngui.state_manager.zs3[self.zs3_id]
+            state = self.zyngui.state_manager.get_zs3_state(self.zs3_id)
         except:
             logging.error(f"Bad ZS3 id ({self.zs3_id}).")
             return
@@ -135,7 +135,7 @@ class zynthian_gui_zs3_options(zynthian_gui_selector):
                 self.zs3_id, id)
         elif ct == "B":
             try:
-                state = self.zyngui.state_manager.zs3[self.zs3_id]
+                state = self.zyngui.state_manager.get_zs3_state(self.zs3_id)
             except:
                 logging.error("Bad ZS3 ID ({}).".format(self.zs3_id))
                 return
@@ -156,7 +156,7 @@ class zynthian_gui_zs3_options(zynthian_gui_selector):
     def zs3_update(self):
         logging.info("Updating ZS3 '{}'".format(self.zs3_id))
         restore_chains = []
-        state = self.zyngui.state_manager.zs3[self.zs3_id]
+        state = self.zyngui.state_manager.get_zs3_state(self.zs3_id)
         if "chains" in state:
             for chain_id, chain_state in state["chains"].items():
                 if "restore" in chain_state and not chain_state["restore"]:
@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# Benchmark of pattern editor and arranger grid redraw data access
+# Compares per-cell getNoteVelocity / getNoteDuration / getNoteOffset calls against a single getPatternNotes call.
+# Compares per-cell getPattern / getPatternLength calls against a single getTimeline call.
+# Canvas drawing is not included because it is the same for both methods.
+# Measures latency from setPlayState to state event received by a thread waiting on getStateEventFd.
+#
+# Usage: benchmark.py [path to libzynseq.so]
+
+import os
+import sys
+import ctypes
+import select
+from threading import Thread
+from time import perf_counter, sleep
+from os.path import dirname, realpath
+
+
+# Same as zynseq.note_event (packed NOTE_EVENT struct), defined here to avoid importing zyngine
+class note_event(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [("step", ctypes.c_uint32),
+                ("duration", ctypes.c_float),
+                ("offset", ctypes.c_float),
+                ("note", ctypes.c_uint8),
+                ("velocity", ctypes.c_uint8),
+                ("stutter_count", ctypes.c_uint8),
+                ("stutter_dur", ctypes.c_uint8),
+                ("play_chance", ctypes.c_uint8)]
+
+
+# Same as zynseq.timeline_event (packed TIMELINE_EVENT struct)
+class timeline_event(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [("sequence", ctypes.c_uint8),
+                ("track", ctypes.c_uint32),
+                ("position", ctypes.c_uint32),
+                ("pattern", ctypes.c_uint32),
+                ("length", ctypes.c_uint32)]
+
+
+# Same as zynseq.state_event (STATE_EVENT struct)
+class state_event(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_uint8),
+                ("bank", ctypes.c_uint8),
+                ("sequence", ctypes.c_uint8),
+                ("progress", ctypes.c_uint8),
+                ("state", ctypes.c_uint32)]
+
+
+if len(sys.argv) > 1:
+    libseq = ctypes.CDLL(sys.argv[1])
+else:
+    libseq = ctypes.CDLL(dirname(realpath(__file__)) + "/build/libzynseq.so")
+libseq.addNote.argtypes = [ctypes.c_uint32, ctypes.c_uint8, ctypes.c_uint8, ctypes.c_float, ctypes.c_float]
+libseq.getNoteDuration.restype = ctypes.c_float
+libseq.getNoteOffset.restype = ctypes.c_float
+libseq.getPatternNotes.argtypes = [ctypes.POINTER(note_event), ctypes.c_uint32]
+libseq.getPatternNotes.restype = ctypes.c_uint32
+libseq.getTimeline.argtypes = [ctypes.c_uint8, ctypes.c_uint8, ctypes.POINTER(timeline_event), ctypes.c_uint32]
+libseq.getTimeline.restype = ctypes.c_uint32
+libseq.getStateEvents.argtypes = [ctypes.POINTER(state_event), ctypes.c_uint32]
+libseq.getStateEvents.restype = ctypes.c_uint32
+
+STEPS = 64
+ROWS = 24  # Visible rows (notes) in grid
+NOTE0 = 48
+ITERATIONS = 20
+
+# Populate a pattern with 64 steps and a note every 2 steps on each row
+libseq.selectPattern(1)
+libseq.setBeatsInPattern(16)
+libseq.setStepsPerBeat(4)
+for row in range(ROWS):
+    for step in range(row % 2, STEPS, 2):
+        libseq.addNote(step, NOTE0 + row, 100, 1.0, 0.0)
+
+
+def redraw_per_cell():
+    cells = 0
+    for row in range(ROWS):
+        note = NOTE0 + row
+        for step in range(STEPS):
+            velocity = libseq.getNoteVelocity(step, note)
+            if velocity:
+                duration = libseq.getNoteDuration(step, note)
+                offset = libseq.getNoteOffset(step, note)
+                cells += 1
+    return cells
+
+
+buffer = (note_event * (STEPS * ROWS))()
+
+
+def redraw_bulk():
+    count = libseq.getPatternNotes(buffer, len(buffer))
+    notes = {(ev.step, ev.note): (ev.velocity, ev.duration, ev.offset) for ev in buffer[:count]}
+    cells = 0
+    for row in range(ROWS):
+        note = NOTE0 + row
+        for step in range(STEPS):
+            try:
+                velocity, duration, offset = notes[(step, note)]
+            except KeyError:
+                velocity = 0
+            if velocity:
+                cells += 1
+    return cells
+
+
+
+# Populate arranger bank with 16 sequences placing a pattern every 4 bars over 64 bars
+BANK = 1
+SEQUENCES = 16
+COLUMNS = 64  # Visible columns (bars) in arranger
+CLOCKS_PER_DIVISION = 96  # One bar of 4 beats at 24 clocks per beat
+libseq.setSequencesInBank(BANK, SEQUENCES)
+for sequence in range(SEQUENCES):
+    for bar in range(0, COLUMNS, 4):
+        libseq.addPattern(BANK, sequence, 0, bar * CLOCKS_PER_DIVISION, 1, True)
+
+
+def arranger_per_cell():
+    cells = 0
+    for sequence in range(SEQUENCES):
+        for col in range(COLUMNS):
+            pattern = libseq.getPattern(BANK, sequence, 0, col * CLOCKS_PER_DIVISION)
+            if pattern != -1:
+                duration = int(libseq.getPatternLength(pattern) / CLOCKS_PER_DIVISION)
+                cells += 1
+    return cells
+
+
+timeline_buffer = (timeline_event * (SEQUENCES * COLUMNS))()
+
+
+def arranger_bulk():
+    count = libseq.getTimeline(BANK, 0xFF, timeline_buffer, len(timeline_buffer))
+    timeline = {}
+    for ev in timeline_buffer[:count]:
+        timeline.setdefault((ev.sequence, ev.track), {})[ev.position] = (ev.pattern, ev.length)
+    cells = 0
+    for sequence in range(SEQUENCES):
+        track_patterns = timeline.get((sequence, 0), {})
+        for col in range(COLUMNS):
+            time = col * CLOCKS_PER_DIVISION
+            if time in track_patterns:
+                pattern, length = track_patterns[time]
+                duration = int(length / CLOCKS_PER_DIVISION)
+                cells += 1
+    return cells
+
+for name, func in (("pattern editor per-cell calls", redraw_per_cell), ("pattern editor bulk export", redraw_bulk),
+                   ("arranger per-cell calls", arranger_per_cell), ("arranger bulk timeline", arranger_bulk)):
+    func()
+    ts = perf_counter()
+    for i in range(ITERATIONS):
+        cells = func()
+    dt = (perf_counter() - ts) / ITERATIONS
+    print(f"{name}: {1000 * dt:.2f}ms per full-grid redraw ({cells} cells)")
+
+
+# Sequence state notification latency
+state_fd = libseq.getStateEventFd()
+state_buffer = (state_event * 64)()
+received = []
+
+
+def state_reader():
+    while len(received) < ITERATIONS:
+        if not select.select([state_fd], [], [], 1)[0]:
+            break
+        os.read(state_fd, 8)
+        while libseq.getStateEvents(state_buffer, len(state_buffer)):
+            received.append(perf_counter())
+
+
+while libseq.getStateEvents(state_buffer, len(state_buffer)):
+    pass
+libseq.setPlayMode(BANK, 0, 2)  # LOOP
+while libseq.getStateEvents(state_buffer, len(state_buffer)):
+    pass
+os.read(state_fd, 8)
+reader = Thread(target=state_reader)
+reader.start()
+sent = []
+for i in range(ITERATIONS):
+    sleep(0.01)
+    sent.append(perf_counter())
+    libseq.setPlayState(BANK, 0, 3 if i % 2 == 0 else 0)  # STARTING / STOPPED
+reader.join()
+latency = sorted(1000 * (rx - tx) for tx, rx in zip(sent, received))
+if latency:
+    print(f"state notification latency: median {latency[len(latency) // 2]:.3f}ms, max {latency[-1]:.3f}ms ({len(latency)} events)")
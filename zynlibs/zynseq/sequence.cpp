@@ -211,6 +211,20 @@ void Sequence::setPlayPosition(uint32_t position) { m_nPosition = position; }
 
 uint32_t Sequence::getPlayPosition() { return m_nPosition; }
 
+uint8_t Sequence::getProgress() {
+    if (m_nLength == 0)
+        return 0;
+    return 100 * m_nPosition / m_nLength;
+}
+
+bool Sequence::hasProgressChanged() {
+    uint8_t nProgress = getProgress();
+    if (nProgress == m_nProgress)
+        return false;
+    m_nProgress = nProgress;
+    return true;
+}
+
 void Sequence::setModified() { m_bChanged = true; }
 
 bool Sequence::isModified() {
@@ -152,6 +152,16 @@ class Sequence {
      */
     uint32_t getPlayPosition();
 
+    /** @brief  Get play position as percentage of sequence length
+     *   @retval uint8_t Progress (0..100) or 0 if sequence is empty
+     */
+    uint8_t getProgress();
+
+    /** @brief  Check if progress (percentage) has changed since last call
+     *   @retval bool True if changed
+     */
+    bool hasProgressChanged();
+
     /** @brief Flag sequence as modified
      */
     void setModified();
@@ -186,5 +196,6 @@ class Sequence {
     bool m_bChanged         = false;   // True if sequence content changed
     bool m_bStateChanged    = false;   // True if state changed since last clock cycle
     bool m_bEmpty           = true;    // True if all patterns are emtpy (no events)
+    uint8_t m_nProgress     = 0xFF;    // Progress reported by last call to hasProgressChanged
     std::string m_sName;               // Sequence name
 };
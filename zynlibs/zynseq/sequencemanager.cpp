@@ -142,12 +142,20 @@ void SequenceManager::removePattern(uint8_t bank, uint8_t sequence, uint32_t tra
     updateSequenceLength(bank, sequence);
 }
 
-void SequenceManager::updateSequenceLength(uint8_t bank, uint8_t sequence) { getSequence(bank, sequence)->updateLength(); }
+void SequenceManager::updateSequenceLength(uint8_t bank, uint8_t sequence) {
+    Sequence* pSequence = getSequence(bank, sequence);
+    uint32_t nLength    = pSequence->getLength();
+    bool bEmpty         = pSequence->isEmpty();
+    pSequence->updateLength();
+    // Pads & controller LEDs show empty sequences
+    if (pSequence->getLength() != nLength || pSequence->isEmpty() != bEmpty)
+        notifyState(bank, sequence);
+}
 
 void SequenceManager::updateAllSequenceLengths() {
     for (auto itBank = m_mBanks.begin(); itBank != m_mBanks.end(); ++itBank)
-        for (auto itSeq = itBank->second.begin(); itSeq != itBank->second.end(); ++itSeq)
-            (*itSeq)->updateLength();
+        for (size_t nSequence = 0; nSequence < itBank->second.size(); ++nSequence)
+            updateSequenceLength(itBank->first, nSequence);
 }
 
 size_t SequenceManager::clock(std::pair<double, double> timeinfo, std::multimap<uint32_t, MIDI_MESSAGE*>* pSchedule, bool bSync) {
@@ -175,8 +183,10 @@ size_t SequenceManager::clock(std::pair<double, double> timeinfo, std::multimap<
         }
         if (nEventType & 2) {
             // Change of state
-            // uint8_t nTrigger = getTriggerNote(it->first, it->second);
-            // It's currently polled from python
+            notifyState(it->first, it->second);
+        } else if (pSequence->hasProgressChanged()) {
+            STATE_EVENT event = {STATE_EVENT_PROGRESS, uint8_t(it->first), uint8_t(it->second), pSequence->getProgress(), pSequence->getState()};
+            m_stateQueue.push(event);
         }
         ++it;
     }
@@ -197,14 +207,25 @@ void SequenceManager::setSequencePlayState(uint8_t bank, uint8_t sequence, uint8
                     pPlayingSequence->setPlayState(STOPPED);
                 else if (pPlayingSequence->getPlayState() != STOPPED)
                     pPlayingSequence->setPlayState(STOPPING_SYNC);
+                notifyState(it->first, it->second);
             }
         }
         if (bAddToList)
             m_vPlayingSequences.push_back(std::pair<uint32_t, uint32_t>(bank, sequence));
     }
     pSequence->setPlayState(state);
+    notifyState(bank, sequence);
+}
+
+void SequenceManager::notifyState(uint8_t bank, uint8_t sequence) {
+    Sequence* pSequence = getSequence(bank, sequence);
+    pSequence->hasProgressChanged(); // Progress is sent with state
+    STATE_EVENT event = {STATE_EVENT_STATE, bank, sequence, pSequence->getProgress(), pSequence->getState()};
+    m_stateQueue.push(event);
 }
 
+StateQueue* SequenceManager::getStateQueue() { return &m_stateQueue; }
+
 uint8_t SequenceManager::getTriggerNote(uint8_t bank, uint8_t sequence) {
     uint16_t nValue = (bank << 8) | sequence;
     for (auto it = m_mTriggers.begin(); it != m_mTriggers.end(); ++it)
@@ -237,8 +258,10 @@ uint16_t SequenceManager::getTriggerSequence(uint8_t note) {
 size_t SequenceManager::getPlayingSequencesCount() { return m_vPlayingSequences.size(); }
 
 void SequenceManager::stop() {
-    for (auto it = m_vPlayingSequences.begin(); it != m_vPlayingSequences.end(); ++it)
+    for (auto it = m_vPlayingSequences.begin(); it != m_vPlayingSequences.end(); ++it) {
         getSequence(it->first, it->second)->setPlayState(STOPPED);
+        notifyState(it->first, it->second);
+    }
     m_vPlayingSequences.clear();
 }
 
@@ -1,6 +1,7 @@
 #pragma once
 #include "pattern.h"
 #include "sequence.h"
+#include "statequeue.h"
 #include "track.h"
 #include <map>
 
@@ -68,11 +69,13 @@ class SequenceManager {
     /** @brief  Update sequence lengths in current bank
      *   @param  bank Index of bank
      *   @param  sequence Index of sequence
+     *   @note   A state event is queued if sequence length or content changed
      */
     void updateSequenceLength(uint8_t bank, uint8_t sequence);
 
     /** @brief  Update all sequence lengths
      *   @note   Blunt tool to update each sequence after any pattern length changes
+     *   @note   A state event is queued for each sequence whose length or content changed
      */
     void updateAllSequenceLengths();
 
@@ -228,6 +231,17 @@ class SequenceManager {
      */
     uint32_t getBanks();
 
+    /** @brief  Queue notification of sequence state (and progress)
+     *   @param  bank Index of bank
+     *   @param  sequence Index of sequence
+     */
+    void notifyState(uint8_t bank, uint8_t sequence);
+
+    /** @brief  Get queue of sequence state and progress notifications
+     *   @retval StateQueue* Pointer to state queue
+     */
+    StateQueue* getStateQueue();
+
   private:
     int fileWrite32(uint32_t value, FILE* pFile);
     int fileWrite16(uint16_t value, FILE* pFile);
@@ -246,4 +260,5 @@ class SequenceManager {
         m_vPlayingSequences;                             // Vector of <bank,sequence> pairs for currently playing sequences (used to optimise play control)
     std::map<uint8_t, uint16_t> m_mTriggers;             // Map of bank<<8|sequence indexed by MIDI note triggers
     std::map<uint32_t, std::vector<Sequence*>> m_mBanks; // Map of banks: vectors of pointers to sequences indexed by bank
+    StateQueue m_stateQueue;                             // Queue of state and progress notifications
 };
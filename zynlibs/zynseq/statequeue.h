@@ -0,0 +1,115 @@
+#pragma once
+
+#include <atomic>
+#include <cstdint>
+#include <sys/eventfd.h>
+#include <unistd.h>
+
+#define STATE_QUEUE_SIZE 1024 // Must be power of 2
+
+// State event types (match zynseq SS_SEQ_PLAY_STATE and SS_SEQ_PROGRESS signals)
+#define STATE_EVENT_STATE 1
+#define STATE_EVENT_PROGRESS 3
+
+/** Sequence state event */
+struct STATE_EVENT {
+    uint8_t type;     // Event type [STATE_EVENT_STATE | STATE_EVENT_PROGRESS]
+    uint8_t bank;     // Index of bank
+    uint8_t sequence; // Index of sequence within bank
+    uint8_t progress; // Play position as percentage of sequence length
+    uint32_t state;   // Sequence state: group << 16 | mode << 8 | play state
+};
+
+/** StateQueue class provides a bounded, lock-free, multiple producer queue of sequence state events
+ *   Producers (JACK process thread and API callers) never block. Consumer is woken by an eventfd.
+ *   If the queue is full events are dropped and the overflow flag is set so that consumer can resynchronise.
+ */
+class StateQueue {
+  public:
+    StateQueue() {
+        for (size_t i = 0; i < STATE_QUEUE_SIZE; ++i)
+            m_aCells[i].sequence.store(i, std::memory_order_relaxed);
+        m_nFd = eventfd(0, EFD_NONBLOCK | EFD_CLOEXEC);
+    }
+
+    ~StateQueue() {
+        if (m_nFd >= 0)
+            close(m_nFd);
+    }
+
+    /** @brief  Add event to queue and wake consumer
+     *   @param  event Event to add
+     *   @retval bool True on success, false if queue is full
+     */
+    bool push(const STATE_EVENT& event) {
+        size_t nPos = m_nEnqueuePos.load(std::memory_order_relaxed);
+        Cell* pCell;
+        while (true) {
+            pCell         = &m_aCells[nPos & (STATE_QUEUE_SIZE - 1)];
+            size_t nSeq   = pCell->sequence.load(std::memory_order_acquire);
+            intptr_t nDif = (intptr_t)nSeq - (intptr_t)nPos;
+            if (nDif == 0) {
+                if (m_nEnqueuePos.compare_exchange_weak(nPos, nPos + 1, std::memory_order_relaxed))
+                    break;
+            } else if (nDif < 0) {
+                m_bOverflow.store(true, std::memory_order_relaxed);
+                wake();
+                return false;
+            } else {
+                nPos = m_nEnqueuePos.load(std::memory_order_relaxed);
+            }
+        }
+        pCell->event = event;
+        pCell->sequence.store(nPos + 1, std::memory_order_release);
+        wake();
+        return true;
+    }
+
+    /** @brief  Remove event from queue
+     *   @param  event Reference to event to populate
+     *   @retval bool True on success, false if queue is empty
+     *   @note   Only one consumer may call pop
+     */
+    bool pop(STATE_EVENT& event) {
+        size_t nPos   = m_nDequeuePos.load(std::memory_order_relaxed);
+        Cell* pCell   = &m_aCells[nPos & (STATE_QUEUE_SIZE - 1)];
+        size_t nSeq   = pCell->sequence.load(std::memory_order_acquire);
+        intptr_t nDif = (intptr_t)nSeq - (intptr_t)(nPos + 1);
+        if (nDif < 0)
+            return false;
+        event = pCell->event;
+        pCell->sequence.store(nPos + STATE_QUEUE_SIZE, std::memory_order_release);
+        m_nDequeuePos.store(nPos + 1, std::memory_order_relaxed);
+        return true;
+    }
+
+    /** @brief  Get file descriptor that becomes readable when events are queued
+     *   @retval int File descriptor (eventfd) or -1 if not available
+     */
+    int getFd() { return m_nFd; }
+
+    /** @brief  Check and clear overflow flag
+     *   @retval bool True if events have been dropped since last call
+     */
+    bool checkOverflow() { return m_bOverflow.exchange(false); }
+
+  private:
+    void wake() {
+        if (m_nFd < 0)
+            return;
+        uint64_t nValue = 1;
+        ssize_t nResult = write(m_nFd, &nValue, sizeof(nValue));
+        (void)nResult; // Counter saturation (EAGAIN) means consumer is already due to wake
+    }
+
+    struct Cell {
+        std::atomic<size_t> sequence;
+        STATE_EVENT event;
+    };
+
+    Cell m_aCells[STATE_QUEUE_SIZE];
+    std::atomic<size_t> m_nEnqueuePos{0};
+    std::atomic<size_t> m_nDequeuePos{0};
+    std::atomic<bool> m_bOverflow{false};
+    int m_nFd = -1;
+};
@@ -72,6 +72,29 @@ class TestLibZynSeq(unittest.TestCase):
         libseq.save(bytes("/tmp/test.zynseq", "utf-8"))
         self.assertTrue(filecmp.cmp(
             "/zynthian/zynthian-my-data/zynseq/default.zynseq", "/tmp/test.zynseq"))
+
+    def test_aa03_save_buffer(self):
+        libseq.save_buffer.restype = ctypes.c_uint32
+        libseq.get_save_buffer.restype = ctypes.c_void_p
+        size = libseq.save_buffer()
+        riff_data = ctypes.string_at(libseq.get_save_buffer(), size)
+        libseq.free_save_buffer()
+        with open("/zynthian/zynthian-my-data/zynseq/default.zynseq", "rb") as fh:
+            self.assertEqual(riff_data, fh.read())
+        self.assertEqual(libseq.get_save_buffer(), None)
+
+    def test_aa04_load_buffer(self):
+        libseq.load_buffer.argtypes = [ctypes.c_char_p, ctypes.c_uint32]
+        libseq.load_buffer.restype = ctypes.c_bool
+        with open("/zynthian/zynthian-my-data/zynseq/default.zynseq", "rb") as fh:
+            riff_data = fh.read()
+        version = libseq.getTimelineVersion()
+        self.assertFalse(libseq.load_buffer(riff_data, 0))
+        self.assertNotEqual(libseq.getTimelineVersion(), version)
+        self.assertTrue(libseq.load_buffer(riff_data, len(riff_data)))
+        libseq.save(bytes("/tmp/test.zynseq", "utf-8"))
+        self.assertTrue(filecmp.cmp(
+            "/zynthian/zynthian-my-data/zynseq/default.zynseq", "/tmp/test.zynseq"))
     # Check currently selected pattern has defined beat type, steps per beat [1|2|3|4|6|8|12|24] and quantity of beats in pattern
 
     def check_pattern(self, beat_type, steps_per_beat, beats_in_pattern):
@@ -157,6 +180,22 @@ class TestLibZynSeq(unittest.TestCase):
         self.assertEqual(libseq.getNoteDuration(0, 65), 0)
     #
 
+    def test_ac11_get_pattern_notes(self):
+        libseq.selectPattern(999)
+        libseq.clear()
+        libseq.addNote(2, 60, 100, ctypes.c_float(1.5), ctypes.c_float(0.25))
+        libseq.addNote(0, 64, 80, ctypes.c_float(2), ctypes.c_float(0))
+        libseq.setStutterCount(2, 60, 3)
+        self.assertEqual(libseq.getPatternNotes(None, 0), 2)
+        buffer = (zynseq.note_event * 1)()
+        self.assertEqual(libseq.getPatternNotes(buffer, 1), 2)
+        self.assertEqual((buffer[0].step, buffer[0].note, buffer[0].velocity), (0, 64, 80))
+        buffer = (zynseq.note_event * 4)()
+        self.assertEqual(libseq.getPatternNotes(buffer, 4), 2)
+        notes = [(ev.step, ev.note, ev.velocity, ev.duration, ev.offset, ev.stutter_count) for ev in buffer[:2]]
+        self.assertEqual(notes, [(0, 64, 80, 2.0, 0.0, 0), (2, 60, 100, 1.5, 0.25, 3)])
+    #
+
     def test_ac10_is_pattern_modified(self):
         libseq.selectPattern(999)
         libseq.addNote(0, 60, 100, 4, 0)
@@ -202,6 +241,47 @@ class TestLibZynSeq(unittest.TestCase):
         libseq.setPlayMode(0, 0, play_mode["LOOPSYNC"])
         self.assertEqual(libseq.getPlayMode(0, 0), play_mode["LOOPSYNC"])
 
+    def test_af02_timeline(self):
+        libseq.setSequencesInBank(2, 2)
+        libseq.clearSequence(2, 0)
+        libseq.clearSequence(2, 1)
+        version = libseq.getTimelineVersion()
+        self.assertTrue(libseq.addPattern(2, 1, 0, 96, 999, True))
+        self.assertNotEqual(libseq.getTimelineVersion(), version)
+        self.assertEqual(libseq.getTimeline(2, 1, None, 0), 1)
+        buffer = (zynseq.timeline_event * 4)()
+        self.assertEqual(libseq.getTimeline(2, 0xFF, buffer, 4), 1)
+        self.assertEqual((buffer[0].sequence, buffer[0].track, buffer[0].position, buffer[0].pattern),
+                         (1, 0, 96, 999))
+        libseq.selectPattern(999)
+        self.assertEqual(buffer[0].length, libseq.getPatternLength(999))
+        libseq.removePattern(2, 1, 0, 96)
+        self.assertEqual(libseq.getTimeline(2, 0xFF, None, 0), 0)
+
+    def test_af03_state_events(self):
+        buffer = (zynseq.state_event * 16)()
+        while libseq.getStateEvents(buffer, 16):
+            pass
+        libseq.setPlayMode(2, 1, play_mode["LOOP"])
+        self.assertEqual(libseq.getStateEvents(buffer, 16), 1)
+        self.assertEqual((buffer[0].type, buffer[0].bank, buffer[0].sequence, buffer[0].state & 0xff00),
+                         (zynseq.zynseq.SS_SEQ_PLAY_STATE, 2, 1, play_mode["LOOP"] << 8))
+        self.assertGreaterEqual(libseq.getStateEventFd(), 0)
+        self.assertFalse(libseq.checkStateEventOverflow())
+    #
+
+    def test_af04_load_pattern_timeline(self):
+        libseq.load_pattern.restype = ctypes.c_bool
+        libseq.selectPattern(999)
+        libseq.setBeatsInPattern(4)
+        libseq.save_pattern(999, bytes("/tmp/test.zpat", "utf-8"))
+        libseq.setBeatsInPattern(8)
+        version = libseq.getTimelineVersion()
+        self.assertTrue(libseq.load_pattern(999, bytes("/tmp/test.zpat", "utf-8")))
+        self.assertNotEqual(libseq.getTimelineVersion(), version)
+        self.assertEqual(libseq.getBeatsInPattern(), 4)
+    #
+
 
 '''
     # Sequence tests
@@ -76,6 +76,9 @@ bool g_bMidiRecord    = false;                      // True to add notes to curr
 bool g_bSustain       = false;                      // True if sustain pressed during note input
 
 char g_sName[16];                             // Buffer to hold sequence name so that it can be sent back for Python to parse
+char* g_pSaveBuffer      = NULL;               // Buffer holding RIFF data from last call to save_buffer
+size_t g_nSaveBufferSize = 0;                  // Size of RIFF data in g_pSaveBuffer
+uint32_t g_nTimelineVersion = 0;               // Incremented when any sequence timeline (pattern placement or length) changes
 uint8_t g_nInputRest                  = 0xFF; // MIDI note number that creates rest in pattern
 uint16_t g_nVerticalZoom              = 16;   // Quantity of rows to show in pattern and arranger view
 uint16_t g_nHorizontalZoom            = 16;   // Quantity of beats to show in arranger view
@@ -773,12 +776,13 @@ bool checkBlock(FILE* pFile, uint32_t nActualSize, uint32_t nExpectedSize) {
     return false;
 }
 
-bool load(const char* filename) {
+// Load sequences and patterns from RIFF stream and close stream
+bool loadStream(FILE* pFile) {
     g_pSequence = NULL;
     g_seqMan.init();
+    // All sequences are cleared, even if loading fails
+    ++g_nTimelineVersion;
     uint32_t nVersion = 0;
-    FILE* pFile;
-    pFile = fopen(filename, "r");
     if (pFile == NULL)
         return false;
     char sHeader[4];
@@ -979,11 +983,25 @@ bool load(const char* filename) {
     // printf("Ver: %d Loaded %lu patterns, %lu sequences, %lu banks from file %s\n", nVersion, m_mPatterns.size(), m_mSequences.size(), m_mBanks.size(),
     // filename);
     g_bDirty    = false;
+    ++g_nTimelineVersion;
     g_pSequence = g_seqMan.getSequence(0, 0);
     selectPattern(1);
     return true;
 }
 
+bool load(const char* filename) { return loadStream(fopen(filename, "r")); }
+
+bool load_buffer(const uint8_t* pData, uint32_t nSize) {
+    if (pData == NULL || nSize == 0) {
+        // fmemopen does not support empty buffers
+        g_pSequence = NULL;
+        g_seqMan.init();
+        ++g_nTimelineVersion;
+        return false;
+    }
+    return loadStream(fmemopen((void*)pData, nSize, "r"));
+}
+
 bool load_pattern(uint32_t nPattern, const char* filename) {
     uint32_t nVersion = 0;
     FILE* pFile;
@@ -1099,19 +1117,17 @@ bool load_pattern(uint32_t nPattern, const char* filename) {
         }
     }
     fclose(pFile);
+    // Pattern length may have changed
+    g_seqMan.updateAllSequenceLengths();
+    ++g_nTimelineVersion;
     // printf("Ver: %d Loaded %lu pattern from file %s\n", nVersion, m_mPatterns.size(), filename);
     return true;
 }
 
-void save(const char* filename) {
+// Save sequences and patterns to RIFF stream and close stream
+void saveStream(FILE* pFile) {
     //!@todo Need to save / load ticks per beat (unless we always use 1920)
-    FILE* pFile;
     int nPos = 0;
-    pFile    = fopen(filename, "w");
-    if (pFile == NULL) {
-        fprintf(stderr, "ERROR: SequenceManager failed to open file %s\n", filename);
-        return;
-    }
     uint32_t nBlockSize;
     fwrite("vers", 4, 1, pFile); // IFF block name
     nPos += 4;
@@ -1170,7 +1186,7 @@ void save(const char* filename) {
             nBlockSize = nPos - nStartOfBlock;
             fseek(pFile, nStartOfBlock - 4, SEEK_SET);
             fileWrite32(nBlockSize, pFile);
-            fseek(pFile, 0, SEEK_END);
+            fseek(pFile, nPos, SEEK_SET);
         }
         nPattern = g_seqMan.getNextPattern(nPattern);
     } while (nPattern != -1);
@@ -1237,13 +1253,41 @@ void save(const char* filename) {
         nBlockSize = nPos - nStartOfBlock;
         fseek(pFile, nStartOfBlock - 4, SEEK_SET);
         fileWrite32(nBlockSize, pFile);
-        fseek(pFile, 0, SEEK_END);
+        fseek(pFile, nPos, SEEK_SET);
     }
 
     fclose(pFile);
     g_bDirty = false;
 }
 
+void save(const char* filename) {
+    FILE* pFile = fopen(filename, "w");
+    if (pFile == NULL) {
+        fprintf(stderr, "ERROR: SequenceManager failed to open file %s\n", filename);
+        return;
+    }
+    saveStream(pFile);
+}
+
+uint32_t save_buffer() {
+    free_save_buffer();
+    FILE* pFile = open_memstream(&g_pSaveBuffer, &g_nSaveBufferSize);
+    if (pFile == NULL) {
+        fprintf(stderr, "ERROR: SequenceManager failed to open memory stream\n");
+        return 0;
+    }
+    saveStream(pFile);
+    return g_nSaveBufferSize;
+}
+
+const uint8_t* get_save_buffer() { return (const uint8_t*)g_pSaveBuffer; }
+
+void free_save_buffer() {
+    free(g_pSaveBuffer);
+    g_pSaveBuffer     = NULL;
+    g_nSaveBufferSize = 0;
+}
+
 void save_pattern(uint32_t nPattern, const char* filename) {
     //!@todo Need to save / load ticks per beat (unless we always use 1920)
 
@@ -1518,6 +1562,7 @@ void setBeatsInPattern(uint32_t beats) {
     g_seqMan.updateAllSequenceLengths();
     setPatternModified(g_seqMan.getPattern(g_nPattern), true, true);
     g_bDirty = true;
+    ++g_nTimelineVersion;
 }
 
 uint32_t getClocksPerStep() {
@@ -1711,6 +1756,31 @@ float getNoteDuration(uint32_t step, uint8_t note) {
     return 0;
 }
 
+uint32_t getPatternNotes(NOTE_EVENT* pBuffer, uint32_t nSize) {
+    Pattern* pPattern = g_seqMan.getPattern(g_nPattern);
+    if (!pPattern)
+        return 0;
+    uint32_t nCount = 0;
+    uint32_t nEvent = 0;
+    while (StepEvent* pEvent = pPattern->getEventAt(nEvent++)) {
+        if (pEvent->getCommand() != MIDI_NOTE_ON)
+            continue;
+        if (pBuffer && nCount < nSize) {
+            NOTE_EVENT* pNote   = pBuffer + nCount;
+            pNote->step         = pEvent->getPosition();
+            pNote->duration     = pEvent->getDuration();
+            pNote->offset       = pEvent->getOffset();
+            pNote->note         = pEvent->getValue1start();
+            pNote->velocity     = pEvent->getValue2start();
+            pNote->stutterCount = pEvent->getStutterCount();
+            pNote->stutterDur   = pEvent->getStutterDur();
+            pNote->playChance   = pEvent->getPlayChance();
+        }
+        ++nCount;
+    }
+    return nCount;
+}
+
 bool addProgramChange(uint32_t step, uint8_t program) {
     if (!g_seqMan.getPattern(g_nPattern))
         return false;
@@ -1789,6 +1859,7 @@ void clear() {
 void copyPattern(uint32_t source, uint32_t destination) {
     g_seqMan.copyPattern(source, destination);
     g_bDirty = true;
+    ++g_nTimelineVersion;
 }
 
 void setInputRest(uint8_t note) {
@@ -1900,12 +1971,15 @@ bool addPattern(uint8_t bank, uint8_t sequence, uint32_t track, uint32_t positio
     bool bUpdated = g_seqMan.addPattern(bank, sequence, track, position, pattern, force);
     if (bank + sequence)
         g_bDirty |= bUpdated;
+    if (bUpdated)
+        ++g_nTimelineVersion;
     return bUpdated;
 }
 
 void removePattern(uint8_t bank, uint8_t sequence, uint32_t track, uint32_t position) {
     g_seqMan.removePattern(bank, sequence, track, position);
     g_bDirty = true;
+    ++g_nTimelineVersion;
 }
 
 uint32_t getPattern(uint8_t bank, uint8_t sequence, uint32_t track, uint32_t position) {
@@ -1917,6 +1991,51 @@ uint32_t getPattern(uint8_t bank, uint8_t sequence, uint32_t track, uint32_t pos
     return g_seqMan.getPatternIndex(pPattern);
 }
 
+uint32_t getTimeline(uint8_t bank, uint8_t sequence, TIMELINE_EVENT* pBuffer, uint32_t nSize) {
+    uint32_t nCount     = 0;
+    uint32_t nSequence  = sequence;
+    uint32_t nSequences = sequence + 1;
+    if (sequence == 0xFF) {
+        nSequence  = 0;
+        nSequences = g_seqMan.getSequencesInBank(bank);
+    }
+    for (; nSequence < nSequences; ++nSequence) {
+        Sequence* pSequence = g_seqMan.getSequence(bank, nSequence);
+        for (uint32_t nTrack = 0; nTrack < pSequence->getTracks(); ++nTrack) {
+            Track* pTrack = pSequence->getTrack(nTrack);
+            if (!pTrack)
+                continue;
+            for (size_t nIndex = 0; nIndex < pTrack->getPatterns(); ++nIndex) {
+                if (pBuffer && nCount < nSize) {
+                    Pattern* pPattern      = pTrack->getPatternByIndex(nIndex);
+                    TIMELINE_EVENT* pEvent = pBuffer + nCount;
+                    pEvent->sequence       = nSequence;
+                    pEvent->track          = nTrack;
+                    pEvent->position       = pTrack->getPatternPositionByIndex(nIndex);
+                    pEvent->pattern        = g_seqMan.getPatternIndex(pPattern);
+                    pEvent->length         = pPattern ? pPattern->getLength() : 0;
+                }
+                ++nCount;
+            }
+        }
+    }
+    return nCount;
+}
+
+uint32_t getTimelineVersion() { return g_nTimelineVersion; }
+
+int getStateEventFd() { return g_seqMan.getStateQueue()->getFd(); }
+
+uint32_t getStateEvents(STATE_EVENT* pBuffer, uint32_t nSize) {
+    uint32_t nCount = 0;
+    StateQueue* pQueue = g_seqMan.getStateQueue();
+    while (nCount < nSize && pQueue->pop(pBuffer[nCount]))
+        ++nCount;
+    return nCount;
+}
+
+bool checkStateEventOverflow() { return g_seqMan.getStateQueue()->checkOverflow(); }
+
 uint32_t getPatternAt(uint8_t bank, uint8_t sequence, uint32_t track, uint32_t position) {
     Sequence* pSequence = g_seqMan.getSequence(bank, sequence);
     Track* pTrack       = pSequence->getTrack(track);
@@ -1936,6 +2055,7 @@ uint8_t getPlayMode(uint8_t bank, uint8_t sequence) {
 void setPlayMode(uint8_t bank, uint8_t sequence, uint8_t mode) {
     Sequence* pSequence = g_seqMan.getSequence(bank, sequence);
     pSequence->setPlayMode(mode);
+    g_seqMan.notifyState(bank, sequence);
     if (bank + sequence)
         g_bDirty = true;
 }
@@ -2030,7 +2150,10 @@ uint32_t getSequenceLength(uint8_t bank, uint8_t sequence) { return g_seqMan.get
 void clearSequence(uint8_t bank, uint8_t sequence) {
     Sequence* pSequence = g_seqMan.getSequence(bank, sequence);
     pSequence->clear();
+    pSequence->updateLength();
+    g_seqMan.notifyState(bank, sequence);
     g_bDirty = true;
+    ++g_nTimelineVersion;
 }
 
 size_t getPlayingSequences() { return g_nPlayingSequences; }
@@ -2041,12 +2164,16 @@ void setSequencesInBank(uint8_t bank, uint8_t sequences) {
     g_bMutex = true;
     g_seqMan.setSequencesInBank(bank, sequences);
     g_bMutex    = false;
+    ++g_nTimelineVersion;
     g_pSequence = g_seqMan.getSequence(0, 0);
 }
 
 uint32_t getSequencesInBank(uint32_t bank) { return g_seqMan.getSequencesInBank(bank); }
 
-void clearBank(uint32_t bank) { g_seqMan.clearBank(bank); }
+void clearBank(uint32_t bank) {
+    g_seqMan.clearBank(bank);
+    ++g_nTimelineVersion;
+}
 
 // ** Sequence management functions **
 
@@ -2057,7 +2184,8 @@ uint8_t getGroup(uint8_t bank, uint8_t sequence) {
 
 void setGroup(uint8_t bank, uint8_t sequence, uint8_t group) {
     Sequence* pSequence = g_seqMan.getSequence(bank, sequence);
-    return pSequence->setGroup(group);
+    pSequence->setGroup(group);
+    g_seqMan.notifyState(bank, sequence);
     g_bDirty = true;
 }
 
@@ -2065,6 +2193,7 @@ bool hasSequenceChanged(uint8_t bank, uint8_t sequence) { return g_seqMan.getSeq
 
 uint32_t addTrackToSequence(uint8_t bank, uint8_t sequence, uint32_t track) {
     g_bDirty = true;
+    ++g_nTimelineVersion;
     return g_seqMan.getSequence(bank, sequence)->addTrack(track);
 }
 
@@ -2072,8 +2201,9 @@ void removeTrackFromSequence(uint8_t bank, uint8_t sequence, uint32_t track) {
     Sequence* pSequence = g_seqMan.getSequence(bank, sequence);
     if (!pSequence->removeTrack(track))
         return;
-    pSequence->updateLength();
+    g_seqMan.updateSequenceLength(bank, sequence);
     g_bDirty = true;
+    ++g_nTimelineVersion;
 }
 
 void addTempoEvent(uint8_t bank, uint8_t sequence, uint32_t tempo, uint16_t bar, uint16_t tick) {
@@ -2109,17 +2239,20 @@ const char* getSequenceName(uint8_t bank, uint8_t sequence) {
 bool moveSequence(uint8_t bank, uint8_t sequence, uint8_t position) {
     bool bResult = g_seqMan.moveSequence(bank, sequence, position);
     g_pSequence  = g_seqMan.getSequence(0, 0);
+    ++g_nTimelineVersion;
     return bResult;
 }
 
 void insertSequence(uint8_t bank, uint8_t sequence) {
     g_seqMan.insertSequence(bank, sequence);
     g_pSequence = g_seqMan.getSequence(0, 0);
+    ++g_nTimelineVersion;
 }
 
 void removeSequence(uint8_t bank, uint8_t sequence) {
     g_seqMan.removeSequence(bank, sequence);
     g_pSequence = g_seqMan.getSequence(0, 0);
+    ++g_nTimelineVersion;
 }
 
 void updateSequenceInfo() { g_seqMan.updateAllSequenceLengths(); }
@@ -47,6 +47,7 @@
 
 #include "constants.h"
 #include "pattern.h"
+#include "statequeue.h"
 #include "timebase.h"
 #include <cstdint>
 
@@ -57,6 +58,27 @@
 extern "C" {
 #endif
 
+/** Pattern placement exported by getTimeline (packed for direct mapping to ctypes structure) */
+struct TIMELINE_EVENT {
+    uint8_t sequence;  // Index of sequence within bank
+    uint32_t track;    // Index of track within sequence
+    uint32_t position; // Quantity of clock cycles from start of sequence where pattern starts
+    uint32_t pattern;  // Pattern index
+    uint32_t length;   // Pattern length in clock cycles
+} __attribute__((packed));
+
+/** Note event exported by getPatternNotes (packed for direct mapping to ctypes structure) */
+struct NOTE_EVENT {
+    uint32_t step;         // Index of step at which note starts
+    float duration;        // Duration in steps
+    float offset;          // Offset of note start as fraction of step
+    uint8_t note;          // MIDI note number
+    uint8_t velocity;      // MIDI velocity
+    uint8_t stutterCount;  // Quantity of stutters
+    uint8_t stutterDur;    // Duration of each stutter in clock cycles
+    uint8_t playChance;    // Probability of note playing (0..100)
+} __attribute__((packed));
+
 enum TRANSPORT_CLOCK {
     TRANSPORT_CLOCK_INTERNAL = 1,
     TRANSPORT_CLOCK_MIDI     = 2,
@@ -94,11 +116,35 @@ bool load(const char* filename);
  */
 bool load_pattern(uint32_t nPattern, const char* filename);
 
+/** @brief  Load sequences and patterns from RIFF data in memory
+ *   @param  pData Pointer to RIFF data, formatted as a sequence file
+ *   @param  nSize Size of RIFF data in bytes
+ *   @retval bool True on success
+ *   @note   Pass NULL or empty buffer to clear sequences (returns false)
+ */
+bool load_buffer(const uint8_t* pData, uint32_t nSize);
+
 /** @brief  Save sequences and patterns to file
  *   @param  filename Full path and filename
  */
 void save(const char* filename);
 
+/** @brief  Save sequences and patterns to RIFF data in memory
+ *   @retval uint32_t Size of RIFF data in bytes or 0 on failure
+ *   @note   Data is identical to a sequence file saved with save()
+ *   @note   Access data with get_save_buffer(). It remains valid until next call to save_buffer() or free_save_buffer()
+ */
+uint32_t save_buffer();
+
+/** @brief  Get pointer to RIFF data from last call to save_buffer()
+ *   @retval uint8_t* Pointer to RIFF data or NULL if none
+ */
+const uint8_t* get_save_buffer();
+
+/** @brief  Release RIFF data from last call to save_buffer()
+ */
+void free_save_buffer();
+
 /** @brief  Save pattern to file
  *   @param  nPattern Pattern number
  *   @param  filename Full path and filename
@@ -288,6 +334,22 @@ uint32_t getPattern(uint8_t bank, uint8_t sequence, uint32_t track, uint32_t pos
  */
 uint32_t getPatternAt(uint8_t bank, uint8_t sequence, uint32_t track, uint32_t position);
 
+/** @brief  Get all pattern placements of a sequence or a whole bank with a single call
+ *   @param  bank Index of bank
+ *   @param  sequence Index of sequence or 0xFF for all sequences in bank
+ *   @param  pBuffer Pointer to array of TIMELINE_EVENT to populate (may be NULL to just get quantity of events)
+ *   @param  nSize Quantity of TIMELINE_EVENT elements in pBuffer
+ *   @retval uint32_t Quantity of patterns in timeline (only nSize events are copied if this is larger)
+ *   @note   Events are sorted by sequence, track and position
+ */
+uint32_t getTimeline(uint8_t bank, uint8_t sequence, TIMELINE_EVENT* pBuffer, uint32_t nSize);
+
+/** @brief  Get timeline version
+ *   @retval uint32_t Counter incremented each time pattern placement or pattern length changes in any sequence
+ *   @note   Use to check if a copy of the timeline obtained with getTimeline is still valid
+ */
+uint32_t getTimelineVersion();
+
 /** @brief  Select active pattern
  *   @note   All subsequent pattern methods act on this pattern
  *   @note   Pattern is created if it does not exist
@@ -494,6 +556,14 @@ void setNotePlayChance(uint32_t step, uint8_t note, uint8_t chance);
  */
 float getNoteDuration(uint32_t step, uint8_t note);
 
+/** @brief  Get all notes in selected pattern with a single call
+ *   @param  pBuffer Pointer to array of NOTE_EVENT to populate (may be NULL to just get quantity of notes)
+ *   @param  nSize Quantity of NOTE_EVENT elements in pBuffer
+ *   @retval uint32_t Quantity of notes in pattern (only nSize notes are copied if this is larger)
+ *   @note   Notes are sorted by start step
+ */
+uint32_t getPatternNotes(NOTE_EVENT* pBuffer, uint32_t nSize);
+
 /** @brief  Add programme change to selected pattern
  *   @param  step Index of step at which to add program change
  *   @param  program MIDI program change number
@@ -781,6 +851,25 @@ uint8_t getStateChange(uint8_t bank, uint8_t start, uint8_t end, uint32_t* state
  */
 uint8_t getProgress(uint8_t bank, uint8_t start, uint8_t end, uint16_t* progress);
 
+/** @brief  Get file descriptor that becomes readable when sequence state or progress events are queued
+ *   @retval int File descriptor (eventfd) or -1 if not available
+ *   @note   Read 8 bytes from descriptor to reset it, then get events with getStateEvents
+ */
+int getStateEventFd();
+
+/** @brief  Get queued sequence state and progress events
+ *   @param  pBuffer Pointer to array of STATE_EVENT to populate
+ *   @param  nSize Quantity of STATE_EVENT elements in pBuffer
+ *   @retval uint32_t Quantity of events copied to pBuffer (removed from queue)
+ *   @note   Events are queued by play state, mode and group changes and by progress (percentage) changes of playing sequences
+ */
+uint32_t getStateEvents(STATE_EVENT* pBuffer, uint32_t nSize);
+
+/** @brief  Check if state events have been dropped because queue was full
+ *   @retval bool True if events dropped since last call. Caller should resynchronise state with getSequenceState.
+ */
+bool checkStateEventOverflow();
+
 /** @brief  Get quantity of tracks in a sequence
  *   @param  bank Index of bank
  *   @param  sequence Index of sequence
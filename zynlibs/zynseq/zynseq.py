@@ -23,10 +23,14 @@
 #
 # ********************************************************************
 
+import os
 import ctypes
+import select
 import logging
 from math import sqrt
+from time import sleep
 from hashlib import new
+from threading import Thread
 from os.path import dirname, realpath
 
 from zyngine import zynthian_engine
@@ -77,6 +81,38 @@ PLAY_MODES = ['Disabled', 'Oneshot', 'Loop',
               'Oneshot all', 'Loop all', 'Oneshot sync', 'Loop sync']
 
 
+# Note event populated by libseq.getPatternNotes (packed NOTE_EVENT struct)
+class note_event(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [("step", ctypes.c_uint32),
+                ("duration", ctypes.c_float),
+                ("offset", ctypes.c_float),
+                ("note", ctypes.c_uint8),
+                ("velocity", ctypes.c_uint8),
+                ("stutter_count", ctypes.c_uint8),
+                ("stutter_dur", ctypes.c_uint8),
+                ("play_chance", ctypes.c_uint8)]
+
+
+# Sequence state / progress event populated by libseq.getStateEvents (STATE_EVENT struct)
+class state_event(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_uint8),
+                ("bank", ctypes.c_uint8),
+                ("sequence", ctypes.c_uint8),
+                ("progress", ctypes.c_uint8),
+                ("state", ctypes.c_uint32)]
+
+
+# Pattern placement populated by libseq.getTimeline (packed TIMELINE_EVENT struct)
+class timeline_event(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [("sequence", ctypes.c_uint8),
+                ("track", ctypes.c_uint32),
+                ("position", ctypes.c_uint32),
+                ("pattern", ctypes.c_uint32),
+                ("length", ctypes.c_uint32)]
+
+
 class zynseq(zynthian_engine):
 
     # Subsignals are defined inside each module. Here we define zynseq subsignals:
@@ -88,6 +124,10 @@ class zynseq(zynthian_engine):
     def __init__(self, state_manager=None):
         self.state_manager = state_manager
         self.changing_bank = False
+        self.note_events = (note_event * 0)()
+        self.timeline_events = (timeline_event * 0)()
+        self.timeline = {}
+        self.timeline_key = None
         try:
             self.libseq = ctypes.cdll.LoadLibrary(
                 dirname(realpath(__file__))+"/build/libzynseq.so")
@@ -117,6 +157,21 @@ class zynseq(zynthian_engine):
             self.libseq.getProgress.argtypes = [
                 ctypes.c_uint8, ctypes.c_uint8, ctypes.c_uint8, ctypes.POINTER(ctypes.c_uint16)]
             self.libseq.getProgress.restype = ctypes.c_uint8
+            self.libseq.getPatternNotes.argtypes = [
+                ctypes.POINTER(note_event), ctypes.c_uint32]
+            self.libseq.getPatternNotes.restype = ctypes.c_uint32
+            self.libseq.getTimeline.argtypes = [
+                ctypes.c_uint8, ctypes.c_uint8, ctypes.POINTER(timeline_event), ctypes.c_uint32]
+            self.libseq.getTimeline.restype = ctypes.c_uint32
+            self.libseq.getTimelineVersion.restype = ctypes.c_uint32
+            self.libseq.getStateEvents.argtypes = [
+                ctypes.POINTER(state_event), ctypes.c_uint32]
+            self.libseq.getStateEvents.restype = ctypes.c_uint32
+            self.libseq.checkStateEventOverflow.restype = ctypes.c_bool
+            self.libseq.load_buffer.argtypes = [ctypes.c_char_p, ctypes.c_uint32]
+            self.libseq.load_buffer.restype = ctypes.c_bool
+            self.libseq.save_buffer.restype = ctypes.c_uint32
+            self.libseq.get_save_buffer.restype = ctypes.c_void_p
             self.libseq.init(bytes("zynseq", "utf-8"))
         except Exception as e:
             self.libseq = None
@@ -133,12 +188,68 @@ class zynseq(zynthian_engine):
         self.bank = None
         self.select_bank(1, True)
 
+        self.state_thread_exit = False
+        self.state_thread = None
+        if self.libseq:
+            self.state_thread = Thread(target=self.state_thread_task, args=())
+            self.state_thread.name = "zynseq state"
+            self.state_thread.daemon = True  # thread dies with the program
+            self.state_thread.start()
+
     # Destroy instance of shared library
     def destroy(self):
+        self.state_thread_exit = True
+        if self.state_thread and self.state_thread.is_alive():
+            self.state_thread.join()
+        self.state_thread = None
         if self.libseq:
             ctypes.dlclose(self.libseq._handle)
         self.libseq = None
 
+    # Thread task to send sequence state & progress signals when library queues state events
+    # Signals are only sent for changed sequences in current bank, each sequence once per wake.
+    def state_thread_task(self):
+        fd = self.libseq.getStateEventFd()
+        if fd < 0:
+            logging.warning("Can't get zynseq state event fd. Polling sequence state.")
+        events = (state_event * 64)()
+        while not self.state_thread_exit:
+            if fd < 0:
+                sleep(0.2)
+                self.update_state()
+                continue
+            if not select.select([fd], [], [], 0.5)[0]:
+                continue
+            try:
+                os.read(fd, 8)
+            except BlockingIOError:
+                pass
+            try:
+                if self.libseq.checkStateEventOverflow():
+                    # Events were dropped => resync all sequences in bank
+                    self.update_state()
+                num_seq = self.col_in_bank ** 2
+                states = {}
+                progress = {}
+                count = len(events)
+                while count == len(events):
+                    count = self.libseq.getStateEvents(events, len(events))
+                    for ev in events[:count]:
+                        if ev.bank != self.bank or ev.sequence >= num_seq:
+                            continue
+                        if ev.type == self.SS_SEQ_PLAY_STATE:
+                            states[ev.sequence] = ev.state
+                        progress[ev.sequence] = ev.progress
+                for seq, state in states.items():
+                    zynsigman.send(zynsigman.S_STEPSEQ, self.SS_SEQ_PLAY_STATE, bank=self.bank, seq=seq,
+                                   state=state & 0xff, mode=(state >> 8) & 0xff, group=(state >> 16) & 0xff)
+                for seq, prog in progress.items():
+                    zynsigman.send(zynsigman.S_STEPSEQ, self.SS_SEQ_PROGRESS, bank=self.bank, seq=seq, progress=prog)
+            except Exception as e:
+                logging.error(f"Can't process zynseq state events => {e}")
+            # Limit signal rate when many sequences are playing (progress events)
+            sleep(0.02)
+
     def update_state(self):
         num_seq = self.col_in_bank ** 2
         states = (ctypes.c_uint32 * num_seq)()
@@ -249,9 +360,11 @@ class zynseq(zynthian_engine):
 
     # Load a zynseq file
     # filename: Full path and filename
+    # Returns: True on success
     def load(self, filename):
-        self.libseq.load(bytes(filename, "utf-8"))
+        res = self.libseq.load(bytes(filename, "utf-8"))
         self.select_bank(1, True)  # TODO: Store selected bank in seq file
+        return res
 
     # Load a zynseq pattern file
     # patnum: Pattern number
@@ -276,6 +389,42 @@ class zynseq(zynthian_engine):
             return self.libseq.save_pattern(int(patnum), bytes(filename, "utf-8"))
         return None
 
+    # Get all notes in selected pattern with a single library call
+    # Returns: Dictionary of (velocity, duration, offset, stutter count, stutter duration), indexed by (step, note)
+    def get_pattern_notes(self):
+        if not self.libseq:
+            return {}
+        count = self.libseq.getPatternNotes(self.note_events, len(self.note_events))
+        if count > len(self.note_events):
+            # Grow buffer with some headroom to avoid reallocating on each added note
+            self.note_events = (note_event * (count + 64))()
+            count = self.libseq.getPatternNotes(self.note_events, len(self.note_events))
+        return {(ev.step, ev.note): (ev.velocity, ev.duration, ev.offset, ev.stutter_count, ev.stutter_dur)
+                for ev in self.note_events[:count]}
+
+    # Get pattern placement of all sequences in a bank with a single library call
+    # bank: Index of bank
+    # Returns: Dictionary of {position: (pattern, length in clock cycles)}, indexed by (sequence, track)
+    # Result is cached until the library reports a timeline change so it must not be modified by caller
+    def get_timeline(self, bank):
+        if not self.libseq:
+            return {}
+        key = (bank, self.libseq.getTimelineVersion())
+        if key == self.timeline_key:
+            return self.timeline
+        count = self.libseq.getTimeline(bank, 0xFF, self.timeline_events, len(self.timeline_events))
+        if count > len(self.timeline_events):
+            self.timeline_events = (timeline_event * (count + 64))()
+            count = self.libseq.getTimeline(bank, 0xFF, self.timeline_events, len(self.timeline_events))
+        self.timeline = {}
+        for ev in self.timeline_events[:count]:
+            try:
+                self.timeline[(ev.sequence, ev.track)][ev.position] = (ev.pattern, ev.length)
+            except KeyError:
+                self.timeline[(ev.sequence, ev.track)] = {ev.position: (ev.pattern, ev.length)}
+        self.timeline_key = key
+        return self.timeline
+
     # Set sequence name
     # name: Sequence name (truncates at 16 characters)
     def set_sequence_name(self, bank, sequence, name):
@@ -374,36 +523,37 @@ class zynseq(zynthian_engine):
         except Exception as e:
             logging.error(e)
 
+    # Get sequences and patterns as RIFF data, same format as zynseq file
+    # Returns: RIFF data as bytes or None on failure
     def get_riff_data(self):
-        fpath = "/tmp/snapshot.zynseq"
         try:
-            # Save to tmp
-            self.save(fpath)
-            # Load binary data
-            with open(fpath, "rb") as fh:
-                riff_data = fh.read()
-                logging.info("Loading RIFF data...\n")
+            logging.info("Loading RIFF data...\n")
+            size = self.libseq.save_buffer()
+            if not size:
+                raise Exception("save_buffer failed")
+            riff_data = ctypes.string_at(self.libseq.get_save_buffer(), size)
+            self.libseq.free_save_buffer()
             return riff_data
 
         except Exception as e:
             logging.error("Can't get RIFF data! => {}".format(e))
             return None
 
+    # Restore sequences and patterns from RIFF data, same format as zynseq file
+    # riff_data: RIFF data as bytes
+    # Returns: True on success
     def restore_riff_data(self, riff_data):
-        fpath = "/tmp/snapshot.zynseq"
         try:
-            # Save RIFF data to tmp file
-            with open(fpath, "wb") as fh:
-                fh.write(riff_data)
-                logging.info("Restoring RIFF data...\n")
-            # Load from tmp file
-            if self.load(fpath):
+            logging.info("Restoring RIFF data...\n")
+            res = self.libseq.load_buffer(riff_data, len(riff_data))
+            self.select_bank(1, True)  # TODO: Store selected bank in seq file
+            if res:
                 self.filename = "snapshot"
                 return True
 
         except Exception as e:
             logging.error("Can't restore RIFF data! => {}".format(e))
-            return False
+        return False
 
     def get_xy_from_pad(self, pad):
         col = pad // self.col_in_bank
@@ -28,7 +28,9 @@ import signal
 import ctypes
 import logging
 from tkinter import EventType
-from time import sleep
+from time import sleep, monotonic
+
+startup_ts = monotonic()
 
 # Zynthian specific modules
 from zyngui import zynthian_gui_config
@@ -46,6 +48,7 @@ from zynlibs.zynseq import *
 
 logging.info("STARTING ZYNTHIAN-UI ...")
 zynthian_gui_config.zyngui = zyngui = zynthian_gui()
+zyngui.startup_ts = startup_ts
 zyngui.create_screens()
 zyngui.run_start_thread()
 